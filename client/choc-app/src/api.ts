@@ -7,6 +7,15 @@ export interface BlinkSession {
 
 const BASE = import.meta.env.VITE_API_BASE ?? "http://localhost:8000";
 
+// 이미 받은 id를 다시 보내면 저장하지 않고 status "duplicate" (재전송해도 안전)
+export type SessionReceipt = {
+  message: string;
+  id: string;
+  status: "accepted" | "duplicate";
+  events?: number;
+  timestamp: number;
+};
+
 export async function postBlinkData(session: BlinkSession, base = BASE) {
   const res = await fetch(`${base}/blink-data/`, {
     method: "POST",
@@ -16,13 +25,102 @@ export async function postBlinkData(session: BlinkSession, base = BASE) {
   if (!res.ok) {
     throw new Error(`POST /blink-data/ failed: ${res.status}`);
   }
-  return res.json() as Promise<{ message: string; id: string; timestamp: number }>;
+  return res.json() as Promise<SessionReceipt>;
+}
+
+// 오프라인 동안 쌓인 세션을 한 번에 전송 (id 기준으로 재전송 중복은 서버가 건너뜀)
+export async function postBlinkDataBulk(sessions: BlinkSession[], base = BASE) {
+  const res = await fetch(`${base}/blink-data/bulk`, {
+    method: "POST",
+    headers: { "Content-Type": "application/json" },
+    body: JSON.stringify(sessions),
+  });
+  if (!res.ok) {
+    throw new Error(`POST /blink-data/bulk failed: ${res.status}`);
+  }
+  return res.json() as Promise<{
+    message: string;
+    accepted: number;
+    results: { id: string | null; status: "accepted" | "duplicate" | "invalid"; events?: number; error?: string }[];
+    timestamp: number;
+  }>;
+}
+
+// 바이너리 세션 포맷 (server/blink_store.py encode_timestamps와 동일, 리틀엔디안)
+//   int64 시작 epoch ms | uint8 간격 폭(2|4) | 예약 3바이트 | uint32 이벤트 수 | 간격 (count - 1)개
+export function encodeBlinkEvents(events: string[]): ArrayBuffer {
+  const ts = events.map((e) => Date.parse(e)).sort((a, b) => a - b);
+  const deltas = ts.slice(1).map((t, i) => t - ts[i]);
+  const width = deltas.every((d) => d <= 0xffff) ? 2 : 4;
+  const buf = new ArrayBuffer(16 + deltas.length * width);
+  const view = new DataView(buf);
+  view.setBigInt64(0, BigInt(ts[0] ?? 0), true);
+  view.setUint8(8, width);
+  view.setUint32(12, ts.length, true);
+  deltas.forEach((d, i) => {
+    if (width === 2) view.setUint16(16 + i * 2, d, true);
+    else view.setUint32(16 + i * 4, d, true);
+  });
+  return buf;
+}
+
+export async function postBlinkDataBinary(session: BlinkSession, base = BASE) {
+  const params = new URLSearchParams({
+    id: session.id,
+    startedAt: session.startedAt,
+    endedAt: session.endedAt,
+  });
+  const res = await fetch(`${base}/blink-data/binary?${params}`, {
+    method: "POST",
+    headers: { "Content-Type": "application/octet-stream" },
+    body: encodeBlinkEvents(session.events),
+  });
+  if (!res.ok) {
+    throw new Error(`POST /blink-data/binary failed: ${res.status}`);
+  }
+  return res.json() as Promise<SessionReceipt>;
 }
 
-export async function getProcessedData(id: string, base = BASE) {
-  const res = await fetch(`${base}/processed-data/${id}`);
+// budget(초)을 주면 그 안에 LLM 본문이 없을 때 통계/차트 + 요약을 먼저 받고
+// report_status === "pending" 이면 report_stream(SSE) 또는 report_poll 로 본문을 받음
+export async function getProcessedData(id: string, base = BASE, budget?: number) {
+  const query = budget !== undefined ? `?budget=${budget}` : "";
+  const res = await fetch(`${base}/processed-data/${id}${query}`);
   if (!res.ok) {
     throw new Error(`GET /processed-data/${id} failed: ${res.status}`);
   }
   return res.json();
+}
+
+export async function getReportText(reportId: string, base = BASE) {
+  const res = await fetch(`${base}/report-text/${reportId}`);
+  if (!res.ok) {
+    throw new Error(`GET /report-text/${reportId} failed: ${res.status}`);
+  }
+  // failed: LLM 오류로 본문이 중간에 끊김 (report는 버리고 getProcessedData를 다시 요청)
+  return res.json() as Promise<{ id: string; status: "pending" | "ready" | "failed"; report: string; error?: string }>;
+}
+
+// 본문 조각마다 onText(지금까지의 본문), 끝나면 전체 본문으로 resolve
+export function streamReportText(reportId: string, onText: (text: string) => void, base = BASE): Promise<string> {
+  return new Promise((resolve, reject) => {
+    const source = new EventSource(`${base}/report-text/${reportId}/stream`);
+    let text = "";
+    source.onmessage = (e) => {
+      text += JSON.parse(e.data).delta;
+      onText(text);
+    };
+    source.addEventListener("done", (e) => {
+      source.close();
+      resolve(JSON.parse((e as MessageEvent).data).report);
+    });
+    source.addEventListener("failed", (e) => {
+      source.close();
+      reject(new Error(`report ${reportId} failed: ${JSON.parse((e as MessageEvent).data).error}`));
+    });
+    source.onerror = () => {
+      source.close();
+      reject(new Error(`GET /report-text/${reportId}/stream failed`));
+    };
+  });
 }
\ No newline at end of file
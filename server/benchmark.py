@@ -0,0 +1,628 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+서버 벤치마크
+- bucketing: analyze_tablet_data (벡터화) vs 기존 행 단위 strftime 구현
+- cleaning: clean_and_slide_data (정렬된 int64 단일 패스) vs 기존 DataFrame 두 번 계산 구현
+- vad-streams: BatchedSileroVAD (공유 엔진) vs 스트림별 RealTimeSileroVAD 처리량
+- wire: 세션 수신 인코딩별 페이로드 크기와 파싱 CPU (JSON ISO 문자열 vs 바이너리 간격)
+- check: 회귀 검사 (rollup 등, 실패 시 종료 코드 1)
+- suite: 기록 길이(1일~1년)별 genai 단계, /blink-data/ 수신, /processed-data 리포트 (OpenAI는 로컬 스텁)
+  --output 으로 JSON 저장, --baseline 으로 저장된 결과와 비교
+
+    python benchmark.py suite --output bench.json
+    python benchmark.py suite --baseline bench.json --max-regression 0.2
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import logging
+import os
+import platform
+import sys
+import tempfile
+import time
+import warnings
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+try:
+    from .genai import analyze_tablet_data
+except ImportError:
+    from genai import analyze_tablet_data
+
+
+BUCKETING_SIZES = [10_000, 100_000, 1_000_000]
+
+
+def synthetic_history(rows: int, seed: int = 0, start: str = "2024-08-10T09:00:00") -> pd.DataFrame:
+    """
+    clean_and_slide_data 이후 형태(TIMESTAMP, BLINK_INTERVAL)의 합성 기록 생성
+    """
+    rng = np.random.default_rng(seed)
+    intervals = rng.integers(1, 90, size=rows)
+    ts = pd.Timestamp(start) + pd.to_timedelta(np.cumsum(intervals), unit="s")
+    df = pd.DataFrame({"TIMESTAMP": ts, "BLINK_INTERVAL": intervals.astype(np.float64)})
+    return df[df.BLINK_INTERVAL < 60].reset_index(drop=True)
+
+
+def analyze_tablet_data_rowwise(data):
+    """
+    벡터화 이전의 analyze_tablet_data (비교 기준)
+    """
+    data['DATE_MONTH'] = data.TIMESTAMP.apply(lambda x: x.strftime("%Y-%m"))
+    data['DATE_WEEK'] = data.TIMESTAMP.apply(lambda x: x.strftime("%Y") + "-W" + str(x.isocalendar()[1]))
+    data['DATE_HOUR'] = data.TIMESTAMP.apply(lambda x: x.strftime("%Y-%m-%dT%H"))
+
+    last_month = data[data.DATE_MONTH.apply(lambda x: datetime.strptime(x, "%Y-%m")) < datetime.strptime(data.iloc[-1].TIMESTAMP.strftime("%Y-%m"), "%Y-%m")]
+    last_week = data[data.DATE_WEEK == data.iloc[-1].TIMESTAMP.strftime("%Y") + "-W" + str(data.iloc[-1].TIMESTAMP.isocalendar()[1] - 1)]
+    this_week = data[data.DATE_WEEK == data.iloc[-1].TIMESTAMP.strftime("%Y") + "-W" + str(data.iloc[-1].TIMESTAMP.isocalendar()[1])]
+    bpm_history_month = 60 / last_month.groupby('DATE_MONTH').BLINK_INTERVAL.mean()
+    bpm_history_week = 60 / last_week.groupby('DATE_WEEK').BLINK_INTERVAL.mean()
+    bpm_this_week = 60 / this_week.groupby('DATE_HOUR').BLINK_INTERVAL.mean()
+    return (bpm_history_month, bpm_history_week, bpm_this_week)
+
+
+def clean_and_slide_data_frames(data: pd.DataFrame, date: str):
+    """
+    단일 패스 이전의 clean_and_slide_data (비교 기준)
+    """
+
+    data['TIMESTAMP'] = pd.to_datetime(data['TIMESTAMP'])
+    data['BLINK_INTERVAL'] = data.TIMESTAMP.diff()
+    data['BLINK_INTERVAL'] = data['BLINK_INTERVAL'].dt.seconds
+    data['BLINK_PER_MINUTE'] = 60 / data['BLINK_INTERVAL']
+    data.dropna(inplace=True)
+    data = data[data['BLINK_INTERVAL'] < 60]
+    slided_data = data.copy()
+    
+    # Filter data for the given date
+    filtered_df = data[pd.to_datetime(data['TIMESTAMP']).dt.strftime("%Y-%m-%d") == date]
+    if filtered_df.empty:
+        print(f"No data available for {date}")
+        return pd.Series(dtype=float), pd.Series(dtype=float)
+    print(len(filtered_df), "rows gathered this session")
+
+    filtered_df['TIMESTAMP'] = pd.to_datetime(filtered_df['TIMESTAMP'])
+    # 간격(초) 계산: total_seconds() 사용
+    filtered_df['BLINK_INTERVAL'] = filtered_df.TIMESTAMP.diff()
+    filtered_df['BLINK_INTERVAL'] = filtered_df['BLINK_INTERVAL'].dt.seconds
+    # BPM 계산
+    filtered_df['BLINK_PER_MINUTE'] = 60 / filtered_df['BLINK_INTERVAL']
+    # inf/-inf 제거
+    filtered_df.dropna(inplace=True)
+    # 너무 긴 간격 필터 (노이즈 컷)
+    filtered_df = filtered_df[filtered_df['BLINK_INTERVAL'] < 60]
+
+    # 시간별 평균(로그 수가 충분한 시간대만)
+    min_filter = (filtered_df.groupby(pd.Grouper(key='TIMESTAMP', freq='h'))['BLINK_PER_MINUTE'].count() >= 5).values
+    grouped = filtered_df.groupby(pd.Grouper(key='TIMESTAMP', freq='h'))['BLINK_PER_MINUTE'].mean()
+    grouped = grouped[min_filter]
+    grouped.index = grouped.index.strftime('%H')
+    
+    return slided_data, grouped
+
+
+def _best_of(fn, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def bench_bucketing(sizes, repeat: int = 3):
+    print(f"{'rows':>10s}  {'rowwise':>10s}  {'vectorized':>10s}  {'speedup':>8s}")
+    for n in sizes:
+        df = synthetic_history(n)
+        expected = analyze_tablet_data_rowwise(df.copy())
+        actual = analyze_tablet_data(df.copy())
+        for e, a in zip(expected, actual):
+            pd.testing.assert_series_equal(e, a)
+
+        slow = _best_of(lambda: analyze_tablet_data_rowwise(df.copy()), repeat)
+        fast = _best_of(lambda: analyze_tablet_data(df.copy()), repeat)
+        print(f"{n:>10d}  {slow * 1e3:>8.1f}ms  {fast * 1e3:>8.1f}ms  {slow / fast:>7.1f}x")
+
+
+def bench_cleaning(histories, repeat: int = 3):
+    try:
+        from .genai import clean_and_slide_data
+    except ImportError:
+        from genai import clean_and_slide_data
+
+    date = datetime.now().strftime("%Y-%m-%d")
+    print(f"{'hist':>5s}  {'rows':>9s}  {'frames':>10s}  {'single':>10s}  {'speedup':>8s}")
+    for label in histories:
+        raw = _raw_frame(suite_history(HISTORY_DAYS[label]))
+        with contextlib.redirect_stdout(io.StringIO()):
+            expected = clean_and_slide_data_frames(raw.copy(), date)
+            actual = clean_and_slide_data(raw.copy(), date)
+            pd.testing.assert_frame_equal(expected[0], actual[0])
+            pd.testing.assert_series_equal(expected[1], actual[1])
+            slow = _best_of(lambda: clean_and_slide_data_frames(raw.copy(), date), repeat)
+            fast = _best_of(lambda: clean_and_slide_data(raw.copy(), date), repeat)
+        print(f"{label:>5s}  {len(raw):>9d}  {slow * 1e3:>8.1f}ms  {fast * 1e3:>8.1f}ms  {slow / fast:>7.1f}x")
+
+
+def _vad_test_audio(frames: int, seed: int) -> np.ndarray:
+    # 잡음 + 주기적으로 켜지는 하모닉 신호 (음성/무음 전환이 생기도록)
+    rng = np.random.default_rng(seed)
+    t = np.arange(frames * 512) / 16000
+    x = 0.02 * rng.standard_normal(len(t))
+    env = (np.sin(2 * np.pi * 0.5 * t + seed) > 0).astype(np.float64)
+    phase = 2 * np.pi * np.cumsum(120 + 30 * np.sin(2 * np.pi * 3 * t)) / 16000
+    x += env * 0.3 * sum(np.sin(k * phase) / k for k in range(1, 10))
+    return x.astype(np.float32)
+
+
+def _vad_speech_audio(frames: int, seed: int) -> np.ndarray:
+    """
+    Silero가 음성으로 판단하는 합성 신호: 성문 펄스열(120 Hz 부근) → 포먼트 공진 3개,
+    4 Hz 음절 변조, 0.8~2초 발화 / 0.5~1.5초 무음 반복
+    """
+    from scipy.signal import lfilter
+
+    rng = np.random.default_rng(seed)
+    sr = 16000
+    n = frames * 512
+    t = np.arange(n) / sr
+    f0 = 120 + 20 * np.sin(2 * np.pi * 0.7 * t + seed)
+    x = (np.diff(np.floor(np.cumsum(f0) / sr), prepend=0) > 0).astype(np.float64)
+    for freq, bw in ((700, 130), (1220, 70), (2600, 160)):
+        r = np.exp(-np.pi * bw / sr)
+        x = lfilter([1 - r], [1, -2 * r * np.cos(2 * np.pi * freq / sr), r * r], x)
+    on = np.zeros(n)
+    pos = 0
+    while pos < n:
+        talk, pause = int(rng.uniform(0.8, 2.0) * sr), int(rng.uniform(0.5, 1.5) * sr)
+        on[pos : pos + talk] = 1
+        pos += talk + pause
+    x = x / np.abs(x).max() * 0.5 * (0.5 + 0.5 * np.sin(2 * np.pi * 4 * t)) * on
+    return (x + 0.005 * rng.standard_normal(n)).astype(np.float32)
+
+
+def bench_vad_streams(stream_counts, frames: int = 200):
+    """
+    스트림 N개에 frames 프레임씩 최대 속도로 투입하고 처리량 측정
+    streams/core = (CPU 1초당 처리 프레임) / (스트림 1개의 실시간 프레임 속도 31.25/s)
+    """
+    try:
+        from .vad import BatchedSileroVAD, RealTimeSileroVAD, BLOCK_SAMPLES, DT
+    except ImportError:
+        from vad import BatchedSileroVAD, RealTimeSileroVAD, BLOCK_SAMPLES, DT
+
+    def run_per_stream(chunks):
+        vads = [RealTimeSileroVAD() for _ in chunks]
+        t0, c0 = time.perf_counter(), time.process_time()
+        for v in vads:
+            v.start()
+        for i in range(frames):
+            for v, ch in zip(vads, chunks):
+                v.put(ch[i])
+        for v in vads:
+            v.stop()
+        return time.perf_counter() - t0, time.process_time() - c0
+
+    def run_batched(chunks):
+        engine = BatchedSileroVAD()
+        streams = [engine.open_stream() for _ in chunks]
+        t0, c0 = time.perf_counter(), time.process_time()
+        engine.start()
+        for i in range(frames):
+            for s, ch in zip(streams, chunks):
+                s.put(ch[i])
+        for s in streams:
+            s.stop(timeout=60)
+        engine.stop()
+        return time.perf_counter() - t0, time.process_time() - c0
+
+    print(f"{'streams':>8s}  {'design':>10s}  {'wall':>8s}  {'cpu':>8s}  {'frames/s':>9s}  {'streams/core':>12s}")
+    for n in stream_counts:
+        chunks = [_vad_test_audio(frames, seed).reshape(frames, BLOCK_SAMPLES) for seed in range(n)]
+        for design, fn in (("per-stream", run_per_stream), ("batched", run_batched)):
+            wall, cpu = fn(chunks)
+            total = n * frames
+            print(f"{n:>8d}  {design:>10s}  {wall:>7.2f}s  {cpu:>7.2f}s  {total / wall:>9.0f}  {total / cpu * DT:>12.1f}")
+
+
+def bench_wire(event_counts, repeat: int = 5):
+    """
+    BlinkSession JSON 검증 + parse_timestamps vs base64/바이너리 decode_timestamps
+    """
+    import base64
+    import json
+
+    try:
+        from .blink_store import decode_timestamps, encode_timestamps, parse_timestamps
+        from .main import BlinkSession
+    except ImportError:
+        from blink_store import decode_timestamps, encode_timestamps, parse_timestamps
+        from main import BlinkSession
+
+    print(f"{'events':>8s}  {'encoding':>8s}  {'bytes':>9s}  {'parse':>9s}  {'size':>6s}  {'cpu':>6s}")
+    for n in event_counts:
+        rng = np.random.default_rng(n)
+        ts = np.datetime64("2025-08-10T09:00:00", "ms").astype(np.int64) + np.cumsum(rng.integers(500, 20_000, size=n))
+        events = [str(t) + "Z" for t in ts.astype("datetime64[ms]")]
+        meta = {"id": "1", "startedAt": events[0], "endedAt": events[-1]}
+        json_body = json.dumps(dict(meta, events=events)).encode()
+        bin_body = encode_timestamps(ts)
+        b64_body = json.dumps(dict(meta, eventsBin=base64.b64encode(bin_body).decode("ascii"))).encode()
+
+        def parse_json():
+            return parse_timestamps(BlinkSession.model_validate_json(json_body).events)
+
+        def parse_b64():
+            return decode_timestamps(base64.b64decode(BlinkSession.model_validate_json(b64_body).eventsBin))
+
+        def parse_bin():
+            return decode_timestamps(bin_body)
+
+        expected = parse_json()
+        base = None
+        for name, body, fn in (("json", json_body, parse_json), ("base64", b64_body, parse_b64), ("binary", bin_body, parse_bin)):
+            # JSON 경로는 초 단위로 절삭되므로 초 단위로 비교
+            assert np.array_equal(fn() // 1000, expected // 1000)
+            t = _best_of(fn, repeat)
+            base = base or (len(body), t)
+            print(f"{n:>8d}  {name:>8s}  {len(body):>9d}  {t * 1e3:>7.2f}ms  {base[0] / len(body):>5.1f}x  {base[1] / t:>5.1f}x")
+
+
+# ---- suite ----
+
+HISTORY_DAYS = {"1d": 1, "1w": 7, "1m": 30, "3m": 91, "1y": 365}
+INGEST_SESSIONS = 200
+INGEST_SESSION_EVENTS = 300
+
+
+def _data_generator():
+    try:
+        import data_generator
+    except ImportError:
+        sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "data"))
+        import data_generator
+    return data_generator
+
+
+def suite_history(days: int, seed: int = 0) -> np.ndarray:
+    """
+    Synthetic user history: `days` weekdays-only days before today plus today's blinks (int64 epoch ms).
+    """
+    gen = _data_generator()
+    today = str(np.datetime64("today", "D"))
+    history = gen.synthetic_user(seed, 0, days, today=today)
+    rng = np.random.default_rng(seed)
+    now_hour = max(datetime.now().hour, 1)
+    today_ts = gen.generate_days(rng, np.array([today], dtype="datetime64[D]"), [10.5], max(now_hour - 6, 0), now_hour)
+    return np.concatenate([history, today_ts])
+
+
+def _raw_frame(ts_ms: np.ndarray) -> pd.DataFrame:
+    # load_blink_data(CSV) 결과와 같은 모양: ID, TIMESTAMP 문자열
+    strings = np.datetime_as_string(ts_ms.astype("datetime64[ms]").astype("datetime64[s]"))
+    return pd.DataFrame({"ID": np.arange(len(ts_ms)), "TIMESTAMP": strings})
+
+
+def check_rollup():
+    """
+    UserRollup.analyze() == clean_and_slide_data + analyze_tablet_data, including hours whose
+    only valid intervals are 0 s (blinks in the same second → inf, not ZeroDivisionError),
+    and RollupStore.sync() after a segment older than the last ingested event (late offline flush).
+    """
+    try:
+        from .blink_store import BlinkStore
+        from .genai import clean_and_slide_data
+        from .rollup import RollupStore, UserRollup
+    except ImportError:
+        from blink_store import BlinkStore
+        from genai import clean_and_slide_data
+        from rollup import RollupStore, UserRollup
+
+    history = suite_history(HISTORY_DAYS["1m"])
+    # 두 시간 뒤 같은 초 안의 두 깜빡임 (그 시간의 유효 간격은 0초 하나뿐)
+    pair_at = int(history.max()) // 1000 * 1000 + 2 * 3600 * 1000
+    cases = {
+        "same-second": np.array([1723280400000, 1723280400300], dtype=np.int64),
+        "1m+same-second": np.concatenate([history, [pair_at, pair_at + 300]]),
+    }
+    for name, ts in cases.items():
+        rollup = UserRollup()
+        rollup.ingest(ts)
+        date = str(np.datetime64(int(ts.max()), "ms").astype("datetime64[D]"))
+        with contextlib.redirect_stdout(io.StringIO()):
+            slided, _ = clean_and_slide_data(_raw_frame(ts), date)
+        for expected, actual in zip(analyze_tablet_data(slided), rollup.analyze()):
+            pd.testing.assert_series_equal(expected, actual)
+        assert np.isinf(rollup.analyze()[2]).any(), name
+        print(f"ok  rollup {name}")
+
+    # 중간 구간이 나중에 도착 → 경계의 간격(깜빡임 사이, 밤 공백이 아닌 곳)까지 DataFrame 경로와 같아야 함
+    late = np.zeros(len(history), dtype=bool)
+    late[len(history) * 3 // 4 : len(history) - 500] = True
+    with tempfile.TemporaryDirectory() as root:
+        store, rollups = BlinkStore(root), RollupStore()
+        store.append("late", history[~late][: len(history) // 2])
+        rollups.sync(store, "late")
+        store.append("late", history[~late][len(history) // 2 :])
+        rollups.sync(store, "late")
+        store.append("late", history[late])
+        rollup = rollups.sync(store, "late")
+    date = str(np.datetime64(int(history.max()), "ms").astype("datetime64[D]"))
+    with contextlib.redirect_stdout(io.StringIO()):
+        slided, _ = clean_and_slide_data(_raw_frame(history), date)
+    for expected, actual in zip(analyze_tablet_data(slided), rollup.analyze()):
+        pd.testing.assert_series_equal(expected, actual)
+    assert rollup.events == len(history)
+    print(f"ok  rollup late-segment ({int(late.sum())} events late)")
+
+
+def check_vad_offline(frames: int = 600, files: int = 4):
+    """
+    detect_offline / detect_offline_many 구간 == detect_streaming 구간 (합성 신호, 길이가 다른 파일 여러 개)
+    작은 창(window)으로 나눠 추론해도 확률이 같은지도 비교 (창 사이로 state/context가 이어지는지)
+    """
+    try:
+        from .vad import detect_offline, detect_offline_many, detect_streaming, frame_probabilities_many, stream_chunks, DT
+    except ImportError:
+        from vad import detect_offline, detect_offline_many, detect_streaming, frame_probabilities_many, stream_chunks, DT
+
+    # 길이를 다르게 해서 배치 중간에 끝나는 파일도 포함 (마지막 파일은 프레임 경계가 아님)
+    wavs = [_vad_speech_audio(frames - 97 * i, seed)[: (frames - 97 * i) * 512 - 100 * i] for i, seed in enumerate(range(files))]
+    expected = [detect_streaming(stream_chunks(w), verbose=False) for w in wavs]
+    t0 = time.perf_counter()
+    single = [detect_offline(w) for w in wavs]
+    t_single = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    many = detect_offline_many(wavs)
+    t_many = time.perf_counter() - t0
+    for i, (segs, (one, _), (batched, probs)) in enumerate(zip(expected, single, many)):
+        assert len(segs) > 1, f"file {i}: synthetic signal has no speech/silence transitions"
+        assert one == segs, f"file {i}: detect_offline {len(one)} segments vs streaming {len(segs)}"
+        assert batched == segs, f"file {i}: detect_offline_many {len(batched)} segments vs streaming {len(segs)}"
+        assert len(probs) == -(-len(wavs[i]) // 512)
+    windowed = frame_probabilities_many(wavs, window=37)
+    for i, (probs, (_, expected_probs)) in enumerate(zip(windowed, many)):
+        assert np.array_equal(probs, expected_probs), f"file {i}: probabilities differ with window=37"
+    n = sum(len(p) for _, p in many)
+    print(f"ok  vad-offline {files} files, {n} frames ({n * DT:.0f}s audio): "
+          f"one by one {t_single:.2f}s, batched {t_many:.2f}s")
+
+
+CHECKS = {
+    "rollup": check_rollup,
+    "vad-offline": check_vad_offline,
+}
+
+
+def _timed(results: list, name: str, history: str, events: int, fn, repeat: int, **extra):
+    with contextlib.redirect_stdout(io.StringIO()):
+        seconds = _best_of(fn, repeat)
+    row = dict(name=name, history=history, events=events, seconds=seconds, **extra)
+    results.append(row)
+    print(f"{name:<28s} {history:>4s} {events:>9d} {seconds * 1e3:>10.2f}ms")
+    return row
+
+
+def bench_stages(results: list, history: str, ts: np.ndarray, repeat: int):
+    try:
+        from . import genai
+        from .rollup import UserRollup
+    except ImportError:
+        import genai
+        from rollup import UserRollup
+
+    # OpenAI 대신 결정적인 로컬 응답, 캐시 없이 매번 호출
+    genai.completion_backend = genai.StubBackend()
+    genai.completion_cache = None
+    date = datetime.now().strftime("%Y-%m-%d")
+    raw = _raw_frame(ts)
+    n = len(ts)
+    with contextlib.redirect_stdout(io.StringIO()):
+        slided, grouped = genai.clean_and_slide_data(raw.copy(), date)
+        histories = genai.analyze_tablet_data(slided)
+    user_info = {"user_name": "bench", "joined_at": str(raw.TIMESTAMP.iloc[0])}
+
+    _timed(results, "genai.clean_and_slide_data", history, n, lambda: genai.clean_and_slide_data(raw.copy(), date), repeat)
+    _timed(results, "genai.analyze_tablet_data", history, n, lambda: genai.analyze_tablet_data(slided), repeat)
+    _timed(results, "genai.plot_blink_data", history, n, lambda: genai.plot_blink_data(grouped, date), repeat)
+    _timed(results, "genai.build_report_messages", history, n,
+           lambda: genai.build_report_messages(user_info=user_info, histories=histories), repeat)
+    _timed(results, "genai.generate_report", history, n, lambda: genai.generate_report(raw.copy(), user_info), repeat)
+
+    def rollup_ingest():
+        r = UserRollup()
+        r.ingest(ts)
+        return r
+
+    rollup = rollup_ingest()
+    _timed(results, "rollup.ingest", history, n, rollup_ingest, repeat)
+    _timed(results, "rollup.analyze", history, n, rollup.analyze, repeat)
+    _timed(results, "rollup.hourly_bpm", history, n, lambda: rollup.hourly_bpm(date), repeat)
+
+
+async def _bench_http(results: list, history: str, ts: np.ndarray, repeat: int, root: str):
+    import httpx
+
+    try:
+        from . import genai, main
+        from .blink_store import BlinkStore
+    except ImportError:
+        import genai
+        import main
+        from blink_store import BlinkStore
+
+    genai.completion_backend = genai.StubBackend()
+    genai.completion_cache = None
+    # 기록 길이마다 새 저장소로 서버 상태를 초기화
+    main.history_store = BlinkStore(root)
+    main.history_store.append(main.REPORT_USER, ts)
+    main.rollup_store = None
+    main._warmup_task = None
+    main.report_cache.clear()
+    await main.ensure_ready()
+
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        # 수신: 오늘 시각 이후로 세션 INGEST_SESSIONS개를 차례로 전송
+        start = int(ts[-1]) + 1000
+        sessions = []
+        for i in range(INGEST_SESSIONS):
+            events = start + np.cumsum(np.full(INGEST_SESSION_EVENTS, 6000)) + i * INGEST_SESSION_EVENTS * 6000
+            iso = [s + "Z" for s in np.datetime_as_string(events.astype("datetime64[ms]"))]
+            sessions.append({"id": f"bench-{history}-{i}", "events": iso, "startedAt": iso[0], "endedAt": iso[-1]})
+        with contextlib.redirect_stdout(io.StringIO()):
+            t0 = time.perf_counter()
+            for body in sessions:
+                r = await client.post("/blink-data/", json=body)
+                r.raise_for_status()
+            ingest = time.perf_counter() - t0
+        row = dict(name="http.blink_data", history=history, events=INGEST_SESSIONS * INGEST_SESSION_EVENTS,
+                   seconds=ingest / INGEST_SESSIONS, sessions_per_s=INGEST_SESSIONS / ingest,
+                   events_per_s=INGEST_SESSIONS * INGEST_SESSION_EVENTS / ingest)
+        results.append(row)
+        print(f"{'http.blink_data':<28s} {history:>4s} {row['events']:>9d} {row['seconds'] * 1e3:>10.2f}ms"
+              f"  ({row['events_per_s']:,.0f} events/s)")
+
+        # 리포트: 캐시를 비운 첫 요청(cold)과 캐시 적중(cached)
+        request_id = sessions[-1]["id"]
+        n = len(ts) + INGEST_SESSIONS * INGEST_SESSION_EVENTS
+        cold = float("inf")
+        with contextlib.redirect_stdout(io.StringIO()):
+            for _ in range(repeat):
+                main.report_cache.clear()
+                t0 = time.perf_counter()
+                r = await client.get(f"/processed-data/{request_id}")
+                r.raise_for_status()
+                cold = min(cold, time.perf_counter() - t0)
+            t0 = time.perf_counter()
+            for _ in range(repeat):
+                (await client.get(f"/processed-data/{request_id}")).raise_for_status()
+            cached = (time.perf_counter() - t0) / repeat
+        for name, seconds in (("http.processed_data.cold", cold), ("http.processed_data.cached", cached)):
+            results.append(dict(name=name, history=history, events=n, seconds=seconds))
+            print(f"{name:<28s} {history:>4s} {n:>9d} {seconds * 1e3:>10.2f}ms")
+
+
+def run_suite(histories, repeat: int = 3, http: bool = True) -> dict:
+    """
+    :return: {"meta": {...}, "results": [{"name", "history", "events", "seconds", ...}]}
+    """
+    results = []
+    print(f"{'benchmark':<28s} {'hist':>4s} {'events':>9s} {'best':>12s}")
+    # 폰트 누락/pandas 경고가 표를 덮지 않도록 (리포트 워커 프로세스에도 전달)
+    warnings.simplefilter("ignore")
+    os.environ.setdefault("PYTHONWARNINGS", "ignore")
+    logging.getLogger("matplotlib.font_manager").setLevel(logging.ERROR)
+    # 프롬프트 파일(prompts/)은 server/ 기준 상대 경로
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+    with tempfile.TemporaryDirectory(prefix="choc-bench-") as tmp:
+        # main은 import 시 저장소를 열므로 임시 경로를 먼저 지정
+        os.environ.setdefault("CHOC_STORE_DIR", os.path.join(tmp, "default"))
+        os.environ.setdefault("CHOC_WARMUP", "0")
+        os.environ.setdefault("CHOC_VAD_WARM", "0")
+        for label in histories:
+            ts = suite_history(HISTORY_DAYS[label])
+            bench_stages(results, label, ts, repeat)
+            if http:
+                asyncio.run(_bench_http(results, label, ts, repeat, os.path.join(tmp, label)))
+        if http:
+            try:
+                from .main import report_executor
+            except ImportError:
+                from main import report_executor
+            report_executor.shutdown()
+    meta = {
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+        "repeat": repeat,
+    }
+    return {"meta": meta, "results": results}
+
+
+def compare_results(current: dict, baseline: dict, max_regression: float = None) -> bool:
+    """
+    Print current vs baseline per (name, history).
+    :return: False when any benchmark is slower than baseline by more than max_regression (0.2 = 20%).
+    """
+    base = {(r["name"], r["history"]): r["seconds"] for r in baseline["results"]}
+    ok = True
+    print(f"\n{'benchmark':<28s} {'hist':>4s} {'baseline':>11s} {'current':>11s} {'change':>8s}")
+    for r in current["results"]:
+        before = base.get((r["name"], r["history"]))
+        if before is None:
+            continue
+        change = r["seconds"] / before - 1
+        flag = ""
+        if max_regression is not None and change > max_regression:
+            flag, ok = "  REGRESSION", False
+        print(f"{r['name']:<28s} {r['history']:>4s} {before * 1e3:>9.2f}ms {r['seconds'] * 1e3:>9.2f}ms {change:>+7.1%}{flag}")
+    return ok
+
+
+def main():
+    p = argparse.ArgumentParser(description="server benchmarks")
+    sub = p.add_subparsers(dest="bench")
+    b = sub.add_parser("bucketing", help="analyze_tablet_data 버킷팅")
+    b.add_argument("--sizes", type=int, nargs="+", default=BUCKETING_SIZES, help="입력 행 수")
+    b.add_argument("--repeat", type=int, default=3, help="반복 횟수 (최솟값 사용)")
+    v = sub.add_parser("vad-streams", help="다중 스트림 VAD 처리량")
+    v.add_argument("--streams", type=int, nargs="+", default=[1, 8, 32, 64], help="동시 스트림 수")
+    v.add_argument("--frames", type=int, default=200, help="스트림당 프레임 수 (32 ms)")
+    w = sub.add_parser("wire", help="세션 수신 인코딩 크기/파싱 비용")
+    w.add_argument("--events", type=int, nargs="+", default=[100, 1_000, 10_000], help="세션당 이벤트 수")
+    c = sub.add_parser("cleaning", help="clean_and_slide_data 단일 패스 vs 기존 구현")
+    c.add_argument("--histories", nargs="+", choices=list(HISTORY_DAYS), default=["1w", "1m", "1y"], help="기록 길이")
+    c.add_argument("--repeat", type=int, default=3, help="반복 횟수 (최솟값 사용)")
+    k = sub.add_parser("check", help="회귀 검사 (기존 구현과 결과 비교)")
+    k.add_argument("names", nargs="*", help=f"검사 이름 {list(CHECKS)} (기본: 전체)")
+    s = sub.add_parser("suite", help="단계별/HTTP 종단 벤치마크 (JSON 출력, 기준 비교)")
+    s.add_argument("--histories", nargs="+", choices=list(HISTORY_DAYS), default=list(HISTORY_DAYS), help="기록 길이")
+    s.add_argument("--repeat", type=int, default=3, help="반복 횟수 (최솟값 사용)")
+    s.add_argument("--no-http", action="store_true", help="ASGI 수신/리포트 벤치마크 생략")
+    s.add_argument("--output", type=str, default=None, help="결과 JSON 저장 경로")
+    s.add_argument("--baseline", type=str, default=None, help="비교할 이전 결과 JSON")
+    s.add_argument("--max-regression", type=float, default=None, help="허용 느려짐 비율 (예: 0.2), 초과 시 종료 코드 1")
+    args = p.parse_args()
+
+    if args.bench == "suite":
+        current = run_suite(args.histories, args.repeat, http=not args.no_http)
+        if args.output:
+            with open(args.output, "w") as f:
+                json.dump(current, f, indent=2)
+        if args.baseline:
+            with open(args.baseline) as f:
+                baseline = json.load(f)
+            if not compare_results(current, baseline, args.max_regression):
+                sys.exit(1)
+        return
+
+    if args.bench == "check":
+        unknown = set(args.names) - set(CHECKS)
+        if unknown:
+            p.error(f"unknown check: {', '.join(sorted(unknown))}")
+        warnings.simplefilter("ignore")
+        for name in args.names or CHECKS:
+            CHECKS[name]()
+        return
+
+    if args.bench == "vad-streams":
+        bench_vad_streams(args.streams, args.frames)
+    elif args.bench == "wire":
+        bench_wire(args.events)
+    elif args.bench == "cleaning":
+        bench_cleaning(args.histories, args.repeat)
+    else:
+        # 하위 명령 없이 실행하면 bucketing
+        bench_bucketing(getattr(args, "sizes", BUCKETING_SIZES), getattr(args, "repeat", 3))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,333 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Columnar on-disk blink event store.
+
+Layout (one directory per user):
+    <root>/<user>/meta.json          {"user_name": ...}
+    <root>/<user>/seg-000001.npy     int64 epoch milliseconds, append-only
+    <root>/<user>/sessions.jsonl     ingested session ids, one JSON string per line, append-only
+
+Segments are written once and memory-mapped on read, so history reads need
+no parsing and restarts don't re-read CSV timestamps. Segment numbers are
+consecutive; compaction merges every segment into the newest number under an
+exclusive per-user file lock, and readers hold a shared lock, so processes
+sharing the directory (uvicorn --workers N) never see a half-compacted user.
+
+Sessions can also arrive in a compact binary form (see encode_timestamps):
+a start epoch plus delta-encoded uint16/uint32 millisecond intervals.
+
+One-shot import of the persona CSVs:
+    python blink_store.py import data --root data/store
+"""
+import argparse
+import contextlib
+import csv
+import fcntl
+import glob
+import json
+import os
+import re
+import tempfile
+import threading
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+import numpy as np
+
+STORE_DIR = os.environ.get("CHOC_STORE_DIR", "data/store")
+
+# 페르소나 CSV 이름 → 표시 이름
+PERSONAS: Dict[str, str] = {
+    'increase': '판교 개발자 영진',
+    'decrease': '노모어피자 치즈크러스트',
+    'stable': '애플 디톡스',
+    'month': '야근조아',
+    'week': '퇴근덕후',
+    'first': '김연진사생팬',
+}
+
+_SEGMENT_RE = re.compile(r"^seg-(\d{6})\.npy$")
+# 세그먼트가 이 수를 넘으면 append 시 하나로 합침
+MAX_SEGMENTS = 64
+
+
+def parse_timestamps(events: Iterable[str]) -> np.ndarray:
+    """
+    Parse ISO 8601 event strings into int64 epoch milliseconds.
+    Fractions and a trailing "Z" are dropped, like the original report path did.
+    :param events: ISO timestamp strings, e.g. "2025-08-10T04:00:05.123Z".
+    :return: int64 array of epoch milliseconds.
+    """
+    trimmed = [e.split('.')[0].rstrip('Z') for e in events]
+    return np.array(trimmed, dtype="datetime64[s]").astype("datetime64[ms]").astype(np.int64)
+
+
+# 바이너리 세션 포맷 (리틀엔디안): 헤더 16바이트 + 간격 (count - 1)개
+#   int64 시작 epoch ms | uint8 간격 폭(2 또는 4) | 예약 3바이트 | uint32 이벤트 수
+WIRE_HEADER = np.dtype([("start", "<i8"), ("width", "u1"), ("reserved", "V3"), ("count", "<u4")])
+_WIRE_DELTA = {2: np.dtype("<u2"), 4: np.dtype("<u4")}
+
+
+def encode_timestamps(ts_ms: np.ndarray) -> bytes:
+    """
+    Encode epoch-millisecond timestamps as start + delta intervals.
+    :param ts_ms: int64 epoch milliseconds (sorted on encode).
+    :return: Header followed by uint16 deltas, or uint32 when any gap is 65.5 s or longer.
+    """
+    ts = np.sort(np.asarray(ts_ms, dtype=np.int64))
+    deltas = np.diff(ts)
+    if len(deltas) and deltas.max() > np.iinfo(np.uint32).max:
+        raise ValueError("Gap between events does not fit in uint32 milliseconds")
+    width = 2 if not len(deltas) or deltas.max() <= np.iinfo(np.uint16).max else 4
+    header = np.zeros(1, dtype=WIRE_HEADER)
+    header["start"] = ts[0] if len(ts) else 0
+    header["width"] = width
+    header["count"] = len(ts)
+    return header.tobytes() + deltas.astype(_WIRE_DELTA[width]).tobytes()
+
+
+def decode_timestamps(buf: bytes) -> np.ndarray:
+    """
+    Decode the encode_timestamps format into int64 epoch milliseconds without per-event parsing.
+    :raise ValueError: On a truncated or malformed buffer.
+    """
+    if len(buf) < WIRE_HEADER.itemsize:
+        raise ValueError("Binary session is shorter than its header")
+    header = np.frombuffer(buf, dtype=WIRE_HEADER, count=1)[0]
+    width, count = int(header["width"]), int(header["count"])
+    if width not in _WIRE_DELTA:
+        raise ValueError(f"Unsupported delta width: {width}")
+    if count == 0:
+        return np.empty(0, dtype=np.int64)
+    if len(buf) != WIRE_HEADER.itemsize + (count - 1) * width:
+        raise ValueError("Binary session length does not match its event count")
+    ts = np.empty(count, dtype=np.int64)
+    ts[0] = header["start"]
+    np.cumsum(np.frombuffer(buf, dtype=_WIRE_DELTA[width], offset=WIRE_HEADER.itemsize), out=ts[1:])
+    ts[1:] += ts[0]
+    return ts
+
+
+class BlinkStore:
+    """
+    사용자별 append-only int64 세그먼트 저장소
+    """
+    def __init__(self, root: str = STORE_DIR):
+        self.root = root
+        os.makedirs(self.root, exist_ok=True)
+        # 사용자별 (sessions.jsonl에서 읽은 바이트 수, 세션 id 집합)
+        self._session_ids: Dict[str, Tuple[int, Set[str]]] = {}
+        self._session_ids_lock = threading.Lock()
+
+    def _user_dir(self, user: str) -> str:
+        if not user or os.sep in user or user.startswith('.'):
+            raise ValueError(f"Invalid user key: {user!r}")
+        return os.path.join(self.root, user)
+
+    def users(self) -> List[str]:
+        return sorted(
+            d for d in os.listdir(self.root)
+            if os.path.isdir(os.path.join(self.root, d)) and not d.startswith('.')
+        )
+
+    def user_name(self, user: str) -> Optional[str]:
+        try:
+            with open(os.path.join(self._user_dir(user), "meta.json"), "r") as f:
+                return json.load(f).get("user_name")
+        except FileNotFoundError:
+            return None
+
+    def set_user_name(self, user: str, user_name: str):
+        path = self._user_dir(user)
+        os.makedirs(path, exist_ok=True)
+        tmp = os.path.join(path, f".meta.{os.getpid()}.tmp")
+        with open(tmp, "w") as f:
+            json.dump({"user_name": user_name}, f, ensure_ascii=False)
+        os.replace(tmp, os.path.join(path, "meta.json"))
+
+    def record_sessions(self, user: str, session_ids: Iterable[str]):
+        """
+        Remember ingested session ids (kept for good, unlike the session TTL store).
+        One O_APPEND write per call, so lines from other processes never interleave.
+        Ids already recorded (e.g. repeated /blink-stream flushes of one session) are skipped.
+        """
+        known = self.session_ids(user)
+        new_ids = list(dict.fromkeys(str(i) for i in session_ids if str(i) not in known))
+        data = "".join(json.dumps(i, ensure_ascii=False) + "\n" for i in new_ids).encode("utf-8")
+        if not data:
+            return
+        path = self._user_dir(user)
+        os.makedirs(path, exist_ok=True)
+        fd = os.open(os.path.join(path, "sessions.jsonl"), os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(fd, data)
+        finally:
+            os.close(fd)
+
+    def session_ids(self, user: str) -> Set[str]:
+        """
+        Every session id recorded for user by any process; only lines appended since the last call are read.
+        """
+        with self._session_ids_lock:
+            offset, ids = self._session_ids.get(user, (0, set()))
+            try:
+                with open(os.path.join(self._user_dir(user), "sessions.jsonl"), "rb") as f:
+                    f.seek(offset)
+                    data = f.read()
+            except FileNotFoundError:
+                return ids
+            # 쓰는 중인 마지막 줄은 다음 조회 때 읽음
+            end = data.rfind(b"\n") + 1
+            ids.update(json.loads(line) for line in data[:end].splitlines())
+            self._session_ids[user] = (offset + end, ids)
+            return ids
+
+    @contextlib.contextmanager
+    def _lock(self, user: str, exclusive: bool = False):
+        # 프로세스 간 잠금: compact는 배타, 읽기는 공유
+        path = self._user_dir(user)
+        os.makedirs(path, exist_ok=True)
+        with open(os.path.join(path, ".lock"), "a") as f:
+            fcntl.flock(f, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def segment_paths(self, user: str) -> List[str]:
+        path = self._user_dir(user)
+        if not os.path.isdir(path):
+            return []
+        return [os.path.join(path, f) for f in sorted(os.listdir(path)) if _SEGMENT_RE.match(f)]
+
+    @staticmethod
+    def segment_seq(path: str) -> int:
+        return int(_SEGMENT_RE.match(os.path.basename(path)).group(1))
+
+    def append(self, user: str, ts_ms: np.ndarray) -> Optional[str]:
+        """
+        Write a batch of timestamps as a new segment.
+        :param user: User key.
+        :param ts_ms: int64 epoch milliseconds.
+        :return: Path of the written segment, or None for an empty batch.
+        """
+        ts = np.sort(np.asarray(ts_ms, dtype=np.int64))
+        if len(ts) == 0:
+            return None
+        path = self._user_dir(user)
+        os.makedirs(path, exist_ok=True)
+
+        # 임시 파일 이름은 스레드/프로세스마다 달라야 함 (수신이 스레드에서 동시에 실행됨)
+        fd, tmp = tempfile.mkstemp(dir=path, prefix=".seg.", suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            np.save(f, ts)
+        # 다른 프로세스와 번호가 겹치면 다음 번호로 재시도
+        while True:
+            paths = self.segment_paths(user)
+            seq = self.segment_seq(paths[-1]) + 1 if paths else 1
+            target = os.path.join(path, f"seg-{seq:06d}.npy")
+            try:
+                os.link(tmp, target)
+                break
+            except FileExistsError:
+                continue
+        os.unlink(tmp)
+
+        if len(paths) + 1 > MAX_SEGMENTS:
+            self.compact(user)
+        return target
+
+    def segments(self, user: str) -> Iterator[np.ndarray]:
+        """
+        Memory-mapped segments in write order (zero-copy).
+        """
+        for _, seg in self.segments_since(user, 0)[0]:
+            yield seg
+
+    def segments_since(self, user: str, after_seq: int) -> Tuple[List[Tuple[int, np.ndarray]], bool]:
+        """
+        Segments numbered above after_seq, for readers that follow the store incrementally.
+        :param after_seq: Highest segment number the caller has already consumed (0 for none).
+        :return: ([(seq, memory-mapped segment)], rebuild). rebuild is True when a compaction
+                 merged consumed and unconsumed events into one segment; the list then holds
+                 every segment and the caller must start over from it.
+        """
+        if not os.path.isdir(self._user_dir(user)):
+            return [], False
+        with self._lock(user):
+            numbered = [(self.segment_seq(p), p) for p in self.segment_paths(user)]
+            # 번호는 1부터 연속, 가장 작은 번호가 1보다 크면 그 세그먼트는 이전 번호 전체를 합친 것
+            rebuild = bool(numbered) and numbered[0][0] > max(after_seq, 1)
+            return [(seq, np.load(p, mmap_mode="r")) for seq, p in numbered if rebuild or seq > after_seq], rebuild
+
+    def timestamps(self, user: str) -> np.ndarray:
+        """
+        All timestamps of a user, sorted. Zero-copy when the user has a single segment.
+        """
+        segs = list(self.segments(user))
+        if not segs:
+            return np.empty(0, dtype=np.int64)
+        if len(segs) == 1:
+            return segs[0]
+        return np.sort(np.concatenate(segs))
+
+    def compact(self, user: str):
+        """
+        Merge all segments of a user into one.
+        """
+        with self._lock(user, exclusive=True):
+            paths = self.segment_paths(user)
+            if len(paths) <= 1:
+                return
+            merged = np.sort(np.concatenate([np.load(p) for p in paths]))
+            path = self._user_dir(user)
+            tmp = os.path.join(path, f".seg.{os.getpid()}.tmp")
+            with open(tmp, "wb") as f:
+                np.save(f, merged)
+            # 합친 결과가 마지막 세그먼트 번호를 대신함
+            os.replace(tmp, paths[-1])
+            for p in paths[:-1]:
+                os.unlink(p)
+
+
+def import_csv_dir(store: BlinkStore, data_dir: str = "data") -> Dict[str, int]:
+    """
+    One-shot import of data/blink_data_<user>.csv files (ID,TIMESTAMP) into the store.
+    Users that already have segments are skipped.
+    :return: Imported event count per user.
+    """
+    imported = {}
+    for path in sorted(glob.glob(os.path.join(data_dir, "blink_data_*.csv"))):
+        user = os.path.basename(path)[len("blink_data_"):-len(".csv")]
+        if store.segment_paths(user):
+            continue
+        with open(path, newline="") as f:
+            events = [row["TIMESTAMP"] for row in csv.DictReader(f)]
+        store.set_user_name(user, PERSONAS.get(user, user))
+        store.append(user, parse_timestamps(events))
+        imported[user] = len(events)
+    return imported
+
+
+def main():
+    p = argparse.ArgumentParser(description="Columnar blink event store")
+    sub = p.add_subparsers(dest="cmd", required=True)
+    imp = sub.add_parser("import", help="blink_data_*.csv 일괄 가져오기")
+    imp.add_argument("data_dir", type=str, nargs="?", default="data", help="CSV 디렉터리")
+    imp.add_argument("--root", type=str, default=STORE_DIR, help="저장소 경로")
+    cmp = sub.add_parser("compact", help="사용자별 세그먼트 병합")
+    cmp.add_argument("--root", type=str, default=STORE_DIR, help="저장소 경로")
+    args = p.parse_args()
+
+    store = BlinkStore(args.root)
+    if args.cmd == "import":
+        for user, n in import_csv_dir(store, args.data_dir).items():
+            print(f"{user}: {n} events")
+    elif args.cmd == "compact":
+        for user in store.users():
+            store.compact(user)
+            print(f"{user}: {len(store.segment_paths(user))} segment(s)")
+
+
+if __name__ == "__main__":
+    main()
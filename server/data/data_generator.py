@@ -1,6 +1,10 @@
-import pandas as pd
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
 import numpy as np
-from datetime import datetime
 
 # 1 blink per 6 seconds
 # bpm = 10
@@ -30,76 +34,206 @@ PERSONA_NAMES = [
 
 TODAY = "2025-08-10"
 
-def generate_blink_data(persona_index, blink_rate: float, day=TODAY, start_hour=0, end_hour=23):
+MS_PER_HOUR = 3_600_000
+
+
+def generate_days(rng: np.random.Generator, days: np.ndarray, blink_rates: np.ndarray, start_hours, end_hours) -> np.ndarray:
+    """
+    Generate blink timestamps for many days at once.
+    Each day starts at start_hour, adds jittered intervals of 60 / blink_rate ± 0.5 seconds
+    (at most 60 * hours * blink_rate of them) until it passes end_hour, then keeps adding
+    regular intervals if the jittered ones fell short.
+
+    :param rng: Random generator (seeded for reproducible output).
+    :param days: datetime64[D] array of days.
+    :param blink_rates: Blinks per minute for each day.
+    :param start_hours: Start hour per day (scalar or array).
+    :param end_hours: End hour per day (scalar or array), not inclusive.
+    :return: Sorted int64 epoch milliseconds.
+    """
+    days = np.asarray(days, dtype="datetime64[D]")
+    rates = np.asarray(blink_rates, dtype=np.float64)
+    start_hours = np.broadcast_to(np.asarray(start_hours, dtype=np.int64), days.shape)
+    end_hours = np.broadcast_to(np.asarray(end_hours, dtype=np.int64), days.shape)
+    if len(days) == 0:
+        return np.empty(0, dtype=np.int64)
+
+    span = (end_hours - start_hours) * 3600.0
+    step = 60 / rates
+    counts = (60 * (end_hours - start_hours) * rates).astype(np.int64)
+    day_idx = np.repeat(np.arange(len(days)), counts)
+
+    # 하루 안에서의 누적 시각(초): 전체 누적합에서 그날 시작 전까지의 누적합을 뺌
+    intervals = step[day_idx] + rng.uniform(-0.5, 0.5, size=len(day_idx))
+    cum = np.cumsum(intervals)
+    starts = np.concatenate([[0.0], cum])[np.cumsum(counts) - counts]
+    offsets = cum - starts[day_idx]
+    # 직전 깜빡임이 종료 시각 전이면 유지 (종료 시각을 넘는 첫 깜빡임까지 포함)
+    keep = offsets - intervals < span[day_idx]
+    day_idx, offsets = day_idx[keep], offsets[keep]
+
+    # 무작위 간격이 종료 시각에 못 미친 날은 규칙적인 간격으로 채움
+    last = np.zeros(len(days))
+    np.maximum.at(last, day_idx, offsets)
+    short = np.flatnonzero(last < span)
+    if len(short):
+        fill_counts = np.ceil((span[short] - last[short]) / step[short]).astype(np.int64)
+        fill_day = np.repeat(short, fill_counts)
+        k = np.arange(len(fill_day)) - np.repeat(np.cumsum(fill_counts) - fill_counts, fill_counts) + 1
+        day_idx = np.concatenate([day_idx, fill_day])
+        offsets = np.concatenate([offsets, last[fill_day] + k * step[fill_day]])
+
+    day_start = days.astype("datetime64[ms]").astype(np.int64) + start_hours * MS_PER_HOUR
+    return np.sort(day_start[day_idx] + (offsets * 1000).astype(np.int64))
+
+
+def format_timestamps(ts_ms: np.ndarray) -> np.ndarray:
+    """
+    int64 epoch milliseconds -> "YYYY-MM-DDTHH:MM:SS" strings (truncated to seconds).
+    """
+    return np.datetime_as_string(np.asarray(ts_ms, dtype=np.int64).astype("datetime64[ms]").astype("datetime64[s]"))
+
+
+def generate_blink_data(persona_index, blink_rate: float, day=TODAY, start_hour=0, end_hour=23, rng=None):
     """
     Generate blink data of a day for a given persona index and time range.
-    
+
     :param persona_index: Index of the persona in PERSONAS.
     :param blink_rate: Blink rate for the persona.
     :param day: Date for the blink data in "YYYY-MM-DD" format (default is TODAY).
     :param start_hour: Start hour for the data generation (default is 0).
     :param end_hour: End hour for the data generation (default is 23), not inclusive.
-    :return: A string representing the generated blink data.
+    :param rng: Random generator (default is a fresh unseeded one).
+    :return: A list of timestamp strings.
     """
     if persona_index < 0 or persona_index >= len(PERSONAS):
         raise ValueError("Invalid persona index")
+    rng = np.random.default_rng() if rng is None else rng
+    ts = generate_days(rng, np.array([day], dtype="datetime64[D]"), [blink_rate], start_hour, end_hour)
+    return format_timestamps(ts).tolist()
 
-    total_blinks = int(60 * (end_hour - start_hour) * blink_rate)  # Calculate the total number of data points for a day
 
-    data = []
-    start_timestamp = f"{day}T{start_hour:02d}:00:00"
-    start_timestamp = datetime.strptime(start_timestamp, "%Y-%m-%dT%H:%M:%S")
-    timestamp = start_timestamp
-    for blink_id in range(total_blinks):
-        if timestamp < start_timestamp.replace(hour=end_hour, minute=0, second=0, microsecond=0):
-            blink_interval = 60 / blink_rate + np.random.uniform(-0.5, 0.5) # Randomize the blink interval slightly
-            timestamp += pd.Timedelta(seconds=blink_interval)
-            data.append(f"{timestamp.strftime('%Y-%m-%dT%H:%M:%S')}")
-    while timestamp < start_timestamp.replace(hour=end_hour, minute=0, second=0, microsecond=0):
-        timestamp += pd.Timedelta(seconds = 60 / blink_rate)  # Fill in the remaining time with regular blinks
-        data.append(f"{timestamp.strftime('%Y-%m-%dT%H:%M:%S')}")
-    return data
+def persona_timestamps(persona_index: int, rng: np.random.Generator, today: str = TODAY) -> np.ndarray:
+    """
+    Weekday 9-17h history of a persona: PERSONAS[i][-1] is the blink rate of the last
+    7 days before today, PERSONAS[i][-2] of the 7 days before that, and so on.
+    """
+    rates = np.asarray(PERSONAS[persona_index], dtype=np.float64)
+    days = np.datetime64(today, "D") - np.arange(len(rates) * 7, 0, -1)
+    day_rates = np.repeat(rates, 7)
+    weekday = (days.astype(np.int64) + 3) % 7 < 5
+    return generate_days(rng, days[weekday], day_rates[weekday], 9, 17)
+
 
-def generate_blink_data_for_all_personas():
+def generate_blink_data_for_all_personas(rng=None):
     """
     Generate blink data for all personas for a specific day and time range.
 
+    :param rng: Random generator (default is a fresh unseeded one).
     :return: A dictionary with persona names as keys and their corresponding blink data as values.
     """
-    all_persona_data = {}
-    for index, (persona, name) in enumerate(zip(PERSONAS, PERSONA_NAMES)):
-        cur_date = datetime.strptime(TODAY, "%Y-%m-%d")
-        all_persona_data[name] = []
-        for week, blink_rate in enumerate(persona[::-1]):
-            for _ in range(7):  # Generate data for 7 days
-                cur_date -= pd.Timedelta(days=1)
-                if cur_date.weekday() >= 5:  # 5 = Saturday, 6 = Sunday
-                    continue
-                data = generate_blink_data(index, blink_rate, cur_date.strftime("%Y-%m-%d"), start_hour=9, end_hour=17)
-                all_persona_data[name] = data + all_persona_data.get(name, [])
-    return all_persona_data
+    rng = np.random.default_rng() if rng is None else rng
+    return {name: format_timestamps(persona_timestamps(index, rng)).tolist() for index, name in enumerate(PERSONA_NAMES)}
 
-if __name__ == "__main__":
 
-    # Example usage
-    persona_index = 0  # Change this to test different personas
-    day = TODAY
-    start_hour = 9
-    end_hour = 17
+def write_csv(path: str, ts_ms: np.ndarray, chunk: int = 100_000, start_id: int = 0, append: bool = False):
+    """
+    Write ID,TIMESTAMP rows in chunks so memory stays bounded by the chunk size.
+    """
+    with open(path, "a" if append else "w") as f:
+        if not append:
+            f.write("ID,TIMESTAMP\n")
+        for i in range(0, len(ts_ms), chunk):
+            strings = format_timestamps(ts_ms[i : i + chunk])
+            ids = np.arange(start_id + i, start_id + i + len(strings))
+            f.write("\n".join(f"{n},{s}" for n, s in zip(ids.tolist(), strings.tolist())) + "\n")
+
 
-    blink_data = generate_blink_data_for_all_personas()
+# ---- 부하 테스트용 합성 사용자 ----
 
-    for i, (persona, data) in enumerate(blink_data.items()):
-        with open(f"blink_data_{persona}.csv", "w") as f:
-            f.write("ID,TIMESTAMP\n")
-            for idx, line in enumerate(data):
-                timestamp = line.strip()
-                f.write(f"{idx},{timestamp}\n")
-
-            # write for today
-            today_data = generate_blink_data(i, 10.5, TODAY, 4, 11)
-            for idx, line in enumerate(today_data):
-                timestamp = line.strip()
-                f.write(f"{idx + len(data)},{timestamp}\n")
-    
-    print("Blink data generated for all personas.")
\ No newline at end of file
+def synthetic_user(seed: int, index: int, days: int, today: str = TODAY) -> np.ndarray:
+    """
+    Weekday history of one synthetic user over the `days` days before today.
+    The user's working hours and weekly blink-rate random walk come from
+    SeedSequence(seed, spawn_key=(index,)), so output does not depend on worker count.
+    """
+    rng = np.random.default_rng(np.random.SeedSequence(seed, spawn_key=(index,)))
+    start_hour = int(rng.integers(7, 11))
+    end_hour = start_hour + int(rng.integers(7, 10))
+    all_days = np.datetime64(today, "D") - np.arange(days, 0, -1)
+    weeks = (np.arange(days) // 7)
+    rates = np.clip(rng.uniform(6, 14) + np.cumsum(rng.normal(0, 0.4, size=weeks[-1] + 1)), 3, 20)
+    weekday = (all_days.astype(np.int64) + 3) % 7 < 5
+    return generate_days(rng, all_days[weekday], rates[weeks][weekday], start_hour, end_hour)
+
+
+def _write_synthetic_user(args):
+    seed, index, days, out, fmt = args
+    user = f"synth{index:06d}"
+    ts = synthetic_user(seed, index, days)
+    if fmt == "csv":
+        write_csv(os.path.join(out, f"blink_data_{user}.csv"), ts)
+    else:
+        _blink_store().BlinkStore(out).append(user, ts)
+    return len(ts)
+
+
+def _blink_store():
+    # server/blink_store.py (data/에서 실행해도 import 되도록)
+    try:
+        import blink_store
+    except ImportError:
+        sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+        import blink_store
+    return blink_store
+
+
+def generate_synthetic_users(users: int, days: int, out: str, fmt: str = "store", seed: int = 0, jobs: int = 0):
+    """
+    Generate `users` synthetic users across a process pool, each written as soon as it is generated.
+    :param fmt: "store" (columnar BlinkStore under out) or "csv" (blink_data_<user>.csv files in out).
+    :return: Total number of generated events.
+    """
+    os.makedirs(out, exist_ok=True)
+    tasks = [(seed, i, days, out, fmt) for i in range(users)]
+    jobs = jobs if jobs > 0 else (os.cpu_count() or 1)
+    if jobs == 1:
+        return sum(map(_write_synthetic_user, tasks))
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        return sum(pool.map(_write_synthetic_user, tasks, chunksize=max(1, users // (jobs * 8))))
+
+
+def main():
+    p = argparse.ArgumentParser(description="Synthetic blink data")
+    sub = p.add_subparsers(dest="cmd")
+    per = sub.add_parser("personas", help="페르소나 CSV (blink_data_<persona>.csv)")
+    per.add_argument("--seed", type=int, default=None, help="난수 시드 (없으면 매번 다름)")
+    syn = sub.add_parser("synth", help="부하 테스트용 합성 사용자")
+    syn.add_argument("--users", type=int, default=1000, help="사용자 수")
+    syn.add_argument("--days", type=int, default=365, help="오늘 이전 기간(일)")
+    syn.add_argument("--out", type=str, default="store", help="출력 경로 (store 형식이면 저장소 루트)")
+    syn.add_argument("--format", choices=["store", "csv"], default="store", help="컬럼형 저장소 또는 CSV")
+    syn.add_argument("--seed", type=int, default=0, help="난수 시드")
+    syn.add_argument("--jobs", type=int, default=0, help="프로세스 수 (0이면 CPU 코어 수)")
+    args = p.parse_args()
+
+    if args.cmd == "synth":
+        t0 = time.perf_counter()
+        events = generate_synthetic_users(args.users, args.days, args.out, args.format, args.seed, args.jobs)
+        elapsed = time.perf_counter() - t0
+        print(f"{args.users} users, {events} events in {elapsed:.2f}s ({events / elapsed:,.0f} events/s) -> {args.out}")
+        return
+
+    # 하위 명령 없이 실행하면 페르소나 CSV 생성
+    rng = np.random.default_rng(getattr(args, "seed", None))
+    for i, name in enumerate(PERSONA_NAMES):
+        history = persona_timestamps(i, rng)
+        # write for today
+        today = generate_days(rng, np.array([TODAY], dtype="datetime64[D]"), [10.5], 4, 11)
+        write_csv(f"blink_data_{name}.csv", np.concatenate([history, today]))
+
+    print("Blink data generated for all personas.")
+
+
+if __name__ == "__main__":
+    main()
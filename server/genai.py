@@ -1,28 +1,315 @@
 import os
+import json
+import time
+import asyncio
+import hashlib
+import tempfile
 import numpy as np
 import pandas as pd
-import seaborn as sns
-import matplotlib.pyplot as plt
-import matplotlib as mpl
 from io import BytesIO
 from datetime import datetime, timezone
 
-import openai
+try:
+    from .metrics import span
+    from .prompt_builder import build_data_section, templates
+except ImportError:
+    from metrics import span
+    from prompt_builder import build_data_section, templates
 
+# seaborn/matplotlib/openai are imported on first use to keep server startup fast
 
 
 INTERVAL_THRESHOLD = 60  # seconds
 IDEAL_BLINK_PER_MINUTE = 10
 MIN_LOG_NUM = 5
 
+# generate_report_text* return this prefix instead of raising when the completion fails
+REPORT_ERROR_PREFIX = "An error occurred"
 
-# Set your OpenAI API key
-client = openai.OpenAI(
-    # This is the default and can be omitted
-    api_key=os.environ.get("OPENAI_API_KEY"),
+
+# OpenAI clients, created on first use by get_client() / get_async_client()
+client = None
+async_client = None
+
+COMPLETION_PARAMS = dict(
+    model="gpt-4.1-mini",
+    max_tokens=1500,
+    temperature=0.8,
+    top_p=0.9,
 )
 
 
+def get_client():
+    """
+    Return the shared OpenAI client, creating it on first use.
+    """
+    global client
+    if client is None:
+        import openai
+        # Set your OpenAI API key
+        client = openai.OpenAI(
+            # This is the default and can be omitted
+            api_key=os.environ.get("OPENAI_API_KEY"),
+        )
+    return client
+
+
+def get_async_client():
+    """
+    Return the shared AsyncOpenAI client, creating it on first use.
+    """
+    global async_client
+    if async_client is None:
+        import openai
+        async_client = openai.AsyncOpenAI(
+            api_key=os.environ.get("OPENAI_API_KEY"),
+        )
+    return async_client
+
+
+class OpenAIBackend:
+    """
+    Completion backend calling the OpenAI chat API through the shared clients.
+    """
+    name = "openai"
+
+    def complete(self, messages: list, params: dict) -> str:
+        completion = get_client().chat.completions.create(messages=messages, **params)
+        return completion.choices[0].message.content
+
+    async def complete_async(self, messages: list, params: dict) -> str:
+        completion = await get_async_client().chat.completions.create(messages=messages, **params)
+        return completion.choices[0].message.content
+
+    async def stream_async(self, messages: list, params: dict):
+        stream = await get_async_client().chat.completions.create(messages=messages, stream=True, **params)
+        async for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+
+
+class StubBackend:
+    """
+    Deterministic local backend for offline runs and load tests: the same messages
+    always give the same text, after an optional simulated latency (seconds).
+    """
+    name = "stub"
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+
+    def _text(self, messages: list, params: dict) -> str:
+        digest = completion_key(messages, params)[:12]
+        return f"오늘의 눈 깜빡임 리포트 (로컬 스텁 {digest}) 😊 화면을 20분마다 잠깐 쉬어 주세요!"
+
+    def complete(self, messages: list, params: dict) -> str:
+        if self.latency > 0:
+            time.sleep(self.latency)
+        return self._text(messages, params)
+
+    async def complete_async(self, messages: list, params: dict) -> str:
+        if self.latency > 0:
+            await asyncio.sleep(self.latency)
+        return self._text(messages, params)
+
+    async def stream_async(self, messages: list, params: dict):
+        # 지연을 단어 수만큼 나눠서 토큰 스트림처럼 전달
+        words = self._text(messages, params).split(" ")
+        for i, word in enumerate(words):
+            if self.latency > 0:
+                await asyncio.sleep(self.latency / len(words))
+            yield word if i == 0 else " " + word
+
+
+def completion_key(messages: list, params: dict) -> str:
+    """
+    Content address of a completion request: sha256 of the rendered messages and model parameters.
+    """
+    payload = json.dumps({"messages": messages, "params": params}, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class CompletionCache:
+    """
+    On-disk completion cache keyed by completion_key().
+    Files live under <root>/<key[:2]>/<key>.json; reads refresh the file mtime and
+    writes evict the least recently used files beyond max_bytes.
+    """
+    def __init__(self, root: str, max_bytes: int = 64 << 20):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.write_errors = 0
+        # 디렉터리 전체 크기, 첫 쓰기 때 한 번 계산하고 이후 쓰기마다 더함
+        self._bytes = None
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.root, key[:2], key + ".json")
+
+    def get(self, key: str):
+        path = self._path(key)
+        try:
+            with open(path, "r") as f:
+                text = json.load(f)["text"]
+        except (OSError, ValueError, KeyError):
+            self.misses += 1
+            return None
+        # 최근 사용 시각 갱신 (LRU 제거 기준)
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        self.hits += 1
+        return text
+
+    def put(self, key: str, text: str, params: dict = None) -> bool:
+        """
+        Store text under key. Best effort: a failed write (unwritable or full disk) is counted
+        in write_errors and never raised, so a paid completion is still returned to the caller.
+        :return: True when the entry was written.
+        """
+        path = self._path(key)
+        tmp = None
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # 임시 파일 이름이 스레드/프로세스마다 달라야 같은 키를 동시에 써도 섞이지 않음
+            fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+            with os.fdopen(fd, "w") as f:
+                json.dump({"text": text, "params": params, "created_at": time.time()}, f, ensure_ascii=False)
+            size = os.path.getsize(tmp)
+            os.replace(tmp, path)
+        except OSError:
+            self.write_errors += 1
+            if tmp is not None:
+                try:
+                    os.unlink(tmp)
+                except OSError:
+                    pass
+            return False
+        if self._bytes is None:
+            self._bytes = sum(size for _, size, _ in self._files())
+        else:
+            self._bytes += size
+        if self._bytes > self.max_bytes:
+            self._evict()
+        return True
+
+    def _files(self):
+        for dirpath, _, names in os.walk(self.root):
+            for name in names:
+                if name.endswith(".json"):
+                    path = os.path.join(dirpath, name)
+                    try:
+                        st = os.stat(path)
+                    except FileNotFoundError:
+                        continue
+                    yield path, st.st_size, st.st_mtime
+
+    def _evict(self):
+        # 다른 프로세스가 쓴 파일도 포함해서 다시 세고, 오래 안 쓴 것부터 상한의 90%까지 제거
+        files = sorted(self._files(), key=lambda f: f[2])
+        total = sum(size for _, size, _ in files)
+        target = int(self.max_bytes * 0.9)
+        for path, size, _ in files:
+            if total <= target:
+                break
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+            except OSError:
+                continue
+            total -= size
+            self.evictions += 1
+        self._bytes = total
+
+    def stats(self):
+        return {"root": self.root, "bytes": self._bytes, "max_bytes": self.max_bytes,
+                "hits": self.hits, "misses": self.misses, "evictions": self.evictions,
+                "write_errors": self.write_errors}
+
+
+def _default_backend():
+    # CHOC_LLM_BACKEND=stub 이면 OpenAI 없이 결정적인 로컬 응답 (CHOC_LLM_STUB_LATENCY 초 지연)
+    if os.environ.get("CHOC_LLM_BACKEND", "openai") == "stub":
+        return StubBackend(float(os.environ.get("CHOC_LLM_STUB_LATENCY", "0")))
+    return OpenAIBackend()
+
+
+# 실행 경로와 무관하게 server/data/llm_cache (prompts/와 같은 방식)
+LLM_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "llm_cache")
+
+
+def _default_cache():
+    # CHOC_LLM_CACHE=0 이면 캐시 끔
+    if os.environ.get("CHOC_LLM_CACHE", "1") == "0":
+        return None
+    return CompletionCache(
+        os.environ.get("CHOC_LLM_CACHE_DIR", LLM_CACHE_DIR),
+        max_bytes=int(os.environ.get("CHOC_LLM_CACHE_MAX_BYTES", str(64 << 20))),
+    )
+
+
+# 교체 가능: 테스트/벤치마크는 StubBackend(), 캐시 없이 측정하려면 None
+completion_backend = _default_backend()
+completion_cache = _default_cache()
+
+
+def complete(messages: list, params: dict = None) -> str:
+    """
+    Completion text for messages, from the cache when the same request was answered before.
+    Exceptions from the backend propagate and nothing is cached.
+    """
+    params = COMPLETION_PARAMS if params is None else params
+    key = completion_key(messages, params) if completion_cache is not None else None
+    if key is not None:
+        text = completion_cache.get(key)
+        if text is not None:
+            return text
+    text = completion_backend.complete(messages, params)
+    if key is not None:
+        completion_cache.put(key, text, params)
+    return text
+
+
+async def complete_async(messages: list, params: dict = None) -> str:
+    """
+    Same as complete(), awaiting the backend without blocking the event loop.
+    """
+    params = COMPLETION_PARAMS if params is None else params
+    key = completion_key(messages, params) if completion_cache is not None else None
+    if key is not None:
+        text = completion_cache.get(key)
+        if text is not None:
+            return text
+    text = await completion_backend.complete_async(messages, params)
+    if key is not None:
+        completion_cache.put(key, text, params)
+    return text
+
+
+async def complete_stream(messages: list, params: dict = None):
+    """
+    Stream the completion text in pieces; a cached answer is yielded whole.
+    The full text is cached once the stream finishes.
+    """
+    params = COMPLETION_PARAMS if params is None else params
+    key = completion_key(messages, params) if completion_cache is not None else None
+    if key is not None:
+        text = completion_cache.get(key)
+        if text is not None:
+            yield text
+            return
+    pieces = []
+    async for piece in completion_backend.stream_async(messages, params):
+        pieces.append(piece)
+        yield piece
+    if key is not None:
+        completion_cache.put(key, "".join(pieces), params)
+
+
 def get_weather_forecast():
     """
     Function to get the weather forecast for tomorrow.
@@ -44,6 +331,42 @@ def load_blink_data(file_path: str) -> str:
     except Exception as e:
         return f"An error occurred while loading the data: {e}"
 
+def period_keys(timestamps):
+    """
+    Compute integer period keys for every timestamp without per-row Python calls.
+    :param timestamps: datetime64 Series or array of blink timestamps.
+    :return: (month, week, hour) int64 arrays. Months count from 1970-01,
+             weeks are the epoch day of the ISO week's Monday, hours count from the epoch.
+    """
+    values = np.asarray(timestamps, dtype="datetime64[ns]")
+    days = values.astype("datetime64[D]").astype(np.int64)
+    months = values.astype("datetime64[M]").astype(np.int64)
+    # 1970-01-01 was a Thursday, so (day + 3) % 7 is the ISO weekday (Mon=0)
+    weeks = days - (days + 3) % 7
+    hours = values.astype("datetime64[h]").astype(np.int64)
+    return months, weeks, hours
+
+def month_labels(keys) -> np.ndarray:
+    """Format month keys as "%Y-%m"."""
+    return np.datetime_as_string(np.asarray(keys, dtype=np.int64).astype("datetime64[M]"), unit="M")
+
+def week_labels(keys) -> np.ndarray:
+    """Format week keys as "<ISO year>-W<ISO week>"."""
+    # ISO week belongs to the year its Thursday falls in
+    thursdays = (np.asarray(keys, dtype=np.int64) + 3).astype("datetime64[D]")
+    years = thursdays.astype("datetime64[Y]")
+    weeks = (thursdays - years.astype("datetime64[D]")).astype(np.int64) // 7 + 1
+    return np.array([f"{y}-W{w}" for y, w in zip(years.astype(np.int64) + 1970, weeks)], dtype=object)
+
+def hour_labels(keys) -> np.ndarray:
+    """Format hour keys as "%Y-%m-%dT%H"."""
+    return np.datetime_as_string(np.asarray(keys, dtype=np.int64).astype("datetime64[h]"), unit="h")
+
+def _bpm_by_period(intervals: np.ndarray, keys: np.ndarray, mask: np.ndarray, labeler, name: str) -> pd.Series:
+    grouped = pd.Series(intervals[mask], name="BLINK_INTERVAL").groupby(keys[mask], sort=True).mean()
+    grouped.index = pd.Index(labeler(grouped.index.to_numpy(dtype=np.int64)), dtype=object, name=name)
+    return 60 / grouped
+
 def analyze_tablet_data(data):
     # Expected output dataframe format:
     # ID, DATE, HOUR, BLINKS_PER_HOUR
@@ -51,61 +374,90 @@ def analyze_tablet_data(data):
     # 2, "2025-08-06", 4, 300
     # 3, "2025-08-06", 5, 350
 
-    data['DATE_MONTH'] = data.TIMESTAMP.apply(lambda x: x.strftime("%Y-%m"))
-    data['DATE_WEEK'] = data.TIMESTAMP.apply(lambda x: x.strftime("%Y") + "-W" + str(x.isocalendar()[1]))
-    data['DATE_HOUR'] = data.TIMESTAMP.apply(lambda x: x.strftime("%Y-%m-%dT%H"))
+    # 행 단위 strftime 대신 정수 기간 키로 버킷팅 (라벨은 그룹 수만큼만 생성)
+    months, weeks, hours = period_keys(data.TIMESTAMP)
+    intervals = data.BLINK_INTERVAL.to_numpy(dtype=np.float64)
 
-    last_month = data[data.DATE_MONTH.apply(lambda x: datetime.strptime(x, "%Y-%m")) < datetime.strptime(data.iloc[-1].TIMESTAMP.strftime("%Y-%m"), "%Y-%m")]
-    last_week = data[data.DATE_WEEK == data.iloc[-1].TIMESTAMP.strftime("%Y") + "-W" + str(data.iloc[-1].TIMESTAMP.isocalendar()[1] - 1)]
-    this_week = data[data.DATE_WEEK == data.iloc[-1].TIMESTAMP.strftime("%Y") + "-W" + str(data.iloc[-1].TIMESTAMP.isocalendar()[1])]
-    bpm_history_month = 60 / last_month.groupby('DATE_MONTH').BLINK_INTERVAL.mean()
-    bpm_history_week = 60 / last_week.groupby('DATE_WEEK').BLINK_INTERVAL.mean()
-    bpm_this_week = 60 / this_week.groupby('DATE_HOUR').BLINK_INTERVAL.mean()
+    last_month = months < months[-1]
+    last_week = weeks == weeks[-1] - 7
+    this_week = weeks == weeks[-1]
+    bpm_history_month = _bpm_by_period(intervals, months, last_month, month_labels, "DATE_MONTH")
+    bpm_history_week = _bpm_by_period(intervals, weeks, last_week, week_labels, "DATE_WEEK")
+    bpm_this_week = _bpm_by_period(intervals, hours, this_week, hour_labels, "DATE_HOUR")
     
     return (bpm_history_month, bpm_history_week, bpm_this_week)
 
+def _whole_second_intervals(ts_ns: np.ndarray) -> np.ndarray:
+    # 이전 깜빡임과의 간격(초, 소수점 버림), 첫 원소는 NaN
+    intervals = np.empty(len(ts_ns), dtype=np.float64)
+    intervals[:1] = np.nan
+    intervals[1:] = np.diff(ts_ns) // 1_000_000_000
+    return intervals
+
 def clean_and_slide_data(data: pd.DataFrame, date: str) -> pd.DataFrame:
     """
     Clean and slide the blink data.
+    Intervals are whole seconds between consecutive blinks (sorted by time) and only
+    intervals below INTERVAL_THRESHOLD are kept. The day is re-diffed over the kept
+    blinks and bucketed by hour in one pass over a sorted int64 array.
     :param data: DataFrame containing the blink data.
-    :return: Cleaned and slid DataFrame.
+    :param date: Day in "YYYY-MM-DD" format.
+    :return: (cleaned history with BLINK_INTERVAL / BLINK_PER_MINUTE columns,
+             hourly mean blinks per minute of the day indexed by "%H", hours with at least MIN_LOG_NUM logs).
     """
-
     data['TIMESTAMP'] = pd.to_datetime(data['TIMESTAMP'])
-    data['BLINK_INTERVAL'] = data.TIMESTAMP.diff()
-    data['BLINK_INTERVAL'] = data['BLINK_INTERVAL'].dt.seconds
-    data['BLINK_PER_MINUTE'] = 60 / data['BLINK_INTERVAL']
-    data.dropna(inplace=True)
-    data = data[data['BLINK_INTERVAL'] < INTERVAL_THRESHOLD]
-    slided_data = data.copy()
-    
-    # Filter data for the given date
-    filtered_df = data[pd.to_datetime(data['TIMESTAMP']).dt.strftime("%Y-%m-%d") == date]
-    if filtered_df.empty:
+    if not data['TIMESTAMP'].is_monotonic_increasing:
+        data = data.sort_values('TIMESTAMP', kind='stable')
+    timestamps = data['TIMESTAMP']
+    # 시간대가 있으면 그 시간대의 벽시계 시각으로 날짜/시간을 나눔
+    if timestamps.dt.tz is not None:
+        timestamps = timestamps.dt.tz_localize(None)
+    ts = timestamps.to_numpy(dtype="datetime64[ns]").view(np.int64)
+
+    # 간격/유효 마스크는 한 번만 계산 (.dt.seconds와 달리 하루 이상 간격도 그대로 초로 셈)
+    intervals = _whole_second_intervals(ts)
+    keep = intervals < INTERVAL_THRESHOLD
+    others = data.columns.difference(['TIMESTAMP'])
+    if len(others) and data[others].isna().any(axis=None):
+        keep &= data[others].notna().all(axis=1).to_numpy()
+    with np.errstate(divide="ignore"):
+        bpm = 60 / intervals[keep]
+    slided_data = data.loc[keep].copy()
+    slided_data['BLINK_INTERVAL'] = intervals[keep]
+    slided_data['BLINK_PER_MINUTE'] = bpm
+
+    # 날짜 구간을 이진 탐색으로 잘라냄
+    kept_ts = ts[keep]
+    day_start = np.datetime64(date, "D").astype("datetime64[ns]").astype(np.int64)
+    lo, hi = np.searchsorted(kept_ts, [day_start, day_start + 86_400_000_000_000])
+    if hi - lo == 0:
         print(f"No data available for {date}")
         return pd.Series(dtype=float), pd.Series(dtype=float)
-    print(len(filtered_df), "rows gathered this session")
-
-    filtered_df['TIMESTAMP'] = pd.to_datetime(filtered_df['TIMESTAMP'])
-    # 간격(초) 계산: total_seconds() 사용
-    filtered_df['BLINK_INTERVAL'] = filtered_df.TIMESTAMP.diff()
-    filtered_df['BLINK_INTERVAL'] = filtered_df['BLINK_INTERVAL'].dt.seconds
-    # BPM 계산
-    filtered_df['BLINK_PER_MINUTE'] = 60 / filtered_df['BLINK_INTERVAL']
-    # inf/-inf 제거
-    filtered_df.dropna(inplace=True)
-    # 너무 긴 간격 필터 (노이즈 컷)
-    filtered_df = filtered_df[filtered_df['BLINK_INTERVAL'] < INTERVAL_THRESHOLD]
-
+    print(hi - lo, "rows gathered this session")
+
+    # 그날 남은 깜빡임끼리 다시 간격 계산 → 노이즈 컷 → 시간별 개수/평균 한 번에
+    day_ts = kept_ts[lo:hi]
+    day_intervals = _whole_second_intervals(day_ts)
+    valid = day_intervals < INTERVAL_THRESHOLD
+    hours = (day_ts[valid] - day_start) // 3_600_000_000_000
+    with np.errstate(divide="ignore"):
+        day_bpm = 60 / day_intervals[valid]
+    counts = np.bincount(hours, minlength=24)
+    sums = np.bincount(hours, weights=day_bpm, minlength=24)
     # 시간별 평균(로그 수가 충분한 시간대만)
-    min_filter = (filtered_df.groupby(pd.Grouper(key='TIMESTAMP', freq='h'))['BLINK_PER_MINUTE'].count() >= MIN_LOG_NUM).values
-    grouped = filtered_df.groupby(pd.Grouper(key='TIMESTAMP', freq='h'))['BLINK_PER_MINUTE'].mean()
-    grouped = grouped[min_filter]
-    grouped.index = grouped.index.strftime('%H')
-    
+    enough = np.flatnonzero(counts >= MIN_LOG_NUM)
+    grouped = pd.Series(
+        sums[enough] / counts[enough],
+        index=pd.Index([f"{h:02d}" for h in enough], dtype=object, name="TIMESTAMP"),
+        name="BLINK_PER_MINUTE",
+    )
+
     return slided_data, grouped
 
 def plot_blink_data(cleaned_data: pd.DataFrame, date: str):
+    import seaborn as sns
+    import matplotlib.pyplot as plt
+
     sns.set_theme(style="whitegrid")
 
     # Series/DF → 숫자 시리즈로 정규화
@@ -164,62 +516,108 @@ def plot_blink_data(cleaned_data: pd.DataFrame, date: str):
     return img
 
 
-def generate_report_text(user_info: dict = None, histories: dict = None) -> str:
+def build_report_messages(user_info: dict = None, histories: dict = None) -> list:
     """
-    Function to analyze tablet data using ChatGPT.
-    :param data: DataFrame containing the blink data.
-    :return: A generated report as a string.
+    Build the chat messages for the daily report.
+    :param user_info: User information shown to the model.
+    :param histories: (last_month, last_week, this_week) as returned by analyze_tablet_data.
+    :return: A list of chat messages.
     """
     today = datetime.today()
     # today = "2025-08-10 11:13:01"
     weather = get_weather_forecast()
 
-    last_month, last_week, this_week = histories
-    text_data = "================================\n"
-    text_data += "지난 월별 분당 평균 눈 깜빡임 횟수:\n" + \
-        "\n".join(f"{row.DATE_MONTH}, {row.BLINK_INTERVAL:.2f}" for _, row in last_month.to_frame().reset_index().iterrows()) + "\n"
-    text_data += "--------------------------------\n"
-    text_data += "지난 주의 분당 평균 눈 깜빡임 횟수:\n" + \
-        "\n".join(f"{row.DATE_WEEK}, {row.BLINK_INTERVAL:.2f}" for _, row in last_week.to_frame().reset_index().iterrows()) + "\n"
-    text_data += "--------------------------------\n"
-    text_data += "이번 주의 일별 분당 평균 눈 깜빡임 횟수:\n" + \
-        "\n".join(f"{row.DATE_HOUR}, {row.BLINK_INTERVAL:.2f}" for _, row in this_week.to_frame().reset_index().iterrows()) + "\n"
-    text_data += "===============================\n"
-    today_data = this_week.to_frame().reset_index()
-    today_data['DATE'] = [datetime.strptime(index, "%Y-%m-%dT%H").date() for index in this_week.index]
-    today_data = today_data[today_data.DATE == today.date()]
-    text_data += "오늘의 시간별 평균 분당 눈 깜빡임 횟수:\n" + \
-        "\n".join(f"{row.DATE_HOUR}, {row.BLINK_INTERVAL:.2f}" for _, row in today_data.iterrows()) + "\n"
-    text_data += "===============================\n"
-    
-    with open('prompts/system_prompt.txt', 'r') as file:
-        system_prompt = file.read().format(today=today.strftime("%Y-%m-%d %H:%M:%S"), data=text_data, weather=weather, user=user_info)
-    with open('prompts/daily_report.txt', 'r') as file:
-        prompt = file.read()
-        prompt = prompt
+    # 오래된 기간은 토큰 예산 안에서 요약 (PROMPT_TOKEN_BUDGET)
+    text_data = build_data_section(histories, today)
+
+    # 템플릿은 한 번 읽고 파일이 바뀔 때만 다시 읽음
+    # 시각은 시 단위까지만 넣어서 같은 시간대의 같은 통계는 같은 메시지가 되도록 (completion_cache 적중)
+    system_prompt = templates.get('system_prompt.txt').format(today=today.strftime("%Y-%m-%d %H:00"), data=text_data, weather=weather, user=user_info)
+    prompt = templates.get('daily_report.txt')
     print("System Prompt:\n", system_prompt)
     print("-------------------------------------")
 
+    return [
+        {
+            "role": "system", "content": system_prompt
+        },
+        {
+            "role": "user",
+            "content": prompt,
+        },
+    ]
+
+def generate_report_text(user_info: dict = None, histories: dict = None) -> str:
+    """
+    Function to analyze tablet data using ChatGPT.
+    :param data: DataFrame containing the blink data.
+    :return: A generated report as a string.
+    """
+    with span("build_report_messages"):
+        messages = build_report_messages(user_info=user_info, histories=histories)
     try:
-        completion = client.chat.completions.create(
-            model="gpt-4.1-mini",
-            messages=[
-                {
-                    "role": "system", "content": system_prompt
-                },
-                {
-                    "role": "user",
-                    "content": prompt,
-                },
-            ],
-            max_tokens=1500,
-            temperature=0.8,
-            top_p=0.9,
-        )
-        report = completion.choices[0].message.content
+        with span("llm_completion"):
+            report = complete(messages)
+        return report
+    except Exception as e:
+        return f"{REPORT_ERROR_PREFIX}: {e}"
+
+async def generate_report_text_async(user_info: dict = None, histories: dict = None) -> str:
+    """
+    Same as generate_report_text, but awaits the completion without blocking the event loop.
+    """
+    with span("build_report_messages"):
+        messages = build_report_messages(user_info=user_info, histories=histories)
+    try:
+        with span("llm_completion"):
+            report = await complete_async(messages)
         return report
     except Exception as e:
-        return f"An error occurred: {e}"
+        return f"{REPORT_ERROR_PREFIX}: {e}"
+
+async def generate_report_text_stream(user_info: dict = None, histories: dict = None):
+    """
+    Same as generate_report_text_async, but yields the text as it is generated.
+    LLM errors are raised instead of yielded as text, since part of the report may already be out.
+    """
+    with span("build_report_messages"):
+        messages = build_report_messages(user_info=user_info, histories=histories)
+    with span("llm_completion"):
+        async for piece in complete_stream(messages):
+            yield piece
+
+def is_report_error(text: str) -> bool:
+    """
+    True when text is the error message of a failed generate_report_text* call (never cache it).
+    """
+    return text.startswith(REPORT_ERROR_PREFIX)
+
+def template_report(user_info: dict, histories: tuple, hourly: pd.Series, daily_bpm: float) -> str:
+    """
+    Fast deterministic summary of the same statistics, shown until the LLM narrative is ready.
+    :param histories: (last_month, last_week, this_week) as returned by analyze_tablet_data.
+    :param hourly: Hourly mean blinks per minute of the report day, indexed by "%H".
+    :param daily_bpm: Mean blinks per minute of the report day.
+    """
+    name = (user_info or {}).get('user_name') or '사용자'
+    last_month, last_week, _ = histories
+    lines = []
+    if hourly is None or hourly.empty:
+        lines.append(f"{name}님, 오늘은 아직 눈 깜빡임 기록이 충분하지 않아요. 조금 더 사용한 뒤 다시 확인해 주세요 👀")
+    else:
+        state = "잘 지키고 있어요 😊" if daily_bpm >= IDEAL_BLINK_PER_MINUTE else "조금 부족해요. 의식적으로 깜빡여 주세요 👀"
+        lines.append(f"{name}님, 오늘 분당 평균 눈 깜빡임은 {daily_bpm:.1f}회로 권장 {IDEAL_BLINK_PER_MINUTE}회를 {state}")
+        finite = hourly.replace([np.inf, -np.inf], np.nan).dropna()
+        if len(finite) >= 2:
+            low, high = finite.idxmin(), finite.idxmax()
+            lines.append(f"가장 적게 깜빡인 때는 {int(low)}시({finite[low]:.1f}회), 가장 많이 깜빡인 때는 {int(high)}시({finite[high]:.1f}회)예요.")
+    if last_week is not None and len(last_week) and hourly is not None and not hourly.empty:
+        diff = daily_bpm - float(last_week.iloc[-1])
+        trend = "늘었어요" if diff > 0 else "줄었어요" if diff < 0 else "같아요"
+        lines.append(f"지난주 평균({float(last_week.iloc[-1]):.1f}회)보다 {abs(diff):.1f}회 {trend}.")
+    elif last_month is not None and len(last_month):
+        lines.append(f"지난달 평균은 {float(last_month.iloc[-1]):.1f}회였어요.")
+    return "\n".join(lines)
 
 def generate_report(raw_data: pd.DataFrame, user_info: dict = None) -> str:
     """
@@ -230,13 +628,36 @@ def generate_report(raw_data: pd.DataFrame, user_info: dict = None) -> str:
     # Plot the blink data
     date = datetime.now().strftime("%Y-%m-%d")
     # date = datetime.now().strftime("2025-08-10")
-    slided_data, cleaned_data = clean_and_slide_data(raw_data, date)
-    image = plot_blink_data(cleaned_data, date)
+    with span("clean_and_slide_data"):
+        slided_data, cleaned_data = clean_and_slide_data(raw_data, date)
+    with span("analyze_tablet_data"):
+        analyzed = analyze_tablet_data(slided_data)
+    return render_report(cleaned_data, analyzed, date, user_info=user_info)
+
+def render_chart(cleaned_data: pd.Series, date: str):
+    """
+    CPU-bound part of the report: the PNG chart and the daily mean.
+    :param cleaned_data: Hourly mean blinks per minute of the report date, indexed by "%H".
+    :param date: Report date in "YYYY-MM-DD" format.
+    :return: (PNG bytes, daily mean blinks per minute).
+    """
+    with span("plot_blink_data"):
+        image = plot_blink_data(cleaned_data, date)
     daily_bpm = (cleaned_data.mean() if cleaned_data is not None and not cleaned_data.empty else 0)
+    return image, daily_bpm
+
+def render_report(cleaned_data: pd.Series, histories: tuple, date: str, user_info: dict = None) -> dict:
+    """
+    Render the chart and report text from already aggregated statistics.
+    :param cleaned_data: Hourly mean blinks per minute of the report date, indexed by "%H".
+    :param histories: (last_month, last_week, this_week) as returned by analyze_tablet_data.
+    :param date: Report date in "YYYY-MM-DD" format.
+    :return: A dictionary with the report text and the PNG chart.
+    """
+    image, daily_bpm = render_chart(cleaned_data, date)
 
     # Generate the report text
-    analyzed = analyze_tablet_data(slided_data)
-    report_text = generate_report_text(user_info=user_info, histories=analyzed)
+    report_text = generate_report_text(user_info=user_info, histories=histories)
 
     # Return the report text and image
     return {
@@ -246,6 +667,15 @@ def generate_report(raw_data: pd.DataFrame, user_info: dict = None) -> str:
         "daily_line_plot": image,
     }
 
+def warm_worker():
+    """
+    Process pool initializer: import the plotting stack once per worker.
+    """
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot  # noqa: F401
+    import seaborn  # noqa: F401
+
 # Example usage
 if __name__ == "__main__":
     # Replace this with your actual tablet data
@@ -1,34 +1,139 @@
 # server/main.py
 import time
+_T0 = time.perf_counter()
+import os
 import contextlib
 import asyncio
-import pandas as pd
-import queue
+import json
 import base64
 from datetime import datetime
-from typing import Dict
-from fastapi import FastAPI
+from typing import Dict, List, Optional, Set, Tuple
+from fastapi import FastAPI, Request, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from pydantic import BaseModel, ValidationError
+import numpy as np
 
-
-# (패키지/모듈 실행 모두 대응)
 try:
-    from .genai import analyze_tablet_data, generate_report 
-except Exception:
-    print("Error importing relative genai module. Trying absolute import.")
+    from .blink_store import BlinkStore, import_csv_dir, parse_timestamps, decode_timestamps
+    from .report_cache import ReportCache
+    from .session_store import open_session_store
+    from .report_executor import ReportExecutor, Overloaded
+    from .metrics import REGISTRY, SIZE_BUCKETS, COUNT_BUCKETS, span, timing_scope, server_timing
+    from .report_batch import ReportArchive, run_batch, seconds_until
+    from .report_narrative import NarrativeRegistry
+except ImportError:
+    from blink_store import BlinkStore, import_csv_dir, parse_timestamps, decode_timestamps
+    from report_cache import ReportCache
+    from session_store import open_session_store
+    from report_executor import ReportExecutor, Overloaded
+    from metrics import REGISTRY, SIZE_BUCKETS, COUNT_BUCKETS, span, timing_scope, server_timing
+    from report_batch import ReportArchive, run_batch, seconds_until
+    from report_narrative import NarrativeRegistry
+
+# 분석 모듈(pandas/matplotlib/openai)은 무거워서 warm-up 때 로드
+analyze_tablet_data = None
+generate_report = None
+render_report = None
+render_chart = None
+generate_report_text_async = None
+generate_report_text_stream = None
+template_report = None
+is_report_error = None
+warm_worker = None
+RollupStore = None
+RollingBlinkRate = None
+IDEAL_BLINK_PER_MINUTE = None
+
+# VAD 모델 풀 크기 (동시 /vad-stream 연결 수 상한, 모델은 연결이 필요로 할 때 로드)
+VAD_POOL_SIZE = int(os.environ.get("CHOC_VAD_POOL_SIZE", "4"))
+# 시작할 때 미리 로드할 모델 수 (기본 0: 워커마다 torch/ONNX 세션을 올리지 않음)
+VAD_WARM = int(os.environ.get("CHOC_VAD_WARM", "0"))
+vad_pool = None
+
+# CHOC_WARMUP=0 이면 백그라운드 warm-up 없이 첫 리포트 요청 때 로드
+WARMUP_ON_STARTUP = os.environ.get("CHOC_WARMUP", "1") != "0"
+
+# 시작 단계별 소요 시간(초), /health 로 노출
+startup_timings: Dict[str, float] = {}
+
+def _import_analysis():
+    global analyze_tablet_data, generate_report, render_report, render_chart, generate_report_text_async, warm_worker, RollupStore
+    global RollingBlinkRate, IDEAL_BLINK_PER_MINUTE, generate_report_text_stream, template_report, is_report_error
+    # (패키지/모듈 실행 모두 대응)
     try:
-        from genai import analyze_tablet_data, generate_report
+        from .genai import analyze_tablet_data, generate_report, render_report, render_chart, generate_report_text_async, warm_worker
+        from .genai import IDEAL_BLINK_PER_MINUTE, generate_report_text_stream, template_report, is_report_error
+        from .rollup import RollupStore, RollingBlinkRate
     except Exception:
-        print("Error importing genai functions. Ensure genai directory is in the same directory or properly installed.")
-        analyze_tablet_data = None
-        generate_report = None
+        print("Error importing relative genai module. Trying absolute import.")
+        try:
+            from genai import analyze_tablet_data, generate_report, render_report, render_chart, generate_report_text_async, warm_worker
+            from genai import IDEAL_BLINK_PER_MINUTE, generate_report_text_stream, template_report, is_report_error
+            from rollup import RollupStore, RollingBlinkRate
+        except Exception:
+            print("Error importing genai functions. Ensure genai directory is in the same directory or properly installed.")
 
 class BlinkSession(BaseModel):
     id: str
-    events: list[str]
+    events: list[str] = []
     startedAt: str
     endedAt: str
+    # events 대신 보낼 수 있는 바이너리 인코딩 (blink_store.encode_timestamps)의 base64
+    eventsBin: Optional[str] = None
+
+# ---- 지표 (/metrics, Prometheus 텍스트 형식) ----
+HTTP_SECONDS = REGISTRY.histogram("choc_http_request_seconds", "HTTP request latency", ["method", "route", "status"])
+HTTP_REQUEST_BYTES = REGISTRY.histogram("choc_http_request_bytes", "HTTP request body size", ["route"], buckets=SIZE_BUCKETS)
+HTTP_RESPONSE_BYTES = REGISTRY.histogram("choc_http_response_bytes", "HTTP response body size", ["route"], buckets=SIZE_BUCKETS)
+SESSION_EVENTS = REGISTRY.histogram("choc_session_events", "Blink events per received session", buckets=COUNT_BUCKETS)
+INGESTED_EVENTS = REGISTRY.counter("choc_ingested_events_total", "Blink events written to the history store")
+REGISTRY.gauge("choc_report_pending", "Reports running or queued in the report executor").set_function(
+    lambda: report_executor.pending)
+
+# CHOC_SERVER_TIMING=1 이면 응답마다 단계별 소요 시간을 Server-Timing 헤더로 추가
+SERVER_TIMING_HEADER = os.environ.get("CHOC_SERVER_TIMING", "0") != "0"
+
+class MetricsMiddleware:
+    """
+    HTTP 요청별 지연/요청·응답 본문 크기 기록 (ASGI 미들웨어, 본문은 복사하지 않고 길이만 셈)
+    - route 라벨은 경로 템플릿 (예: /processed-data/{request_id}), 매칭 실패 시 "unmatched"
+    - timing_header=True 면 요청 중 기록된 span들을 Server-Timing 헤더로 전송
+    """
+    def __init__(self, app, timing_header: bool = False):
+        self.app = app
+        self.timing_header = timing_header
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        t0 = time.perf_counter()
+        state = {"status": 500, "received": 0, "sent": 0}
+
+        async def counting_receive():
+            message = await receive()
+            if message["type"] == "http.request":
+                state["received"] += len(message.get("body", b""))
+            return message
+
+        with timing_scope() as timings:
+            async def timed_send(message):
+                if message["type"] == "http.response.start":
+                    state["status"] = message["status"]
+                    if self.timing_header:
+                        value = server_timing(timings, time.perf_counter() - t0)
+                        message = {**message, "headers": [*message.get("headers", []), (b"server-timing", value.encode())]}
+                elif message["type"] == "http.response.body":
+                    state["sent"] += len(message.get("body", b""))
+                await send(message)
+
+            try:
+                await self.app(scope, counting_receive, timed_send)
+            finally:
+                route = getattr(scope.get("route"), "path", "unmatched")
+                HTTP_SECONDS.observe(time.perf_counter() - t0, method=scope["method"], route=route, status=state["status"])
+                HTTP_REQUEST_BYTES.observe(state["received"], route=route)
+                HTTP_RESPONSE_BYTES.observe(state["sent"], route=route)
 
 app = FastAPI()
 
@@ -39,161 +144,789 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(MetricsMiddleware, timing_header=SERVER_TIMING_HEADER)
 
-data_store: Dict[str, Dict] = {}
-history_store: Dict[str, Dict] = {}
-for user_name, name in zip(
-    ['판교 개발자 영진', '노모어피자 치즈크러스트', '애플 디톡스', '야근조아', '퇴근덕후', '김연진사생팬'],
-    ['increase', 'decrease', 'stable', 'month', 'week', 'first']
-):
-    history_store[name] = (user_name, pd.read_csv(f'data/blink_data_{name}.csv'))
+# 수신 세션 메타데이터 (TTL 만료 + 항목 수/바이트 상한, 초과 시 LRU 제거)
+# uvicorn --workers N 이면 CHOC_SESSION_BACKEND=sqlite 로 워커 간 공유
+data_store = open_session_store(
+    os.environ.get("CHOC_SESSION_BACKEND", "memory"),
+    path=os.environ.get("CHOC_SESSION_DB", "data/sessions.db"),
+    ttl=float(os.environ.get("CHOC_SESSION_TTL", "3600")),
+    max_entries=int(os.environ.get("CHOC_SESSION_MAX_ENTRIES", "100000")),
+    max_bytes=int(os.environ.get("CHOC_SESSION_MAX_BYTES", str(64 << 20))),
+)
+# 사용자별 깜빡임 기록 (컬럼형 디스크 저장소, 최초 실행 시 페르소나 CSV 가져오기)
+_t = time.perf_counter()
+history_store = BlinkStore()
+if not history_store.users():
+    import_csv_dir(history_store, 'data')
+startup_timings["store_open"] = time.perf_counter() - _t
+
+# 세션 리포트 대상 사용자 (클라이언트가 아직 사용자 식별자를 보내지 않음)
+REPORT_USER = 'increase'
+
+# 사용자별 기간 집계: 수신 시점에 누적하고 리포트는 버킷만 읽음 (warm-up 후 생성)
+# 다른 워커가 쓴 세그먼트와 warm-up 중 수신분은 리포트 직전 sync()로 반영
+rollup_store = None
+_warmup_task: Optional[asyncio.Task] = None
+
+# /processed-data 결과 캐시
+report_cache = ReportCache(
+    max_entries=int(os.environ.get("CHOC_REPORT_CACHE_SIZE", "256")),
+    ttl=float(os.environ.get("CHOC_REPORT_CACHE_TTL", "3600")),
+)
+
+# 리포트 생성(차트 렌더링)용 프로세스 풀과 대기열 상한, 초과 시 429
+report_executor = ReportExecutor(
+    workers=int(os.environ.get("CHOC_REPORT_WORKERS", "2")),
+    max_pending=int(os.environ.get("CHOC_REPORT_QUEUE", "8")),
+)
+
+# 미리 만든 리포트 (report_batch), 데이터 버전(마지막 세그먼트 번호)이 같으면 그대로 응답
+report_archive = ReportArchive()
+# CHOC_REPORT_BATCH_AT="03:00" 이면 매일 그 시각에 전체 사용자 리포트를 미리 생성
+REPORT_BATCH_AT = os.environ.get("CHOC_REPORT_BATCH_AT", "")
+REPORT_BATCH_LLM_CONCURRENCY = int(os.environ.get("CHOC_REPORT_BATCH_LLM_CONCURRENCY", "4"))
+
+# 지연 예산 모드: /processed-data?budget=초 (기본 CHOC_REPORT_BUDGET, 비어 있으면 LLM 본문까지 기다림)
+# 예산 안에 LLM 본문이 끝나지 않으면 통계/차트 + 템플릿 요약을 먼저 응답하고 본문은 /report-text 로 전달
+REPORT_BUDGET = float(os.environ["CHOC_REPORT_BUDGET"]) if os.environ.get("CHOC_REPORT_BUDGET") else None
+# LLM 오류로 끝난 본문은 다음 요청 때 다시 생성 (is_report_error는 warm-up 때 로드)
+narratives = NarrativeRegistry(is_error=lambda text: is_report_error(text))
+
+startup_timings["import"] = time.perf_counter() - _T0
+
+def _build_rollups():
+    t = time.perf_counter()
+    _import_analysis()
+    startup_timings["analysis_import"] = time.perf_counter() - t
+    if RollupStore is None:
+        return None
+    t = time.perf_counter()
+    store = RollupStore()
+    for name in history_store.users():
+        store.sync(history_store, name)
+    startup_timings["rollup_seed"] = time.perf_counter() - t
+    return store
+
+async def _warmup():
+    global rollup_store
+    t = time.perf_counter()
+    # 이 사이 수신분은 저장소에만 기록되고, 세그먼트 번호 기준으로 다음 sync() 때 반영
+    rollup_store = await asyncio.to_thread(_build_rollups)
+    if warm_worker is not None:
+        report_executor.initializer = warm_worker
+        report_executor.warm()
+    startup_timings["warmup"] = time.perf_counter() - t
+    startup_timings["ready_since_import"] = time.perf_counter() - _T0
+
+def _warm_vad_pool():
+    global vad_pool
+    t = time.perf_counter()
+    try:
+        try:
+            from .vad import shared_model_pool
+        except ImportError:
+            from vad import shared_model_pool
+        pool = shared_model_pool(max(VAD_POOL_SIZE, 1))
+        pool.warm(VAD_WARM)
+        vad_pool = pool
+    except Exception as e:
+        print("VAD pool warm-up error:", e)
+    startup_timings["vad_pool"] = time.perf_counter() - t
+
+async def ensure_ready():
+    """분석 모듈과 rollup이 준비될 때까지 대기 (필요하면 warm-up 시작)"""
+    global _warmup_task
+    if _warmup_task is None:
+        _warmup_task = asyncio.create_task(_warmup())
+    await asyncio.shield(_warmup_task)
+
+def is_ready() -> bool:
+    return _warmup_task is not None and _warmup_task.done()
+
+async def _sessions(fn, *args):
+    """data_store 호출: SQLite 저장소(blocking)는 파일 잠금을 기다릴 수 있어 스레드에서, 메모리 저장소는 루프에서 바로"""
+    if data_store.blocking:
+        return await asyncio.to_thread(fn, *args)
+    return fn(*args)
 
 async def cleanup_loop():
-    """1시간 이상 된 항목 정리 루프 (백그라운드 태스크)"""
+    """만료된 세션을 조금씩 계속 정리 (쓰기가 없을 때도 메모리 반환)"""
     while True:
-        now = time.time()
-        to_delete = [k for k, v in data_store.items() if now - v["timestamp"] > 3600]
-        for k in to_delete:
-            data_store.pop(k, None)
-        await asyncio.sleep(3600)
+        await _sessions(lambda: data_store.expire(limit=data_store.expire_batch * 16))
+        await asyncio.sleep(1)
+
+async def report_batch_loop(at: str):
+    """매일 at(HH:MM)에 변경된 사용자의 리포트를 미리 생성"""
+    while True:
+        await asyncio.sleep(seconds_until(at))
+        try:
+            await ensure_ready()
+            summary = await run_batch(history_store, report_archive, report_executor,
+                                      llm_concurrency=REPORT_BATCH_LLM_CONCURRENCY)
+            print("report-batch:", summary)
+        except Exception as e:
+            print("report-batch error:", e)
 
 @app.on_event("startup")
 async def on_startup():
+    global _warmup_task
     asyncio.create_task(cleanup_loop())
+    if REPORT_BATCH_AT:
+        asyncio.create_task(report_batch_loop(REPORT_BATCH_AT))
+    if WARMUP_ON_STARTUP:
+        _warmup_task = asyncio.create_task(_warmup())
+    if VAD_WARM > 0:
+        # 리포트 준비와 별개로 VAD 모델을 미리 로드 (첫 연결이 로드를 기다리지 않도록)
+        asyncio.create_task(asyncio.to_thread(_warm_vad_pool))
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    report_executor.shutdown()
+
+@app.get("/health")
+async def health():
+    return {
+        "status": "ready" if is_ready() else "warming",
+        "analysis_available": render_chart is not None,
+        "startup_timings": startup_timings,
+        "report_executor": report_executor.stats(),
+        "vad_pool": vad_pool.stats() if vad_pool is not None else None,
+    }
+
+def _append_history(events: Optional[np.ndarray], session_ids: List[str]):
+    # 블로킹 파일 쓰기 + 집계라서 스레드에서 실행 (이벤트 루프를 막지 않도록)
+    if events is None:
+        history_store.record_sessions(REPORT_USER, session_ids)
+        return
+    with span("store_append"):
+        history_store.append(REPORT_USER, events)
+        # 세그먼트를 쓴 뒤에 id 기록 (중간에 실패하면 재전송을 다시 받음)
+        history_store.record_sessions(REPORT_USER, session_ids)
+    INGESTED_EVENTS.inc(len(events))
+    if rollup_store is not None:
+        # 방금 쓴 세그먼트와 다른 워커/스레드가 그 사이 쓴 세그먼트를 번호 순서대로 반영
+        with span("rollup_sync"):
+            rollup_store.sync(history_store, REPORT_USER)
+
+async def _ingest_sessions(sessions: List[tuple], dedup: bool = True) -> Tuple[float, Set[str]]:
+    """
+    (세션 id, payload, int64 epoch ms) 목록을 한 번에 반영: 저장소 세그먼트 1개, rollup 갱신 1회
+    - 모든 세션의 깜빡임은 단일 사용자 REPORT_USER 기록에 추가됨 (세션별 사용자 구분 없음)
+    - dedup이면 이미 받은 id(data_store, 저장소의 sessions.jsonl)와 목록 안에서 반복된 id는 건너뜀
+    :return: (수신 시각, 기록한 세션 id)
+    """
+    ts = time.time()
+    if dedup:
+        # data_store는 TTL/용량 제한으로 지워지므로, 저장소에 영구 기록된 id로도 중복 확인
+        ingested = await asyncio.to_thread(history_store.session_ids, REPORT_USER)
+        fresh, seen = [], set()
+        for session in sessions:
+            session_id = session[0]
+            if session_id not in seen and session_id not in ingested:
+                seen.add(session_id)
+                fresh.append(session)
+        sessions = fresh
+
+    def claim():
+        # 세션 메타데이터를 먼저 기록, dedup이면 없는 id만 (확인과 기록이 한 번에)
+        # → 쓰기가 끝나기 전에 온 재전송도 중복으로 판단
+        if not dedup:
+            for session_id, payload, _ in sessions:
+                data_store[session_id] = {"payload": payload, "timestamp": ts}
+            return sessions
+        return [session for session in sessions
+                if data_store.put_new(session[0], {"payload": session[1], "timestamp": ts})]
+
+    sessions = await _sessions(claim)
+    for _, _, events in sessions:
+        SESSION_EVENTS.observe(len(events))
+    batches = [events for _, _, events in sessions if len(events)]
+    events = (np.concatenate(batches) if len(batches) > 1 else batches[0]) if batches else None
+    if sessions:
+        await asyncio.to_thread(_append_history, events, [session_id for session_id, _, _ in sessions])
+    if "first_ingest" not in startup_timings:
+        startup_timings["first_ingest"] = time.perf_counter() - _T0
+    return ts, {session_id for session_id, _, _ in sessions}
+
+async def _ingest_events(session_id: str, payload: dict, events: np.ndarray, dedup: bool = True):
+    ts, written = await _ingest_sessions([(session_id, payload, events)], dedup)
+    if session_id not in written:
+        # 재전송은 오류가 아님: 저장하지 않고 bulk와 같은 "duplicate" 상태로 응답
+        return {"message": "Session already received", "id": session_id, "status": "duplicate", "timestamp": ts}
+    return {"message": "Data received and processed successfully", "id": session_id, "status": "accepted",
+            "events": len(events), "timestamp": ts}
+
+def _session_events(data: BlinkSession) -> np.ndarray:
+    if data.eventsBin is not None:
+        return decode_timestamps(base64.b64decode(data.eventsBin, validate=True))
+    return parse_timestamps(data.events)
+
+def _session_payload(data: BlinkSession, events: np.ndarray) -> dict:
+    # 이벤트 원문은 저장소에 있으므로 세션 메타데이터만 보관
+    return {"id": data.id, "startedAt": data.startedAt, "endedAt": data.endedAt, "eventCount": len(events)}
+
+def _bad_session(e: Exception):
+    return JSONResponse(status_code=400, content={"message": f"Invalid blink session: {e}"})
 
 @app.post("/blink-data/")
 async def receive_blink_data(data: BlinkSession):
-    ts = time.time()
-    print("=== blink-data 수신 ===")
-    print(f"id: {data.id}")
-    print(f"events: {data.events}")
-    print(f"startedAt: {data.startedAt}")
-    print(f"endedAt: {data.endedAt}")
-    print("======================")
-    data_store[data.id] = {"payload": data.dict(), "timestamp": ts}
-    return {"message": "Data received and processed successfully", "id": data.id, "timestamp": ts}
+    try:
+        events = _session_events(data)
+    except ValueError as e:
+        return _bad_session(e)
+    print(f"blink-data 수신: id={data.id}, events={len(events)}, {data.startedAt} ~ {data.endedAt}")
+    return await _ingest_events(data.id, _session_payload(data, events), events)
+
+@app.post("/blink-data/bulk")
+async def receive_blink_data_bulk(request: Request):
+    """
+    오프라인 동안 쌓인 세션 일괄 수신
+    본문: BlinkSession JSON 배열, 또는 Content-Type application/x-ndjson 이면 한 줄에 세션 하나
+    - 이미 받은 id(재전송)와 같은 요청 안의 중복 id는 "duplicate"로 건너뜀
+    - 유효한 세션은 한 번에 저장소에 기록
+    """
+    body = await request.body()
+    try:
+        if "ndjson" in request.headers.get("content-type", ""):
+            items = [json.loads(line) for line in body.splitlines() if line.strip()]
+        else:
+            items = json.loads(body)
+            if not isinstance(items, list):
+                raise ValueError("Expected a JSON array of sessions")
+    except ValueError as e:
+        return _bad_session(e)
+
+    results = []
+    sessions = []
+    for item in items:
+        try:
+            data = BlinkSession.model_validate(item)
+            events = _session_events(data)
+        except ValidationError as e:
+            session_id = item.get("id") if isinstance(item, dict) else None
+            error = "; ".join(f"{'.'.join(map(str, err['loc'])) or 'session'}: {err['msg']}" for err in e.errors())
+            results.append({"id": session_id, "status": "invalid", "error": error})
+            continue
+        except ValueError as e:
+            results.append({"id": data.id, "status": "invalid", "error": str(e)})
+            continue
+        sessions.append((data.id, _session_payload(data, events), events))
+        results.append({"id": data.id, "status": "accepted", "events": len(events)})
+
+    ts, written = await _ingest_sessions(sessions) if sessions else (time.time(), set())
+    # 같은 id가 요청 안에 여러 번이면 첫 번째만 accepted
+    first = set()
+    for result in results:
+        if result["status"] != "accepted":
+            continue
+        if result["id"] in written and result["id"] not in first:
+            first.add(result["id"])
+        else:
+            del result["events"]
+            result["status"] = "duplicate"
+    accepted = len(first)
+    print(f"blink-data/bulk 수신: sessions={len(items)}, accepted={accepted}")
+    return {"message": "Bulk data processed", "accepted": accepted, "results": results, "timestamp": ts}
+
+@app.post("/blink-data/binary")
+async def receive_blink_data_binary(request: Request, id: str, startedAt: str, endedAt: str):
+    """
+    본문: application/octet-stream, blink_store.encode_timestamps 형식
+    세션 메타데이터는 쿼리 파라미터로 전달
+    """
+    try:
+        events = decode_timestamps(await request.body())
+    except ValueError as e:
+        return _bad_session(e)
+    payload = {"id": id, "startedAt": startedAt, "endedAt": endedAt, "eventCount": len(events)}
+    return await _ingest_events(id, payload, events)
     
 @app.post("/blink-session")
 async def receive_blink_session(data: BlinkSession):
     # 기존 로직 재사용
     return await receive_blink_data(data)
 
+async def _render_chart_timed(hourly, date: str):
+    # 워커 프로세스 안의 span은 이 프로세스 지표에 잡히지 않으므로 대기 시간 포함 왕복을 기록
+    with span("render_chart"):
+        return await report_executor.run(render_chart, hourly, date)
+
+class ReportTextFailed(Exception):
+    """
+    LLM 본문 생성 실패: 리포트 캐시에 넣지 않고 payload를 그대로 응답
+    """
+    def __init__(self, payload: dict):
+        super().__init__(payload["report"])
+        self.payload = payload
+
 @app.get("/processed-data/{request_id}")
-async def send_processed_data(request_id: str):
-    saved = data_store.get(request_id)
+async def send_processed_data(request_id: str, budget: Optional[float] = None):
+    t0 = time.perf_counter()
+    budget = REPORT_BUDGET if budget is None else budget
+    saved = await _sessions(data_store.get, request_id)
     if not saved:
         return {"message": "No data found for the given request ID"}
 
-    if analyze_tablet_data and generate_report:
-        user_name, history_df = history_store['increase']
-        user_info = {
-            'user_name': user_name,
-            'joined_at': history_df['TIMESTAMP'].min(),
-        }
-        preprocessed_data = pd.concat([history_df, pd.DataFrame({"TIMESTAMP": [time_str.split('.')[0] for time_str in saved['payload']['events']]})])
-        report = generate_report(preprocessed_data, user_info=user_info)
-
-        # ✅ 이미지 바이트를 base64 문자열로 변환해서 JSON 직렬화 가능하게
-        img_bytes = report.get("daily_line_plot")
-        if isinstance(img_bytes, (bytes, bytearray)):
-            report["daily_line_plot_b64"] = base64.b64encode(img_bytes).decode("ascii")
-            del report["daily_line_plot"]
-
-        return report
+    await ensure_ready()
+    if render_chart and rollup_store is not None:
+        with span("rollup_sync"):
+            rollup = rollup_store.sync(history_store, REPORT_USER)
+        if rollup is None:
+            return {"message": "No data found for the given request ID"}
+        date = datetime.now().strftime("%Y-%m-%d")
+
+        seq = rollup_store.synced.get(REPORT_USER, 0)
+
+        async def compute():
+            # 배치로 미리 만든 리포트가 현재 데이터 기준이면 파일만 읽음
+            archived = report_archive.lookup(REPORT_USER, date, seq)
+            if archived is not None:
+                return archived
+            async with report_executor.admit():
+                user_info = {
+                    'user_name': history_store.user_name(REPORT_USER) or '사용자',
+                    'joined_at': rollup.joined_at(),
+                }
+                with span("rollup_hourly_bpm"):
+                    hourly = rollup.hourly_bpm(date)
+                with span("rollup_analyze"):
+                    histories = rollup.analyze()
+                # 차트는 프로세스 풀, LLM 호출은 비동기로 동시에 진행
+                (img_bytes, daily_bpm), report_text = await asyncio.gather(
+                    _render_chart_timed(hourly, date),
+                    generate_report_text_async(user_info=user_info, histories=histories),
+                )
+            # ✅ 이미지 바이트를 base64 문자열로 변환해서 JSON 직렬화 가능하게
+            payload = {
+                "user_name": user_info.get('user_name', '사용자'),
+                "report": report_text,
+                "daily_blink_per_minute": daily_bpm,
+                "daily_line_plot_b64": base64.b64encode(img_bytes).decode("ascii"),
+            }
+            if is_report_error(report_text):
+                # 일시적인 LLM 실패는 캐시하지 않음 (기다리던 요청에는 같은 응답)
+                raise ReportTextFailed(payload)
+            return payload
+
+        key = (REPORT_USER, date, rollup.version)
+
+        async def compute_stats():
+            async with report_executor.admit():
+                user_info = {
+                    'user_name': history_store.user_name(REPORT_USER) or '사용자',
+                    'joined_at': rollup.joined_at(),
+                }
+                with span("rollup_hourly_bpm"):
+                    hourly = rollup.hourly_bpm(date)
+                with span("rollup_analyze"):
+                    histories = rollup.analyze()
+                img_bytes, daily_bpm = await _render_chart_timed(hourly, date)
+            payload = {
+                "user_name": user_info.get('user_name', '사용자'),
+                "daily_blink_per_minute": daily_bpm,
+                "daily_line_plot_b64": base64.b64encode(img_bytes).decode("ascii"),
+            }
+            return payload, user_info, histories, hourly
+
+        async def budgeted():
+            done = report_cache.get(key)
+            if done is not None:
+                return done
+            archived = report_archive.lookup(REPORT_USER, date, seq)
+            if archived is not None:
+                return archived
+            payload, user_info, histories, hourly = await report_cache.get_or_compute(("stats",) + key, compute_stats)
+
+            def on_done(text: str):
+                # 다음 요청부터는 완성된 리포트를 바로 응답
+                if not is_report_error(text):
+                    report_cache.put(key, {**payload, "report": text})
+
+            # 같은 키의 본문 생성은 하나만 (예산 초과 후에도 계속 진행)
+            job = narratives.start(key, lambda: generate_report_text_stream(user_info=user_info, histories=histories), on_done)
+            if await job.wait(max(budget - (time.perf_counter() - t0), 0)):
+                if not job.failed:
+                    return {**payload, "report": job.text}
+                # 생성 실패: 끊긴 본문 대신 템플릿 요약 (다음 요청 때 새 작업으로 다시 생성)
+                return {
+                    **payload,
+                    "report": template_report(user_info, histories, hourly, payload["daily_blink_per_minute"]),
+                    "report_status": "failed",
+                }
+            return {
+                **payload,
+                "report": template_report(user_info, histories, hourly, payload["daily_blink_per_minute"]),
+                "report_status": "pending",
+                "report_id": job.id,
+                "report_poll": f"/report-text/{job.id}",
+                "report_stream": f"/report-text/{job.id}/stream",
+            }
+
+        # 데이터가 그대로면 (사용자, 날짜, 버전) 키로 이전 리포트 재사용
+        try:
+            if budget is not None:
+                return await budgeted()
+            return await report_cache.get_or_compute(key, compute)
+        except ReportTextFailed as e:
+            return e.payload
+        except Overloaded as e:
+            return JSONResponse(
+                status_code=429,
+                content={"message": "Too many reports in progress, retry later"},
+                headers={"Retry-After": str(e.retry_after)},
+            )
     else:
         return {"message": "Analysis functions are not available."}
-# # ==== [VAD WS] 추가 시작 =========================================
-# from fastapi import WebSocket, WebSocketDisconnect
-# import numpy as np
-# import asyncio
-# import json
-
-# # 네가 준 RealTimeSileroVAD가 별도 파일이면 다음처럼 시도:
-# try:
-#     from .vad import RealTimeSileroVAD, TARGET_SR, BLOCK_SAMPLES
-# except Exception:
-#     try:
-#         from vad import RealTimeSileroVAD, TARGET_SR, BLOCK_SAMPLES
-#     except Exception as e:
-#         print("VAD import error:", e)
-#         RealTimeSileroVAD = None
-#         TARGET_SR = 16000
-#         BLOCK_SAMPLES = 512
-
-# @app.websocket("/vad-stream")
-# async def vad_stream(ws: WebSocket):
-#     await ws.accept()
-#     if RealTimeSileroVAD is None:
-#         await ws.send_json({"type":"error","message":"VAD not available on server"})
-#         await ws.close()
-#         return
-
-#     # 클라가 보내는 512 float32(리틀엔디안) 프레임을 처리
-#     # 이벤트(frame/speech_start/speech_end)는 JSON으로 push
-#     loop = asyncio.get_running_loop()
-#     ev_q: "queue.Queue[dict]" = queue.Queue()
-
-#     def on_event(event: str, t_s: float, prob: float, chunk: np.ndarray):
-#         ev_q.put({"type": event, "t_s": float(t_s), "prob": float(prob)})
-
-#     vad = RealTimeSileroVAD(sample_rate=TARGET_SR, threshold=0.5, min_speech_frames=3, min_silence_frames=6, onnx=True)
-#     vad.start(on_event)
-
-#     send_task = asyncio.create_task(_ws_event_sender(ws, ev_q))
-
-#     try:
-#         # 첫 메시지가 설정 JSON일 수 있음(선택)
-#         try:
-#             msg = await ws.receive_text()
-#             try:
-#                 cfg = json.loads(msg)
-#                 if isinstance(cfg, dict) and cfg.get("type") == "config":
-#                     th = float(cfg.get("threshold", 0.5))
-#                     msf = int(cfg.get("min_speech_frames", 3))
-#                     mif = int(cfg.get("min_silence_frames", 6))
-#                     # 간단 적용: 인스턴스 재생성 대신 내부 필드 업데이트
-#                     vad.threshold = th
-#                     vad.min_speech_frames = msf
-#                     vad.min_silence_frames = mif
-#             except Exception:
-#                 # 텍스트지만 config 아님 → 무시
-#                 pass
-#         except Exception:
-#             # 첫 프레임이 바이너리일 수도 있음 → 패스
-#             pass
-
-#         # 메인 수신 루프(바이너리 프레임)
-#         while True:
-#             data = await ws.receive_bytes()
-#             # Float32 Little-Endian 가정
-#             arr = np.frombuffer(data, dtype=np.float32)
-#             if arr.ndim != 1:
-#                 continue
-#             if len(arr) != BLOCK_SAMPLES:
-#                 # 틱사이즈가 다르면 드랍(클라가 512로 보내야 함)
-#                 continue
-#             vad.put(arr)
-#     except WebSocketDisconnect:
-#         pass
-#     finally:
-#         try:
-#             vad.stop()
-#         except Exception:
-#             pass
-#         send_task.cancel()
-#         with contextlib.suppress(asyncio.CancelledError):
-#             await send_task
-
-# async def _ws_event_sender(ws: WebSocket, ev_q: "queue.Queue[dict]"):
-#     # 쓰레드 큐 -> WS로 비동기 전송
-#     try:
-#         while True:
-#             ev = await asyncio.to_thread(ev_q.get)
-#             await ws.send_json(ev)
-#     except asyncio.CancelledError:
-#         # 정상 종료 경로
-#         return
-#     except Exception:
-#         # 기타 에러는 조용히 무시(원하면 logging 추가)
-#         return
-# # ==== [VAD WS] 추가 끝 ===========================================
+
+@app.get("/report-text/{report_id}")
+async def report_text(report_id: str):
+    """예산 모드에서 먼저 응답한 리포트의 LLM 본문 (status: pending | ready | failed, report: 지금까지의 본문)"""
+    job = narratives.get(report_id)
+    if job is None:
+        return JSONResponse(status_code=404, content={"message": "Unknown report id"})
+    return job.status()
+
+@app.get("/report-text/{report_id}/stream")
+async def report_text_stream(report_id: str):
+    """
+    같은 본문을 Server-Sent Events로 전달
+    data: {"delta": "..."} 조각마다, 마지막에 event: done / data: {"report": 전체 본문}
+    생성이 실패하면 done 대신 event: failed / data: {"error": 사유}
+    """
+    job = narratives.get(report_id)
+    if job is None:
+        return JSONResponse(status_code=404, content={"message": "Unknown report id"})
+
+    async def events():
+        async for piece in job.follow():
+            yield f"data: {json.dumps({'delta': piece}, ensure_ascii=False)}\n\n"
+        if job.failed:
+            yield f"event: failed\ndata: {json.dumps({'error': job.error or 'report generation failed'}, ensure_ascii=False)}\n\n"
+            return
+        yield f"event: done\ndata: {json.dumps({'report': job.text}, ensure_ascii=False)}\n\n"
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+@app.get("/report-cache/stats")
+async def report_cache_stats():
+    return report_cache.stats()
+
+@app.get("/session-store/stats")
+async def session_store_stats():
+    return await _sessions(data_store.stats)
+
+@app.get("/metrics")
+async def metrics():
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
+# ==== [Blink WS] ==================================================
+# 세션이 끝날 때 한 번에 POST 하는 대신 깜빡임을 발생 즉시 전송
+#   /blink-stream?id=<세션 id>
+#   텍스트: {"events": ["2025-08-10T04:00:05.123Z", ...]} 또는 {"t": "..."}
+#   바이너리: blink_store.encode_timestamps 형식
+# 메시지마다 {"type": "rate", "bpm": 최근 창의 분당 깜빡임 | null, "events": 누적 수, "low": bool} 응답
+# 이벤트는 모아서 BLINK_FLUSH_EVENTS개 / BLINK_FLUSH_SECONDS초마다, 그리고 연결 종료 시 저장소에 반영
+
+BLINK_RATE_WINDOW = float(os.environ.get("CHOC_BLINK_RATE_WINDOW", "300"))   # 초
+BLINK_FLUSH_EVENTS = int(os.environ.get("CHOC_BLINK_FLUSH_EVENTS", "256"))
+BLINK_FLUSH_SECONDS = float(os.environ.get("CHOC_BLINK_FLUSH_SECONDS", "60"))
+
+def _decode_stream_message(msg: dict) -> np.ndarray:
+    data = msg.get("bytes")
+    if data is not None:
+        return decode_timestamps(data)
+    body = json.loads(msg.get("text") or "")
+    if not isinstance(body, dict):
+        raise ValueError("Expected a JSON object")
+    events = body.get("events", [body["t"]] if "t" in body else [])
+    return parse_timestamps(events)
+
+@app.websocket("/blink-stream")
+async def blink_stream(ws: WebSocket, id: str):
+    await ws.accept()
+    await ensure_ready()
+    if RollingBlinkRate is None:
+        await ws.send_json({"type": "error", "message": "Analysis functions are not available."})
+        await ws.close()
+        return
+
+    rate = RollingBlinkRate(BLINK_RATE_WINDOW)
+    started_at = datetime.now().isoformat()
+    buffer: List[np.ndarray] = []
+    buffered = 0
+    last_flush = time.monotonic()
+
+    async def flush():
+        nonlocal buffer, buffered, last_flush
+        if buffer:
+            payload = {"id": id, "startedAt": started_at, "endedAt": datetime.now().isoformat(), "eventCount": rate.events}
+            # 한 세션을 나눠 쓰는 것이므로 같은 id의 반복 기록을 중복으로 보지 않음
+            await _ingest_events(id, payload, np.concatenate(buffer), dedup=False)
+        buffer, buffered, last_flush = [], 0, time.monotonic()
+
+    try:
+        while True:
+            msg = await ws.receive()
+            if msg["type"] == "websocket.disconnect":
+                break
+            try:
+                events = _decode_stream_message(msg)
+            except (ValueError, KeyError, TypeError) as e:
+                await ws.send_json({"type": "error", "message": f"Invalid blink events: {e}"})
+                continue
+            for t in events.tolist():
+                rate.push(t)
+            if len(events):
+                buffer.append(events)
+                buffered += len(events)
+            if buffered >= BLINK_FLUSH_EVENTS or time.monotonic() - last_flush >= BLINK_FLUSH_SECONDS:
+                await flush()
+            bpm = rate.bpm()
+            await ws.send_json({
+                "type": "rate",
+                "bpm": bpm,
+                "events": rate.events,
+                "low": bpm is not None and bpm < IDEAL_BLINK_PER_MINUTE,
+            })
+    except WebSocketDisconnect:
+        pass
+    finally:
+        await flush()
+# ==== [Blink WS] 끝 ===============================================
+
+# ==== [VAD WS] ====================================================
+# 클라가 보내는 512 float32(리틀엔디안) 프레임을 처리하고
+# 이벤트(frame/speech_start/speech_end)는 JSON으로 push
+#
+# 설정 메시지(텍스트, 언제든 가능):
+#   {"type": "config", "threshold": 0.5, "min_speech_frames": 3, "min_silence_frames": 6,
+#    "frames": "all" | "none" | "batch", "frame_batch": 16}
+#   frames="none"이면 speech_start/speech_end만, "batch"면 frame_batch개씩 확률 배열로 전송
+#   값이 잘못되면 설정은 그대로 두고 {"type": "error", "message": ..} 응답 (연결 유지)
+# 통계 요청: {"type": "stats"} → {"type": "stats", "dropped_in": .., "dropped_out": ..}
+# 종료 요청: {"type": "end"} → 남은 프레임을 처리하고 이벤트(모으던 frames 배치 포함)를 모두 보낸 뒤 서버가 연결을 닫음
+
+VAD_INBOUND_QUEUE = int(os.environ.get("CHOC_VAD_INBOUND_QUEUE", "64"))     # 프레임 (≈2 s)
+VAD_OUTBOUND_QUEUE = int(os.environ.get("CHOC_VAD_OUTBOUND_QUEUE", "256"))  # 이벤트
+VAD_ACQUIRE_TIMEOUT = float(os.environ.get("CHOC_VAD_ACQUIRE_TIMEOUT", "2.0"))
+VAD_DRAIN_TIMEOUT = 2.0  # 종료 시 남은 이벤트 전송 대기 (초)
+
+# 연결 중인 VAD 스트림 (/metrics 수집 시점에 큐 길이/처리 속도 합산)
+_active_vads: set = set()
+REGISTRY.gauge("choc_vad_streams", "Open /vad-stream connections").set_function(lambda: len(_active_vads))
+REGISTRY.gauge("choc_vad_queue_depth", "Frames waiting for inference across VAD streams").set_function(
+    lambda: sum(v.queue_depth for v in list(_active_vads)))
+REGISTRY.gauge("choc_vad_frames_per_second", "VAD inference throughput across streams").set_function(
+    lambda: sum(v.fps for v in list(_active_vads)))
+VAD_DROPPED_FRAMES = REGISTRY.counter("choc_vad_dropped_frames_total", "Inbound VAD frames dropped on a full queue")
+
+def _import_vad():
+    # torch/onnxruntime 로드가 무거워서 첫 연결 때 import
+    try:
+        from . import vad as vad_module
+    except Exception:
+        try:
+            import vad as vad_module
+        except Exception as e:
+            print("VAD import error:", e)
+            return None
+    return vad_module
+
+class _VADEventRelay:
+    """
+    VAD 워커 스레드 → 이벤트 루프 전달 (call_soon_threadsafe)
+    - 출력 큐가 가득 차면 가장 오래된 이벤트를 버림
+    - frames 모드에 따라 frame 이벤트를 전부/생략/배치로 전달
+    - 루프 쪽 메시지(error/stats)는 feed(), VAD를 멈춘 뒤 close()로 남은 배치를 보내고 큐 끝(None) 표시
+    """
+    def __init__(self, loop: asyncio.AbstractEventLoop, maxsize: int, dt: float):
+        self.loop = loop
+        self.q: "asyncio.Queue[Optional[dict]]" = asyncio.Queue(maxsize=maxsize)
+        self.dt = dt
+        self.frames = "all"
+        self.frame_batch = 16
+        self._batch: List[float] = []
+        self._batch_t = 0.0
+        self.dropped = 0
+
+    def on_event(self, event: str, t_s: float, prob: float, chunk):
+        # 워커 스레드에서 호출됨
+        if event == "frame":
+            if self.frames == "none":
+                return
+            if self.frames == "batch":
+                if not self._batch:
+                    self._batch_t = t_s
+                self._batch.append(round(prob, 4))
+                if len(self._batch) >= self.frame_batch:
+                    self._flush_batch()
+                return
+        elif self._batch:
+            # 시작/종료 이벤트보다 앞선 프레임 확률을 먼저 보냄
+            self._flush_batch()
+        self.loop.call_soon_threadsafe(self._enqueue, {"type": event, "t_s": float(t_s), "prob": float(prob)})
+
+    def _take_batch(self) -> dict:
+        ev = {"type": "frames", "t_s": float(self._batch_t), "dt": self.dt, "probs": self._batch}
+        self._batch = []
+        return ev
+
+    def _flush_batch(self):
+        self.loop.call_soon_threadsafe(self._enqueue, self._take_batch())
+
+    def feed(self, ev: dict):
+        """
+        Queue a server message (error, stats) after the events relayed so far. Call from the event loop.
+        """
+        self._enqueue(ev)
+
+    def close(self):
+        """
+        Send the partial frames batch and mark the end of the stream. Call from the event loop
+        after the VAD worker has stopped, so no more on_event calls can follow.
+        """
+        if self._batch:
+            self._enqueue(self._take_batch())
+        self._enqueue(None)
+
+    def _enqueue(self, ev: Optional[dict]):
+        if self.q.full():
+            self.q.get_nowait()
+            self.dropped += 1
+        self.q.put_nowait(ev)
+
+def _parse_vad_config(vad, relay: _VADEventRelay, cfg: dict) -> dict:
+    """
+    Validated settings of a config message (unchanged keys keep their current value).
+    :raises ValueError: With a message for the client when a value is malformed or out of range.
+    """
+    def number(key, cast, current, low, high=None):
+        value = cfg.get(key, current)
+        try:
+            if isinstance(value, bool) or not isinstance(value, (int, float, str)):
+                raise ValueError
+            value = cast(value)
+        except (TypeError, ValueError):
+            raise ValueError(f"{key} must be a number, got {value!r}") from None
+        if high is None and not value >= low:
+            raise ValueError(f"{key} must be >= {low}, got {value!r}")
+        if high is not None and not low <= value <= high:
+            raise ValueError(f"{key} must be in [{low}, {high}], got {value!r}")
+        return value
+
+    frames = cfg.get("frames", relay.frames)
+    if frames not in ("all", "none", "batch"):
+        raise ValueError(f"frames must be one of all, none, batch, got {frames!r}")
+    return {
+        "threshold": number("threshold", float, vad.threshold, 0.0, 1.0),
+        "min_speech_frames": number("min_speech_frames", int, vad.min_speech_frames, 1),
+        "min_silence_frames": number("min_silence_frames", int, vad.min_silence_frames, 1),
+        "frames": frames,
+        "frame_batch": number("frame_batch", int, relay.frame_batch, 1),
+    }
+
+def _apply_vad_config(vad, relay: _VADEventRelay, cfg: dict):
+    # 값을 모두 검사한 뒤에 한 번에 적용 (일부만 바뀌지 않도록)
+    settings = _parse_vad_config(vad, relay, cfg)
+    vad.threshold = settings["threshold"]
+    vad.min_speech_frames = settings["min_speech_frames"]
+    vad.min_silence_frames = settings["min_silence_frames"]
+    relay.frames = settings["frames"]
+    relay.frame_batch = settings["frame_batch"]
+
+@app.websocket("/vad-stream")
+async def vad_stream(ws: WebSocket):
+    global vad_pool
+    await ws.accept()
+    # 첫 연결이면 torch/silero import에 몇 초 걸리므로 이벤트 루프 밖에서
+    vad_module = await asyncio.to_thread(_import_vad)
+    if vad_module is None:
+        await ws.send_json({"type": "error", "message": "VAD not available on server"})
+        await ws.close()
+        return
+
+    loop = asyncio.get_running_loop()
+    relay = _VADEventRelay(loop, VAD_OUTBOUND_QUEUE, vad_module.DT)
+    pool = vad_pool = vad_module.shared_model_pool(max(VAD_POOL_SIZE, 1))
+    try:
+        # 풀에서 대여 (비어 있으면 VAD_ACQUIRE_TIMEOUT 초까지 대기)
+        vad = await asyncio.to_thread(
+            vad_module.RealTimeSileroVAD,
+            sample_rate=vad_module.TARGET_SR, threshold=0.5, min_speech_frames=3, min_silence_frames=6,
+            onnx=True, pool=pool, acquire_timeout=VAD_ACQUIRE_TIMEOUT, max_queue=VAD_INBOUND_QUEUE,
+        )
+    except TimeoutError:
+        await ws.send_json({"type": "error", "message": "VAD busy, retry later"})
+        await ws.close(code=1013)
+        return
+    vad.start(relay.on_event)
+    _active_vads.add(vad)
+
+    send_task = asyncio.create_task(_ws_event_sender(ws, relay.q))
+    ended = False
+
+    try:
+        # 메인 수신 루프 (바이너리 프레임 + 텍스트 설정)
+        while True:
+            msg = await ws.receive()
+            if msg["type"] == "websocket.disconnect":
+                break
+            data = msg.get("bytes")
+            if data is not None:
+                # Float32 Little-Endian 가정, 틱사이즈가 다르면 드랍(클라가 512로 보내야 함)
+                if len(data) != vad_module.BLOCK_SAMPLES * 4:
+                    continue
+                vad.put(np.frombuffer(data, dtype="<f4"))
+                continue
+            try:
+                cfg = json.loads(msg.get("text") or "")
+            except ValueError:
+                # 텍스트지만 JSON 아님 → 무시
+                continue
+            if not isinstance(cfg, dict):
+                continue
+            if cfg.get("type") == "config":
+                try:
+                    _apply_vad_config(vad, relay, cfg)
+                except ValueError as e:
+                    # 잘못된 설정은 무시하고 연결 유지
+                    relay.feed({"type": "error", "message": str(e)})
+            elif cfg.get("type") == "stats":
+                relay.feed({"type": "stats", "dropped_in": vad.dropped, "dropped_out": relay.dropped})
+            elif cfg.get("type") == "end":
+                ended = True
+                break
+    except WebSocketDisconnect:
+        pass
+    finally:
+        _active_vads.discard(vad)
+        VAD_DROPPED_FRAMES.inc(vad.dropped)
+        # 남은 프레임까지 처리한 뒤 모으던 배치를 내보냄 (끊긴 연결이면 전송만 실패하고 끝남)
+        with contextlib.suppress(Exception):
+            await asyncio.to_thread(vad.stop)
+        relay.close()
+        try:
+            await asyncio.wait_for(send_task, VAD_DRAIN_TIMEOUT)
+        except asyncio.TimeoutError:
+            pass
+        if ended:
+            with contextlib.suppress(Exception):
+                await ws.close()
+
+async def _ws_event_sender(ws: WebSocket, ev_q: "asyncio.Queue[Optional[dict]]"):
+    # 이벤트 큐 -> WS로 비동기 전송 (None이면 끝)
+    try:
+        while True:
+            ev = await ev_q.get()
+            if ev is None:
+                return
+            await ws.send_json(ev)
+    except asyncio.CancelledError:
+        # 정상 종료 경로
+        return
+    except Exception:
+        # 기타 에러(연결 끊김 등)는 조용히 종료
+        return
+# ==== [VAD WS] 끝 =================================================
@@ -0,0 +1,159 @@
+"""
+Prompt building for the daily report.
+
+Templates under prompts/ are read once and re-read only when their mtime
+changes. The data section is formatted from the aggregated Series without
+per-row pandas calls, and kept under a token budget: when the full listing is
+too long, older periods are collapsed into one summary line each
+(min / mean / max / trend) before anything recent is dropped, so prompt size
+and LLM latency stay bounded as histories grow.
+"""
+import math
+import os
+import threading
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+TEMPLATE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "prompts")
+
+# 데이터 부분 토큰 상한 (대략치, estimate_tokens 기준)
+PROMPT_TOKEN_BUDGET = int(os.environ.get("CHOC_PROMPT_TOKEN_BUDGET", "1000"))
+
+
+class PromptTemplates:
+    """
+    프롬프트 파일 캐시, 파일이 바뀌면(mtime) 다음 조회 때 다시 읽음
+    """
+    def __init__(self, directory: str = TEMPLATE_DIR):
+        self.directory = directory
+        self._cache: Dict[str, Tuple[int, str]] = {}
+        self._lock = threading.Lock()
+        self.loads = 0
+
+    def get(self, name: str) -> str:
+        path = os.path.join(self.directory, name)
+        mtime = os.stat(path).st_mtime_ns
+        cached = self._cache.get(name)
+        if cached is not None and cached[0] == mtime:
+            return cached[1]
+        with self._lock:
+            with open(path, "r") as f:
+                text = f.read()
+            self._cache[name] = (mtime, text)
+            self.loads += 1
+        return text
+
+
+templates = PromptTemplates()
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Rough token count: about 3 UTF-8 bytes per token for this mix of digits, dates and Korean.
+    """
+    return math.ceil(len(text.encode("utf-8")) / 3)
+
+
+def format_rows(labels: np.ndarray, values: np.ndarray) -> List[str]:
+    """
+    "<label>, <value:.2f>" lines for whole arrays at once.
+    """
+    if len(labels) == 0:
+        return []
+    return np.char.add(np.char.add(np.asarray(labels, dtype=str), ", "), np.char.mod("%.2f", values)).tolist()
+
+
+def summarize(labels: np.ndarray, values: np.ndarray, count_unit: str, trend_unit: str) -> str:
+    """
+    One line for a run of periods: range, count, min / mean / max and the least-squares slope per period.
+    """
+    span = labels[0] if len(labels) == 1 else f"{labels[0]} ~ {labels[-1]}"
+    line = (f"{span} 요약 ({len(values)}{count_unit}): "
+            f"최소 {np.min(values):.2f}, 평균 {np.mean(values):.2f}, 최대 {np.max(values):.2f}")
+    finite = np.isfinite(values)
+    if finite.sum() >= 2:
+        slope = np.polyfit(np.flatnonzero(finite), values[finite], 1)[0]
+        line += f", 추세 {slope:+.2f}/{trend_unit}"
+    return line
+
+
+def _arrays(series: Optional[pd.Series]) -> Tuple[np.ndarray, np.ndarray]:
+    if series is None or len(series) == 0:
+        return np.array([], dtype=str), np.array([], dtype=np.float64)
+    return np.asarray(series.index, dtype=str), series.to_numpy(dtype=np.float64)
+
+
+def _month_rows(labels: np.ndarray, values: np.ndarray, keep: Optional[int]) -> List[str]:
+    if keep is None or len(labels) <= keep:
+        return format_rows(labels, values)
+    split = len(labels) - keep
+    return [summarize(labels[:split], values[:split], "개월", "월")] + format_rows(labels[split:], values[split:])
+
+
+def _week_rows(labels: np.ndarray, values: np.ndarray, days: np.ndarray, today: str, mode: str) -> List[str]:
+    # mode: "hours" 전체 시간별, "days" 지난 날은 하루 한 줄, "summary" 지난 날 전체 한 줄, "none" 오늘만(아래 절과 중복이라 생략)
+    if mode == "hours":
+        return format_rows(labels, values)
+    past = days < today
+    rows: List[str] = []
+    if past.any():
+        if mode == "days":
+            for day in np.unique(days[past]):
+                sel = days == day
+                rows.append(summarize(np.array([day]), values[sel], "시간", "시간"))
+        elif mode == "summary":
+            rows.append(summarize(np.unique(days[past]), values[past], "시간", "시간"))
+    if mode != "none":
+        rows += format_rows(labels[~past], values[~past])
+    return rows
+
+
+# 예산을 넘으면 앞에서부터 차례로 적용 (월별 목록 유지 개수, 이번 주 표시 방식)
+_DETAIL_LEVELS = [
+    (None, "hours"),
+    (None, "days"),
+    (6, "days"),
+    (6, "summary"),
+    (1, "summary"),
+    (1, "none"),
+]
+
+
+def build_data_section(histories: tuple, today: Optional[datetime] = None,
+                       budget: Optional[int] = PROMPT_TOKEN_BUDGET) -> str:
+    """
+    The blink data block of the system prompt.
+    :param histories: (last_month, last_week, this_week) as returned by analyze_tablet_data.
+    :param today: Report time; this week's rows of that day are also listed as today's hourly data.
+    :param budget: Token budget of the block (None for the full listing). Today's hourly
+                   rows are always kept in full.
+    """
+    today = today or datetime.today()
+    last_month, last_week, this_week = histories
+    month_labels, month_values = _arrays(last_month)
+    week_labels, week_values = _arrays(last_week)
+    hour_labels, hour_values = _arrays(this_week)
+    # "%Y-%m-%dT%H" 앞 10글자가 날짜
+    days = hour_labels.astype("U10")
+    today_str = today.strftime("%Y-%m-%d")
+    is_today = days == today_str
+    today_rows = format_rows(hour_labels[is_today], hour_values[is_today])
+
+    text = ""
+    for keep, mode in (_DETAIL_LEVELS if budget is not None else _DETAIL_LEVELS[:1]):
+        text = "================================\n"
+        text += "지난 월별 분당 평균 눈 깜빡임 횟수:\n" + "\n".join(_month_rows(month_labels, month_values, keep)) + "\n"
+        text += "--------------------------------\n"
+        text += "지난 주의 분당 평균 눈 깜빡임 횟수:\n" + "\n".join(format_rows(week_labels, week_values)) + "\n"
+        text += "--------------------------------\n"
+        text += "이번 주의 일별 분당 평균 눈 깜빡임 횟수:\n" + \
+            "\n".join(_week_rows(hour_labels, hour_values, days, today_str, mode)) + "\n"
+        text += "===============================\n"
+        text += "오늘의 시간별 평균 분당 눈 깜빡임 횟수:\n" + "\n".join(today_rows) + "\n"
+        text += "===============================\n"
+        if budget is None or estimate_tokens(text) <= budget:
+            break
+    return text
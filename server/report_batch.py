@@ -0,0 +1,222 @@
+"""
+Precomputed daily reports.
+
+run_batch() walks every user in the history store, builds the same report as
+/processed-data (rollup statistics and chart in a process pool, LLM text with
+bounded concurrency) and writes it to a ReportArchive. Each archived report
+records the user's last segment number, so a re-run skips users whose data
+has not changed and /processed-data can serve an archived report by lookup
+while it is current.
+
+    python report_batch.py                        # 오늘 날짜, 변경된 사용자만
+    python report_batch.py --force --jobs 4 --llm-concurrency 8
+"""
+import argparse
+import asyncio
+import base64
+import json
+import os
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional
+
+try:
+    from .blink_store import BlinkStore, STORE_DIR
+    from .report_executor import ReportExecutor
+except ImportError:
+    from blink_store import BlinkStore, STORE_DIR
+    from report_executor import ReportExecutor
+
+REPORT_DIR = os.environ.get("CHOC_REPORT_DIR", "data/reports")
+
+
+def last_segment_seq(store: BlinkStore, user: str) -> int:
+    """
+    Number of the user's newest segment (0 for none). It changes with every append and
+    survives compaction, so it identifies the user's data.
+    """
+    paths = store.segment_paths(user)
+    return store.segment_seq(paths[-1]) if paths else 0
+
+
+class ReportArchive:
+    """
+    사용자/날짜별 리포트 파일 저장소
+    - <root>/<user>/<date>.json: 리포트 본문 + 데이터 버전(seq)
+    - <root>/<user>/<date>.png: 차트
+    """
+    def __init__(self, root: str = REPORT_DIR):
+        self.root = root
+        os.makedirs(self.root, exist_ok=True)
+
+    def _paths(self, user: str, date: str):
+        if not user or os.sep in user or user.startswith('.'):
+            raise ValueError(f"Invalid user key: {user!r}")
+        base = os.path.join(self.root, user, date)
+        return base + ".json", base + ".png"
+
+    def meta(self, user: str, date: str) -> Optional[Dict[str, Any]]:
+        meta_path, _ = self._paths(user, date)
+        try:
+            with open(meta_path, "r") as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def save(self, user: str, date: str, seq: int, report: Dict[str, Any], image: bytes):
+        meta_path, png_path = self._paths(user, date)
+        os.makedirs(os.path.dirname(meta_path), exist_ok=True)
+        # 차트를 먼저 쓰고 메타를 마지막에 교체 (메타가 보이면 차트도 있음)
+        for path, data, mode in ((png_path, image, "wb"), (meta_path, None, "w")):
+            tmp = f"{path}.{os.getpid()}.tmp"
+            with open(tmp, mode) as f:
+                if data is not None:
+                    f.write(data)
+                else:
+                    json.dump({**report, "seq": seq, "created_at": datetime.now().isoformat(timespec="seconds")},
+                              f, ensure_ascii=False)
+            os.replace(tmp, path)
+
+    def lookup(self, user: str, date: str, seq: int) -> Optional[Dict[str, Any]]:
+        """
+        The archived report in /processed-data form, if it was built from data version seq.
+        """
+        meta = self.meta(user, date)
+        if meta is None or meta.get("seq") != seq:
+            return None
+        _, png_path = self._paths(user, date)
+        try:
+            with open(png_path, "rb") as f:
+                image = f.read()
+        except FileNotFoundError:
+            return None
+        return {
+            "user_name": meta["user_name"],
+            "report": meta["report"],
+            "daily_blink_per_minute": meta["daily_blink_per_minute"],
+            "daily_line_plot_b64": base64.b64encode(image).decode("ascii"),
+        }
+
+
+def build_user_stats(store_root: str, user: str, date: str) -> Dict[str, Any]:
+    """
+    CPU part of one user's report (runs in a worker process): rollup statistics and chart.
+    """
+    try:
+        from .genai import render_chart
+        from .rollup import RollupStore
+    except ImportError:
+        from genai import render_chart
+        from rollup import RollupStore
+
+    store = BlinkStore(store_root)
+    rollups = RollupStore()
+    rollup = rollups.sync(store, user)
+    if rollup is None:
+        return {"user": user, "seq": 0}
+    image, daily_bpm = render_chart(rollup.hourly_bpm(date), date)
+    return {
+        "user": user,
+        "seq": rollups.synced[user],
+        "user_info": {"user_name": store.user_name(user) or '사용자', "joined_at": rollup.joined_at()},
+        "histories": rollup.analyze(),
+        "image": image,
+        "daily_bpm": float(daily_bpm),
+    }
+
+
+async def run_batch(store: BlinkStore, archive: ReportArchive, executor: ReportExecutor, date: Optional[str] = None,
+                    llm_concurrency: int = 4, force: bool = False, users=None) -> Dict[str, Any]:
+    """
+    Build and archive the reports of every (changed) user.
+    :param executor: Runs build_user_stats; at most executor.workers users are in flight at once.
+    :param llm_concurrency: Maximum concurrent completion requests.
+    :param force: Rebuild reports that are already current.
+    :return: Counts of built / skipped / failed users and elapsed seconds.
+    """
+    try:
+        from .genai import generate_report_text_async, is_report_error
+    except ImportError:
+        from genai import generate_report_text_async, is_report_error
+
+    date = date or datetime.now().strftime("%Y-%m-%d")
+    t0 = time.perf_counter()
+    summary = {"date": date, "users": 0, "built": 0, "skipped": 0, "failed": 0}
+    cpu_slots = asyncio.Semaphore(max(executor.workers, 1))
+    llm_slots = asyncio.Semaphore(max(llm_concurrency, 1))
+
+    async def build(user: str):
+        async with cpu_slots:
+            stats = await executor.run(build_user_stats, store.root, user, date)
+        if stats["seq"] == 0:
+            summary["skipped"] += 1
+            return
+        async with llm_slots:
+            text = await generate_report_text_async(user_info=stats["user_info"], histories=stats["histories"])
+        if is_report_error(text):
+            print(f"report-batch {user}: {text}")
+            summary["failed"] += 1
+            return
+        report = {"user_name": stats["user_info"]["user_name"], "report": text, "daily_blink_per_minute": stats["daily_bpm"]}
+        archive.save(user, date, stats["seq"], report, stats["image"])
+        summary["built"] += 1
+
+    tasks = []
+    for user in (store.users() if users is None else users):
+        summary["users"] += 1
+        meta = archive.meta(user, date)
+        # 마지막 실행 이후 세그먼트가 그대로면 건너뜀
+        if not force and meta is not None and meta.get("seq") == last_segment_seq(store, user):
+            summary["skipped"] += 1
+            continue
+        tasks.append(build(user))
+
+    results = await asyncio.gather(*tasks, return_exceptions=True)
+    for r in results:
+        if isinstance(r, Exception):
+            print("report-batch error:", r)
+            summary["failed"] += 1
+    summary["seconds"] = time.perf_counter() - t0
+    return summary
+
+
+def seconds_until(at: str, now: Optional[datetime] = None) -> float:
+    """
+    Seconds until the next local "HH:MM".
+    """
+    now = now or datetime.now()
+    hour, minute = map(int, at.split(":"))
+    target = now.replace(hour=hour, minute=minute, second=0, microsecond=0)
+    if target <= now:
+        target += timedelta(days=1)
+    return (target - now).total_seconds()
+
+
+def main():
+    try:
+        from .genai import warm_worker
+    except ImportError:
+        from genai import warm_worker
+
+    p = argparse.ArgumentParser(description="Precompute daily reports for every user")
+    p.add_argument("--store", type=str, default=STORE_DIR, help="깜빡임 저장소 경로")
+    p.add_argument("--out", type=str, default=REPORT_DIR, help="리포트 저장 경로")
+    p.add_argument("--date", type=str, default=None, help="리포트 날짜 YYYY-MM-DD (기본: 오늘)")
+    p.add_argument("--jobs", type=int, default=0, help="프로세스 수 (0이면 CPU 코어 수)")
+    p.add_argument("--llm-concurrency", type=int, default=4, help="동시 LLM 요청 수")
+    p.add_argument("--force", action="store_true", help="변경 없는 사용자도 다시 생성")
+    p.add_argument("--users", nargs="+", default=None, help="일부 사용자만")
+    args = p.parse_args()
+
+    executor = ReportExecutor(workers=args.jobs if args.jobs > 0 else (os.cpu_count() or 1), initializer=warm_worker)
+    try:
+        summary = asyncio.run(run_batch(BlinkStore(args.store), ReportArchive(args.out), executor, args.date,
+                                        args.llm_concurrency, args.force, args.users))
+    finally:
+        executor.shutdown()
+    print(f"{summary['date']}: {summary['users']} users, built {summary['built']}, skipped {summary['skipped']}, "
+          f"failed {summary['failed']} in {summary['seconds']:.1f}s -> {args.out}")
+
+
+if __name__ == "__main__":
+    main()
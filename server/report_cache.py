@@ -0,0 +1,117 @@
+"""
+Report result cache for /processed-data.
+
+Keys are (user, report date, data version); the version bumps on every ingest,
+so a cached report is only served while the user's data is unchanged.
+Entries are evicted LRU beyond max_entries and after ttl seconds.
+Concurrent requests for the same key share one computation (single-flight).
+"""
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Tuple
+
+
+class ReportCache:
+    """
+    LRU + TTL 캐시, 같은 키의 동시 요청은 계산 하나를 공유
+    - 계산은 별도 task로 실행: 먼저 요청한 쪽이 취소되어도 기다리는 쪽은 결과를 받음
+    - 튜플 키는 마지막 원소(버전)를 뺀 앞부분별로 최신 키 하나만 유지 (_latest 인덱스로 O(1) 교체)
+    """
+    def __init__(self, max_entries: int = 256, ttl: float = 3600.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._latest: Dict[Hashable, Hashable] = {}
+        self._inflight: Dict[Hashable, asyncio.Task] = {}
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable):
+        """
+        Cached value for key or None, counted as a hit or a miss.
+        """
+        value = self._get(key)
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    def _get(self, key: Hashable):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        stored_at, value = entry
+        if time.monotonic() - stored_at > self.ttl:
+            self._remove(key)
+            self.evictions += 1
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def _remove(self, key: Hashable):
+        del self._entries[key]
+        if isinstance(key, tuple) and self._latest.get(key[:-1]) == key:
+            del self._latest[key[:-1]]
+
+    def put(self, key: Hashable, value: Any):
+        # 같은 (user, date)의 이전 버전은 더 이상 쓰이지 않으므로 바로 제거
+        if isinstance(key, tuple):
+            stale = self._latest.get(key[:-1])
+            if stale is not None and stale != key and stale in self._entries:
+                self._remove(stale)
+                self.evictions += 1
+            self._latest[key[:-1]] = key
+        self._entries[key] = (time.monotonic(), value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._remove(next(iter(self._entries)))
+            self.evictions += 1
+
+    def clear(self):
+        self._entries.clear()
+        self._latest.clear()
+
+    async def get_or_compute(self, key: Hashable, compute: Callable[[], Awaitable[Any]]):
+        """
+        Return the cached value for key, or run compute() once for all concurrent callers.
+        The computation runs in its own task, so cancelling any caller (including the first)
+        leaves it running for the others. Failures are propagated to every waiter and not cached.
+        """
+        value = self._get(key)
+        if value is not None:
+            self.hits += 1
+            return value
+
+        task = self._inflight.get(key)
+        if task is not None:
+            self.coalesced += 1
+        else:
+            self.misses += 1
+            task = self._inflight[key] = asyncio.ensure_future(self._compute(key, compute))
+            # 기다리는 쪽이 모두 취소되어도 "exception was never retrieved" 경고 방지
+            task.add_done_callback(lambda t: t.cancelled() or t.exception())
+        return await asyncio.shield(task)
+
+    async def _compute(self, key: Hashable, compute: Callable[[], Awaitable[Any]]):
+        try:
+            value = await compute()
+            self.put(key, value)
+            return value
+        finally:
+            self._inflight.pop(key, None)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl": self.ttl,
+            "inflight": len(self._inflight),
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "evictions": self.evictions,
+        }
@@ -0,0 +1,102 @@
+"""
+Off-event-loop execution for report generation.
+
+CPU-bound stages (chart rendering, PNG encoding) run in a process pool so a
+report never stalls concurrent /blink-data/ ingests. Admission is bounded:
+once max_pending reports are running or queued, new ones are rejected with
+Overloaded and the caller answers 429 with a Retry-After hint.
+"""
+import asyncio
+import math
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import asynccontextmanager
+from typing import Any, Callable, Optional
+
+
+class Overloaded(Exception):
+    """보고서 대기열이 가득 참"""
+    def __init__(self, retry_after: int):
+        super().__init__(f"Report queue is full, retry after {retry_after}s")
+        self.retry_after = retry_after
+
+
+class ReportExecutor:
+    """
+    - workers > 0: spawn 프로세스 풀에서 CPU 작업 실행
+    - workers == 0: 스레드(asyncio.to_thread)에서 실행 (개발/테스트용)
+    """
+    def __init__(self, workers: int = 2, max_pending: int = 8, initializer: Optional[Callable] = None):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.initializer = initializer
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self.pending = 0
+        self.rejected = 0
+        self.completed = 0
+        # 보고서 1건 소요 시간 지수 평균 (Retry-After 추정용)
+        self.avg_seconds = 1.0
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            # uvicorn 스레드가 있는 프로세스에서 fork 하지 않도록 spawn 사용
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=self.initializer,
+            )
+        return self._pool
+
+    def retry_after(self) -> int:
+        slots = max(self.workers, 1)
+        return max(1, math.ceil(self.avg_seconds * self.pending / slots))
+
+    @asynccontextmanager
+    async def admit(self):
+        """
+        Reserve a report slot for the duration of the block, or raise Overloaded.
+        """
+        if self.pending >= self.max_pending:
+            self.rejected += 1
+            raise Overloaded(self.retry_after())
+        self.pending += 1
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.pending -= 1
+            self.completed += 1
+            self.avg_seconds = 0.8 * self.avg_seconds + 0.2 * (time.perf_counter() - t0)
+
+    async def run(self, fn: Callable, *args) -> Any:
+        """
+        Run a picklable CPU-bound function off the event loop.
+        """
+        if self.workers <= 0:
+            return await asyncio.to_thread(fn, *args)
+        return await asyncio.get_running_loop().run_in_executor(self._get_pool(), fn, *args)
+
+    def warm(self):
+        """
+        Start the worker processes ahead of the first report.
+        """
+        if self.workers > 0:
+            pool = self._get_pool()
+            for _ in range(self.workers):
+                pool.submit(int)
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    def stats(self):
+        return {
+            "workers": self.workers,
+            "max_pending": self.max_pending,
+            "pending": self.pending,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "avg_seconds": self.avg_seconds,
+        }
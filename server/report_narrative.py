@@ -0,0 +1,132 @@
+"""
+Background LLM narratives for latency-budgeted reports.
+
+/processed-data answers within its budget with the statistics, the chart and a
+template summary. The LLM narrative keeps generating in a NarrativeJob; clients
+poll it or follow its pieces as Server-Sent Events. One job runs per report key,
+so repeated requests and several followers share a single completion.
+"""
+import asyncio
+import hashlib
+import json
+from collections import OrderedDict
+from typing import AsyncIterator, Callable, Hashable, Optional
+
+
+class NarrativeJob:
+    """
+    생성 중인 리포트 본문 하나
+    - pieces: 지금까지 받은 조각 (새로 따라오는 쪽은 처음부터 다시 받음)
+    - 끝나면 on_done(전체 본문) 호출
+    - source가 예외로 끝나거나 is_error(전체 본문)이 참이면 failed (on_done은 호출하지 않음, error에 사유)
+    """
+    def __init__(self, job_id: str, source: AsyncIterator[str], on_done: Optional[Callable[[str], None]] = None,
+                 is_error: Optional[Callable[[str], bool]] = None):
+        self.id = job_id
+        self.pieces = []
+        self.done = False
+        self.failed = False
+        self.error: Optional[str] = None
+        self._is_error = is_error
+        self._changed = asyncio.Condition()
+        self._on_done = on_done
+        self.task = asyncio.create_task(self._run(source))
+
+    @property
+    def text(self) -> str:
+        return "".join(self.pieces)
+
+    async def _run(self, source: AsyncIterator[str]):
+        try:
+            async for piece in source:
+                async with self._changed:
+                    self.pieces.append(piece)
+                    self._changed.notify_all()
+        except Exception as e:
+            # 중간에 끊긴 본문은 실패로 남기고 캐시하지 않음
+            self.failed = True
+            self.error = str(e)
+            print("narrative error:", e)
+        except BaseException:
+            self.failed = True
+            raise
+        finally:
+            if self._is_error is not None and self._is_error(self.text):
+                self.failed = True
+            async with self._changed:
+                self.done = True
+                self._changed.notify_all()
+        if self._on_done is not None and not self.failed:
+            self._on_done(self.text)
+
+    async def wait(self, timeout: Optional[float]) -> bool:
+        """
+        Wait up to timeout seconds (None: until done) for the narrative.
+        :return: True when it is complete, successfully or not (see failed).
+        """
+        if not self.done:
+            try:
+                await asyncio.wait_for(asyncio.shield(self.task), timeout)
+            except asyncio.TimeoutError:
+                pass
+        return self.done
+
+    async def follow(self) -> AsyncIterator[str]:
+        """
+        Every piece from the start, then new ones as they arrive, until the job is done.
+        """
+        sent = 0
+        while True:
+            async with self._changed:
+                while sent == len(self.pieces) and not self.done:
+                    await self._changed.wait()
+                pieces, done = self.pieces[sent:], self.done
+            for piece in pieces:
+                yield piece
+            sent += len(pieces)
+            if done and sent == len(self.pieces):
+                return
+
+    def status(self) -> dict:
+        status = "pending" if not self.done else "failed" if self.failed else "ready"
+        result = {"id": self.id, "status": status, "report": self.text}
+        if self.error is not None:
+            result["error"] = self.error
+        return result
+
+
+class NarrativeRegistry:
+    """
+    리포트 키별 NarrativeJob (최근 max_jobs개 유지, 진행 중인 작업은 제거하지 않음)
+    - 실패로 끝난 작업은 같은 키로 다시 start()하면 새 작업으로 교체 (실패가 계속 남지 않도록)
+    """
+    def __init__(self, max_jobs: int = 256, is_error: Optional[Callable[[str], bool]] = None):
+        self.max_jobs = max_jobs
+        self.is_error = is_error
+        self._jobs: "OrderedDict[str, NarrativeJob]" = OrderedDict()
+
+    @staticmethod
+    def job_id(key: Hashable) -> str:
+        return hashlib.sha1(json.dumps(key, default=str).encode()).hexdigest()[:16]
+
+    def get(self, job_id: str) -> Optional[NarrativeJob]:
+        return self._jobs.get(job_id)
+
+    def start(self, key: Hashable, source_factory: Callable[[], AsyncIterator[str]],
+              on_done: Optional[Callable[[str], None]] = None) -> NarrativeJob:
+        """
+        The job for key, starting it from source_factory() if none exists yet or the last one failed.
+        """
+        job_id = self.job_id(key)
+        job = self._jobs.get(job_id)
+        if job is not None and not (job.done and job.failed):
+            self._jobs.move_to_end(job_id)
+            return job
+        self._jobs.pop(job_id, None)
+        job = self._jobs[job_id] = NarrativeJob(job_id, source_factory(), on_done, self.is_error)
+        for old_id in [j for j, old in self._jobs.items() if old.done][:max(0, len(self._jobs) - self.max_jobs)]:
+            del self._jobs[old_id]
+        return job
+
+    def stats(self):
+        return {"jobs": len(self._jobs), "pending": sum(not j.done for j in self._jobs.values())}
@@ -0,0 +1,260 @@
+"""
+Incremental per-user blink rollups.
+
+Every ingested batch updates hourly, daily, ISO-week and monthly accumulators,
+so reports read O(buckets) state instead of re-aggregating the full history.
+analyze() matches analyze_tablet_data on the same events: intervals are whole
+seconds between consecutive blinks and only intervals below INTERVAL_THRESHOLD
+count as valid. That holds as long as batches arrive in time order; RollupStore
+rebuilds a user from the store when a batch lands before the last ingested event.
+"""
+import threading
+from collections import deque
+from dataclasses import dataclass
+from typing import Deque, Dict, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+try:
+    from .genai import INTERVAL_THRESHOLD, MIN_LOG_NUM, period_keys, month_labels, week_labels, hour_labels
+except ImportError:
+    from genai import INTERVAL_THRESHOLD, MIN_LOG_NUM, period_keys, month_labels, week_labels, hour_labels
+
+
+GRANULARITIES = ("hour", "day", "week", "month")
+
+
+@dataclass
+class Bucket:
+    count: int = 0            # 전체 이벤트 수
+    interval_sum: float = 0   # 유효 간격(초) 합
+    valid_count: int = 0      # 유효 간격 수
+    bpm_sum: float = 0        # 유효 간격의 60/interval 합 (시간별 평균 BPM용)
+    last_ts: int = 0          # 마지막 이벤트 (epoch ms)
+
+
+def _aggregate(keys: np.ndarray, ts: np.ndarray, intervals: np.ndarray, valid: np.ndarray, buckets: Dict[int, Bucket]):
+    uniq, inv = np.unique(keys, return_inverse=True)
+    counts = np.bincount(inv, minlength=len(uniq))
+    interval_sums = np.bincount(inv, weights=np.where(valid, intervals, 0), minlength=len(uniq))
+    valid_counts = np.bincount(inv, weights=valid, minlength=len(uniq)).astype(np.int64)
+    with np.errstate(divide="ignore"):
+        bpm = np.where(valid, 60 / np.where(valid, intervals, 1), 0)
+    # 0초 간격은 clean_and_slide_data와 같이 inf BPM으로 남는다
+    bpm[valid & (intervals == 0)] = np.inf
+    bpm_sums = np.bincount(inv, weights=bpm, minlength=len(uniq))
+    last = np.full(len(uniq), np.iinfo(np.int64).min)
+    np.maximum.at(last, inv, ts)
+
+    for k, c, s, v, b, l in zip(uniq.tolist(), counts.tolist(), interval_sums.tolist(),
+                                valid_counts.tolist(), bpm_sums.tolist(), last.tolist()):
+        bucket = buckets.get(k)
+        if bucket is None:
+            buckets[k] = Bucket(c, s, v, b, l)
+        else:
+            bucket.count += c
+            bucket.interval_sum += s
+            bucket.valid_count += v
+            bucket.bpm_sum += b
+            bucket.last_ts = max(bucket.last_ts, l)
+
+
+class UserRollup:
+    """
+    한 사용자의 기간별 누적 집계
+    - 수신 스레드의 ingest()와 리포트 쪽 조회가 겹칠 수 있어 잠금으로 보호
+    """
+    def __init__(self):
+        self._lock = threading.RLock()
+        self.buckets: Dict[str, Dict[int, Bucket]] = {g: {} for g in GRANULARITIES}
+        self.first_ts: Optional[int] = None
+        self.last_ts: Optional[int] = None
+        self.events = 0
+        # ingest 마다 증가, 리포트 캐시 키에 사용
+        self.version = 0
+
+    def ingest(self, ts_ms: np.ndarray):
+        """
+        Fold a batch of blink timestamps into the accumulators.
+        Events older than the last ingested one are counted, but their interval is not valid,
+        so the result differs from analyze_tablet_data on the merged history (RollupStore.sync rebuilds instead).
+        :param ts_ms: int64 epoch milliseconds.
+        """
+        ts = np.sort(np.asarray(ts_ms, dtype=np.int64))
+        if len(ts) == 0:
+            return
+        with self._lock:
+            self._ingest_sorted(ts)
+
+    def _ingest_sorted(self, ts: np.ndarray):
+        # 간격은 초 단위 절삭 후 차이 (Timedelta.dt.seconds와 동일)
+        secs = ts // 1000
+        prev = np.empty_like(secs)
+        prev[1:] = secs[:-1]
+        prev[0] = self.last_ts // 1000 if self.last_ts is not None else secs[0]
+        intervals = (secs - prev).astype(np.float64)
+        valid = (intervals >= 0) & (intervals < INTERVAL_THRESHOLD)
+        if self.last_ts is None:
+            valid[0] = False
+
+        months, weeks, hours = period_keys(ts.astype("datetime64[ms]"))
+        days = secs // 86400
+        for g, keys in zip(GRANULARITIES, (hours, days, weeks, months)):
+            _aggregate(keys, ts, intervals, valid, self.buckets[g])
+
+        self.first_ts = int(ts[0]) if self.first_ts is None else min(self.first_ts, int(ts[0]))
+        self.last_ts = int(ts[-1]) if self.last_ts is None else max(self.last_ts, int(ts[-1]))
+        self.events += len(ts)
+        self.version += 1
+
+    def _bpm(self, granularity: str, keys, labeler, name: str) -> pd.Series:
+        buckets = self.buckets[granularity]
+        keys = sorted(k for k in keys if buckets[k].valid_count > 0)
+        interval_sums = np.array([buckets[k].interval_sum for k in keys], dtype=np.float64)
+        valid_counts = np.array([buckets[k].valid_count for k in keys], dtype=np.float64)
+        # 유효 간격이 모두 0초(같은 초의 깜빡임)면 analyze_tablet_data와 같이 inf
+        with np.errstate(divide="ignore"):
+            values = 60 / (interval_sums / valid_counts)
+        index = pd.Index(labeler(np.array(keys, dtype=np.int64)), dtype=object, name=name)
+        return pd.Series(values, index=index, name="BLINK_INTERVAL", dtype=np.float64)
+
+    def analyze(self):
+        """
+        Same (last_month, last_week, this_week) Series as analyze_tablet_data.
+        """
+        with self._lock:
+            return self._analyze()
+
+    def _analyze(self):
+        months, weeks, _ = period_keys(np.array([self.last_ts], dtype="datetime64[ms]"))
+        cur_month, cur_week = int(months[0]), int(weeks[0])
+        month_keys = [k for k in self.buckets["month"] if k < cur_month]
+        week_keys = [k for k in self.buckets["week"] if k == cur_week - 7]
+        # 이번 주(월요일 0시부터)의 시간 버킷
+        first_hour = cur_week * 24
+        hour_keys = [k for k in self.buckets["hour"] if first_hour <= k < first_hour + 7 * 24]
+        return (
+            self._bpm("month", month_keys, month_labels, "DATE_MONTH"),
+            self._bpm("week", week_keys, week_labels, "DATE_WEEK"),
+            self._bpm("hour", hour_keys, hour_labels, "DATE_HOUR"),
+        )
+
+    def hourly_bpm(self, date: str) -> pd.Series:
+        """
+        Hourly mean blinks per minute of one day, like the second value of clean_and_slide_data.
+        Intervals are taken in a single pass, so unlike the DataFrame path the first
+        valid interval of the day is kept.
+        :param date: Day in "YYYY-MM-DD" format.
+        :return: Series indexed by "%H", only hours with at least MIN_LOG_NUM valid logs.
+        """
+        with self._lock:
+            return self._hourly_bpm(date)
+
+    def _hourly_bpm(self, date: str) -> pd.Series:
+        first_hour = int(np.datetime64(date, "h").astype(np.int64))
+        hours = self.buckets["hour"]
+        keys = sorted(k for k in hours if first_hour <= k < first_hour + 24 and hours[k].valid_count >= MIN_LOG_NUM)
+        values = [hours[k].bpm_sum / hours[k].valid_count for k in keys]
+        index = pd.Index([f"{k - first_hour:02d}" for k in keys], dtype=object, name="TIMESTAMP")
+        return pd.Series(values, index=index, name="BLINK_PER_MINUTE", dtype=np.float64)
+
+    def joined_at(self) -> Optional[str]:
+        if self.first_ts is None:
+            return None
+        return str(np.datetime64(self.first_ts, "ms").astype("datetime64[s]"))
+
+
+class RollingBlinkRate:
+    """
+    최근 window_s초 안의 유효 간격으로 계산한 분당 깜빡임 (이벤트당 O(1))
+    - 간격/유효 조건은 analyze()와 같음: 초 단위 절삭 후 차이, 0 <= 간격 < INTERVAL_THRESHOLD
+    """
+    def __init__(self, window_s: float = 300.0):
+        self.window_ms = int(window_s * 1000)
+        self._intervals: Deque[Tuple[int, int]] = deque()   # (이벤트 epoch ms, 간격 초)
+        self._interval_sum = 0
+        self.last_ts: Optional[int] = None
+        self.events = 0
+
+    def push(self, ts_ms: int):
+        ts_ms = int(ts_ms)
+        self.events += 1
+        if self.last_ts is not None:
+            interval = ts_ms // 1000 - self.last_ts // 1000
+            if 0 <= interval < INTERVAL_THRESHOLD:
+                self._intervals.append((ts_ms, interval))
+                self._interval_sum += interval
+        # 늦게 도착한 이벤트는 간격만 무효, 기준 시각은 유지
+        self.last_ts = ts_ms if self.last_ts is None else max(self.last_ts, ts_ms)
+        cutoff = self.last_ts - self.window_ms
+        while self._intervals and self._intervals[0][0] < cutoff:
+            self._interval_sum -= self._intervals.popleft()[1]
+
+    def bpm(self) -> Optional[float]:
+        """60 / 평균 유효 간격, 유효 간격이 없으면 None"""
+        if not self._intervals or self._interval_sum == 0:
+            return None
+        return 60 * len(self._intervals) / self._interval_sum
+
+
+class RollupStore:
+    """
+    사용자별 UserRollup 모음
+    - 저장소 세그먼트 번호 순서대로 반영하므로 다른 프로세스(uvicorn 워커)가 쓴 세그먼트도 sync()로 따라감
+    - 마지막 이벤트보다 이른 이벤트가 든 세그먼트(늦게 온 오프라인 세션 등)는 간격이 앞뒤 이벤트와 이어져야 하므로
+      전체 세그먼트를 시간순으로 다시 집계 (O(기록 길이), 순서대로 오는 세그먼트는 O(세그먼트))
+    """
+    def __init__(self):
+        self.users: Dict[str, UserRollup] = {}
+        # 사용자별로 반영한 마지막 세그먼트 번호
+        self.synced: Dict[str, int] = {}
+        # 동시에 sync()하면 같은 세그먼트를 두 번 반영하므로 한 번에 하나씩
+        self._sync_lock = threading.Lock()
+
+    def ingest(self, user: str, ts_ms: np.ndarray) -> UserRollup:
+        rollup = self.users.get(user)
+        if rollup is None:
+            rollup = self.users[user] = UserRollup()
+        rollup.ingest(ts_ms)
+        return rollup
+
+    def sync(self, store, user: str) -> Optional[UserRollup]:
+        """
+        Fold in the user's segments written since the last sync, by any process, in segment order.
+        :param store: BlinkStore holding the user's segments.
+        """
+        with self._sync_lock:
+            return self._sync(store, user)
+
+    def _sync(self, store, user: str) -> Optional[UserRollup]:
+        segments, rebuild = store.segments_since(user, self.synced.get(user, 0))
+        if not rebuild:
+            # 반영한 마지막 이벤트보다 이른 이벤트가 있으면 이어 붙일 수 없음
+            last_ts = self.users[user].last_ts if user in self.users else None
+            for _, seg in segments:
+                if len(seg) == 0:
+                    continue
+                if last_ts is not None and int(seg.min()) < last_ts:
+                    rebuild = True
+                    break
+                last_ts = int(seg.max()) if last_ts is None else max(last_ts, int(seg.max()))
+            if rebuild:
+                segments, _ = store.segments_since(user, 0)
+        if rebuild:
+            # compact로 합쳐졌거나 늦게 온 이벤트 → 전체 이벤트를 시간순 한 배치로 처음부터 다시 집계
+            old = self.users.pop(user, None)
+            rollup = self.users[user] = UserRollup()
+            if old is not None:
+                rollup.version = old.version + 1
+            if segments:
+                rollup.ingest(np.concatenate([seg for _, seg in segments]))
+                self.synced[user] = segments[-1][0]
+            return rollup
+        for seq, seg in segments:
+            self.ingest(user, seg)
+            self.synced[user] = seq
+        return self.users.get(user)
+
+    def get(self, user: str) -> Optional[UserRollup]:
+        return self.users.get(user)
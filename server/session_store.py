@@ -0,0 +1,340 @@
+"""
+Bounded session store for received blink sessions.
+
+Entries expire ttl seconds after their last write. Expiry times are kept in a
+min-heap, so expiring one entry costs O(log n) and can be done a few at a
+time on every write and from a short background tick, instead of a full
+sweep. The store also holds at most max_entries entries and max_bytes
+estimated bytes, evicting least recently used entries beyond either bound.
+
+Two backends share that interface:
+    SessionStore        in-process dict + heap (single worker)
+    SqliteSessionStore  SQLite file in WAL mode, shared by every worker on the host
+
+SqliteSessionStore calls can wait on the file lock (up to the 5 s busy timeout),
+so it sets blocking = True and async callers run it in a thread.
+"""
+import heapq
+import itertools
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, List, Optional, Tuple
+
+
+def estimate_size(value: Any) -> int:
+    """
+    Rough deep size of JSON-like values (dict/list/str/number) in bytes.
+    """
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        size += sum(estimate_size(k) + estimate_size(v) for k, v in value.items())
+    elif isinstance(value, (list, tuple)):
+        size += sum(estimate_size(v) for v in value)
+    return size
+
+
+class SessionStore:
+    """
+    TTL + LRU 세션 저장소 (항목 수/바이트 상한)
+    - _entries: LRU 순서 (조회/쓰기 시 끝으로 이동)
+    - _expiry: (만료 시각, 순번, 키) 최소 힙, 덮어쓴 항목의 옛 힙 원소는 꺼낼 때 무시
+    """
+    def __init__(self, ttl: float = 3600.0, max_entries: int = 100_000, max_bytes: int = 64 << 20,
+                 expire_batch: int = 64):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.expire_batch = expire_batch
+        self._entries: "OrderedDict[Hashable, Tuple[float, int, Any]]" = OrderedDict()
+        self._expiry: List[Tuple[float, int, Hashable]] = []
+        self._seq = itertools.count()
+        self.bytes = 0
+        self.expired = 0
+        self.evictions = 0
+
+    # 루프에서 바로 호출 (스레드 안전하지 않음)
+    blocking = False
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: Hashable) -> bool:
+        entry = self._entries.get(key)
+        return entry is not None and entry[0] > time.monotonic()
+
+    def __setitem__(self, key: Hashable, value: Any):
+        self.put(key, value)
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        entry = self._entries.get(key)
+        if entry is None:
+            return default
+        if entry[0] <= time.monotonic():
+            self._remove(key)
+            self.expired += 1
+            return default
+        self._entries.move_to_end(key)
+        return entry[2]
+
+    def put(self, key: Hashable, value: Any):
+        now = time.monotonic()
+        if key in self._entries:
+            self._remove(key)
+        expires_at = now + self.ttl
+        size = estimate_size(key) + estimate_size(value)
+        self._entries[key] = (expires_at, size, value)
+        self.bytes += size
+        heapq.heappush(self._expiry, (expires_at, next(self._seq), key))
+        # 쓰기마다 만료 항목 일부 정리 후 상한 초과분은 LRU부터 제거
+        self.expire(now, self.expire_batch)
+        while len(self._entries) > self.max_entries or (self.bytes > self.max_bytes and len(self._entries) > 1):
+            self._remove(next(iter(self._entries)))
+            self.evictions += 1
+
+    def put_new(self, key: Hashable, value: Any) -> bool:
+        """
+        Store value only if key is absent or expired.
+        :return: True when the value was stored.
+        """
+        if key in self:
+            return False
+        self.put(key, value)
+        return True
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        entry = self._entries.get(key)
+        if entry is None:
+            return default
+        self._remove(key)
+        return entry[2]
+
+    def _remove(self, key: Hashable):
+        _, size, _ = self._entries.pop(key)
+        self.bytes -= size
+        # 힙 원소가 항목보다 너무 많이 쌓이면 재구성 (덮어쓰기/LRU 제거로 남은 원소)
+        if len(self._expiry) > 2 * len(self._entries) + 64:
+            self._expiry = [(e[0], next(self._seq), k) for k, e in self._entries.items()]
+            heapq.heapify(self._expiry)
+
+    def expire(self, now: Optional[float] = None, limit: Optional[int] = None) -> int:
+        """
+        Remove up to limit expired entries (all of them when limit is None).
+        :return: Number of entries removed.
+        """
+        now = time.monotonic() if now is None else now
+        removed = 0
+        while self._expiry and self._expiry[0][0] <= now and (limit is None or removed < limit):
+            expires_at, _, key = heapq.heappop(self._expiry)
+            entry = self._entries.get(key)
+            # 덮어쓰였거나 이미 제거된 항목의 옛 원소
+            if entry is None or entry[0] != expires_at:
+                continue
+            self._remove(key)
+            self.expired += 1
+            removed += 1
+        return removed
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "backend": "memory",
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "bytes": self.bytes,
+            "max_bytes": self.max_bytes,
+            "ttl": self.ttl,
+            "expired": self.expired,
+            "evictions": self.evictions,
+        }
+
+
+class SqliteSessionStore:
+    """
+    SessionStore와 같은 인터페이스의 SQLite(WAL) 구현, 같은 파일을 여는 모든 프로세스가 공유
+    - 만료/LRU는 expires_at, used_at 인덱스로 처리 (항목당 O(log n))
+    - 항목 수/바이트 합계는 트리거가 totals 행에 유지
+    - 값은 JSON으로 저장, 크기는 JSON 바이트 수
+    - 연결 하나를 스레드들이 나눠 쓰므로 읽기/쓰기 모두 _mutex 안에서
+    """
+    _SCHEMA = """
+    CREATE TABLE IF NOT EXISTS sessions (
+        key TEXT PRIMARY KEY,
+        value TEXT NOT NULL,
+        size INTEGER NOT NULL,
+        expires_at REAL NOT NULL,
+        used_at REAL NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS sessions_expiry ON sessions(expires_at);
+    CREATE INDEX IF NOT EXISTS sessions_lru ON sessions(used_at);
+    CREATE TABLE IF NOT EXISTS totals (
+        id INTEGER PRIMARY KEY CHECK (id = 0),
+        entries INTEGER NOT NULL, bytes INTEGER NOT NULL, expired INTEGER NOT NULL, evictions INTEGER NOT NULL
+    );
+    INSERT OR IGNORE INTO totals VALUES (0, 0, 0, 0, 0);
+    CREATE TRIGGER IF NOT EXISTS sessions_ins AFTER INSERT ON sessions BEGIN
+        UPDATE totals SET entries = entries + 1, bytes = bytes + NEW.size;
+    END;
+    CREATE TRIGGER IF NOT EXISTS sessions_upd AFTER UPDATE OF size ON sessions BEGIN
+        UPDATE totals SET bytes = bytes - OLD.size + NEW.size;
+    END;
+    CREATE TRIGGER IF NOT EXISTS sessions_del AFTER DELETE ON sessions BEGIN
+        UPDATE totals SET entries = entries - 1, bytes = bytes - OLD.size;
+    END;
+    """
+
+    def __init__(self, path: str, ttl: float = 3600.0, max_entries: int = 100_000, max_bytes: int = 64 << 20,
+                 expire_batch: int = 64):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.expire_batch = expire_batch
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        # autocommit, 쓰기는 BEGIN IMMEDIATE로 묶음
+        self._db = sqlite3.connect(path, isolation_level=None, check_same_thread=False, timeout=5.0)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(self._SCHEMA)
+        self._mutex = threading.Lock()
+
+    # 파일 잠금 대기가 있으므로 비동기 코드에서는 스레드로 호출
+    blocking = True
+
+    def _totals(self) -> Tuple[int, int, int, int]:
+        return self._db.execute("SELECT entries, bytes, expired, evictions FROM totals").fetchone()
+
+    @property
+    def bytes(self) -> int:
+        with self._mutex:
+            return self._totals()[1]
+
+    def __len__(self) -> int:
+        with self._mutex:
+            return self._totals()[0]
+
+    def _live(self, key: Hashable, now: float) -> bool:
+        return self._db.execute("SELECT 1 FROM sessions WHERE key = ? AND expires_at > ?", (key, now)).fetchone() is not None
+
+    def __contains__(self, key: Hashable) -> bool:
+        with self._mutex:
+            return self._live(key, time.time())
+
+    def __setitem__(self, key: Hashable, value: Any):
+        self.put(key, value)
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        now = time.time()
+        with self._mutex:
+            row = self._db.execute("SELECT value, expires_at FROM sessions WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return default
+            if row[1] <= now:
+                self._db.execute("BEGIN IMMEDIATE")
+                if self._db.execute("DELETE FROM sessions WHERE key = ? AND expires_at <= ?", (key, now)).rowcount:
+                    self._db.execute("UPDATE totals SET expired = expired + 1")
+                self._db.execute("COMMIT")
+                return default
+            self._db.execute("UPDATE sessions SET used_at = ? WHERE key = ?", (now, key))
+        return json.loads(row[0])
+
+    def put(self, key: Hashable, value: Any):
+        self._put(key, value, only_new=False)
+
+    def put_new(self, key: Hashable, value: Any) -> bool:
+        """
+        Store value only if key is absent or expired, atomically across every process sharing the file.
+        :return: True when the value was stored.
+        """
+        return self._put(key, value, only_new=True)
+
+    def _put(self, key: Hashable, value: Any, only_new: bool) -> bool:
+        now = time.time()
+        text = json.dumps(value, ensure_ascii=False)
+        size = len(text.encode()) + len(str(key).encode())
+        with self._mutex:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                if only_new and self._live(key, now):
+                    self._db.execute("COMMIT")
+                    return False
+                self._db.execute(
+                    "INSERT INTO sessions VALUES (?, ?, ?, ?, ?) ON CONFLICT(key) DO UPDATE SET "
+                    "value = excluded.value, size = excluded.size, expires_at = excluded.expires_at, used_at = excluded.used_at",
+                    (key, text, size, now + self.ttl, now),
+                )
+                # 쓰기마다 만료 항목 일부 정리 후 상한 초과분은 LRU부터 제거
+                self._expire(now, self.expire_batch)
+                entries, total, _, _ = self._totals()
+                while entries > self.max_entries or (total > self.max_bytes and entries > 1):
+                    n = max(entries - self.max_entries, 1)
+                    removed = self._db.execute(
+                        "DELETE FROM sessions WHERE key IN (SELECT key FROM sessions ORDER BY used_at LIMIT ?)", (n,)
+                    ).rowcount
+                    self._db.execute("UPDATE totals SET evictions = evictions + ?", (removed,))
+                    entries, total, _, _ = self._totals()
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+        return True
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        with self._mutex:
+            row = self._db.execute("DELETE FROM sessions WHERE key = ? RETURNING value", (key,)).fetchone()
+        return json.loads(row[0]) if row is not None else default
+
+    def _expire(self, now: float, limit: Optional[int]) -> int:
+        removed = self._db.execute(
+            "DELETE FROM sessions WHERE key IN (SELECT key FROM sessions WHERE expires_at <= ? ORDER BY expires_at LIMIT ?)",
+            (now, -1 if limit is None else limit),
+        ).rowcount
+        if removed:
+            self._db.execute("UPDATE totals SET expired = expired + ?", (removed,))
+        return removed
+
+    def expire(self, now: Optional[float] = None, limit: Optional[int] = None) -> int:
+        """
+        Remove up to limit expired entries (all of them when limit is None).
+        :return: Number of entries removed.
+        """
+        with self._mutex:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                removed = self._expire(time.time() if now is None else now, limit)
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+        return removed
+
+    def stats(self) -> Dict[str, Any]:
+        with self._mutex:
+            entries, total, expired, evictions = self._totals()
+        return {
+            "backend": "sqlite",
+            "path": self.path,
+            "entries": entries,
+            "max_entries": self.max_entries,
+            "bytes": total,
+            "max_bytes": self.max_bytes,
+            "ttl": self.ttl,
+            "expired": expired,
+            "evictions": evictions,
+        }
+
+
+def open_session_store(backend: str = "memory", path: str = "data/sessions.db", **limits):
+    """
+    :param backend: "memory" (single process) or "sqlite" (shared by every worker using path).
+    :param limits: ttl, max_entries, max_bytes, expire_batch.
+    """
+    if backend == "sqlite":
+        return SqliteSessionStore(path, **limits)
+    if backend == "memory":
+        return SessionStore(**limits)
+    raise ValueError(f"Unknown session store backend: {backend!r}")
@@ -2,22 +2,28 @@
 # -*- coding: utf-8 -*-
 """
 Silero VAD v5 (ONNX) - 프레임별 출력 버전
-- 16kHz mono 권장 (다르면 자동 변환)
+- 16kHz mono 권장 (다르면 블록 단위로 다운믹스·리샘플)
 - 32 ms (512 샘플) 단위로 스트리밍
 - 프레임마다 SPEECH/SILENCE 라벨과 확률 출력
 """
 import argparse
+import glob
+import json
+import multiprocessing
+import os
 import queue
 import threading
 import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 from dataclasses import dataclass
-from typing import Callable, List, Optional, Tuple
+from typing import Callable, Iterable, Iterator, List, Optional, Tuple
 
 import numpy as np
 import torch  # onnx=True여도 내부 전처리/상태에 필요
 from silero_vad import load_silero_vad  # v5 API (onnx=True)
 import soundfile as sf
-from scipy.signal import resample_poly
+from scipy.signal import firwin
 
 TARGET_SR = 16000
 BLOCK_SAMPLES = 512   # 32 ms @ 16k
@@ -28,11 +34,137 @@ class Segment:
     start_s: float
     end_s: float
 
+def _hysteresis_step(gate, is_speech: bool) -> Optional[str]:
+    """
+    gate(speech_frames/silence_frames/in_speech/min_*_frames)를 한 프레임 진행
+    반환: "speech_start" / "speech_end" / None
+    """
+    if is_speech:
+        gate.speech_frames += 1
+        gate.silence_frames = 0
+    else:
+        gate.silence_frames += 1
+        gate.speech_frames = 0
+
+    if not gate.in_speech and gate.speech_frames >= gate.min_speech_frames:
+        gate.in_speech = True
+        return "speech_start"
+    if gate.in_speech and gate.silence_frames >= gate.min_silence_frames:
+        gate.in_speech = False
+        return "speech_end"
+    return None
+
+class VADModelPool:
+    """
+    프로세스 공용 Silero 모델 풀
+    - 모델은 acquire() 때 필요한 만큼 로드 (최대 size개), warm(count)로 count개를 미리 로드
+    - acquire()로 대여 / release()로 반납 (상태 리셋)
+    - 모두 대여 중이면 timeout 초까지 대기 후 TimeoutError
+    - discard()된 자리는 기다리던(또는 다음) acquire가 새로 로드
+    """
+    def __init__(self, size: int = 4, onnx: bool = True):
+        self.size = size
+        self.onnx = onnx
+        self._idle: List = []  # 마지막에 반납된 모델부터 대여 (LIFO)
+        self._cond = threading.Condition()
+        self.created = 0
+        self.in_use = 0
+        self.waits = 0
+        self.timeouts = 0
+
+    def _load(self):
+        # 자리는 호출 전에 예약됨, 실패하면 자리를 돌려주고 대기자를 깨움
+        try:
+            return load_silero_vad(onnx=self.onnx)
+        except Exception:
+            with self._cond:
+                self.created -= 1
+                self._cond.notify()
+            raise
+
+    def warm(self, count: Optional[int] = None):
+        """로드된 모델이 count개(None이면 size개, 최대 size개)가 될 때까지 로드"""
+        count = self.size if count is None else min(count, self.size)
+        while True:
+            with self._cond:
+                if self.created >= count:
+                    return
+                self.created += 1
+            model = self._load()
+            with self._cond:
+                self._idle.append(model)
+                self._cond.notify()
+
+    def acquire(self, timeout: Optional[float] = None):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        waited = False
+        with self._cond:
+            while True:
+                if self._idle:
+                    self.in_use += 1
+                    return self._idle.pop()
+                if self.created < self.size:
+                    # 빈 자리 예약 후 잠금 밖에서 로드
+                    self.created += 1
+                    break
+                if not waited:
+                    self.waits += 1
+                    waited = True
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    self.timeouts += 1
+                    raise TimeoutError(f"No VAD model available within {timeout}s")
+                # release()/discard()가 깨움
+                self._cond.wait(remaining)
+        model = self._load()
+        with self._cond:
+            self.in_use += 1
+        return model
+
+    def release(self, model):
+        try:
+            model.reset_states()
+        except Exception:
+            self.discard(model)
+            return
+        with self._cond:
+            self.in_use -= 1
+            self._idle.append(model)
+            self._cond.notify()
+
+    def discard(self, model):
+        """사용 중 상태가 불확실한 모델은 버리고 자리만 반환 (기다리던 acquire가 새로 로드)"""
+        with self._cond:
+            self.in_use -= 1
+            self.created -= 1
+            self._cond.notify()
+
+    def stats(self):
+        with self._cond:
+            return {
+                "size": self.size,
+                "created": self.created,
+                "idle": len(self._idle),
+                "in_use": self.in_use,
+                "waits": self.waits,
+                "timeouts": self.timeouts,
+            }
+
+_shared_pool: Optional[VADModelPool] = None
+
+def shared_model_pool(size: int = 4) -> VADModelPool:
+    """프로세스 공용 풀 (첫 호출의 size로 생성)"""
+    global _shared_pool
+    if _shared_pool is None:
+        _shared_pool = VADModelPool(size=size, onnx=True)
+    return _shared_pool
+
 class RealTimeSileroVAD:
     """
     - onnx=True 로 v5 ONNX 백엔드
     - 프레임마다 callback(event, t_s, prob, chunk) 호출 (event ∈ {"frame", "speech_start", "speech_end"})
     - 안전 종료(sentinel + join)
+    - pool을 주면 모델을 새로 로드하지 않고 풀에서 대여, stop() 때 반납
     """
     def __init__(
         self,
@@ -41,15 +173,21 @@ class RealTimeSileroVAD:
         min_speech_frames: int = 3,   # ≈ 96 ms
         min_silence_frames: int = 6,  # ≈ 192 ms
         onnx: bool = True,
+        pool: Optional[VADModelPool] = None,
+        acquire_timeout: Optional[float] = None,
+        max_queue: int = 0,           # 0이면 무제한, 가득 차면 가장 오래된 프레임을 버림
     ):
         self.sample_rate = sample_rate
         self.threshold = threshold
         self.min_speech_frames = min_speech_frames
         self.min_silence_frames = min_silence_frames
 
-        self.model = load_silero_vad(onnx=onnx)
+        self.pool = pool
+        self.model = pool.acquire(acquire_timeout) if pool is not None else load_silero_vad(onnx=onnx)
 
-        self.q: "queue.Queue[np.ndarray]" = queue.Queue()
+        self.q: "queue.Queue[Tuple[int, np.ndarray]]" = queue.Queue(maxsize=max_queue)
+        self.dropped = 0
+        self._put_frames = 0  # 투입 순번 (버린 프레임도 포함 → 시각 유지)
         self.running = False
         self.callback: Optional[Callable[[str, float, float, np.ndarray], None]] = None
 
@@ -58,9 +196,19 @@ class RealTimeSileroVAD:
         self.in_speech = False
         self.stream_frames = 0
 
+        # 처리 통계: 처리한 프레임 수, 최근 1초 이상 구간의 초당 처리 프레임
+        self.processed = 0
+        self.fps = 0.0
+        self._fps_mark = time.perf_counter()
+        self._fps_frames = 0
+
         self._SENTINEL = object()
         self._th: Optional[threading.Thread] = None
 
+    @property
+    def queue_depth(self) -> int:
+        return self.q.qsize()
+
     def start(self, callback: Optional[Callable[[str, float, float, np.ndarray], None]] = None):
         self.running = True
         self.callback = callback
@@ -73,18 +221,38 @@ class RealTimeSileroVAD:
             self.q.put_nowait(self._SENTINEL)
         except queue.Full:
             pass
+        alive = False
+        if self._th is not None:
+            self._th.join(timeout=2.0)
+            alive = self._th.is_alive()
+            self._th = None
+        if self.pool is not None:
+            if self.model is not None:
+                # 워커가 아직 돌고 있으면 모델을 다른 스트림에 넘기지 않음
+                (self.pool.discard if alive else self.pool.release)(self.model)
+                self.model = None
+            return
         try:
             self.model.reset_states()
         except Exception:
             pass
-        if self._th is not None:
-            self._th.join(timeout=2.0)
-            self._th = None
 
     def put(self, chunk: np.ndarray):
         if chunk.dtype != np.float32:
             chunk = chunk.astype(np.float32)
-        self.q.put(chunk)
+        item = (self._put_frames, chunk)
+        self._put_frames += 1
+        while True:
+            try:
+                self.q.put_nowait(item)
+                return
+            except queue.Full:
+                # 추론이 밀리면 가장 오래된 프레임부터 버림 (drop-oldest)
+                try:
+                    self.q.get_nowait()
+                    self.dropped += 1
+                except queue.Empty:
+                    pass
 
     def _emit(self, event: str, prob: float, chunk: np.ndarray):
         if self.callback:
@@ -94,14 +262,17 @@ class RealTimeSileroVAD:
     def _run(self):
         while True:
             try:
-                chunk = self.q.get(timeout=0.1)
+                item = self.q.get(timeout=0.1)
             except queue.Empty:
                 if not self.running:
                     break
                 continue
 
-            if chunk is self._SENTINEL:
+            if item is self._SENTINEL:
                 break
+            seq, chunk = item
+            # 앞에서 버려진 프레임이 있으면 그만큼 시각을 건너뜀
+            self.stream_frames = seq
 
             t = torch.from_numpy(chunk)            # 1D tensor
             prob = float(self.model(t, self.sample_rate))
@@ -110,36 +281,326 @@ class RealTimeSileroVAD:
             # 프레임 이벤트는 항상 쏴줌 (요구사항 반영)
             self._emit("frame", prob, chunk)
 
-            # 히스테리시스
-            if is_speech:
-                self.speech_frames += 1
-                self.silence_frames = 0
-            else:
-                self.silence_frames += 1
-                self.speech_frames = 0
-
-            # 시작/종료 이벤트
-            if not self.in_speech and self.speech_frames >= self.min_speech_frames:
-                self.in_speech = True
-                self._emit("speech_start", prob, chunk)
-            elif self.in_speech and self.silence_frames >= self.min_silence_frames:
-                self.in_speech = False
-                self._emit("speech_end", prob, chunk)
+            # 히스테리시스 → 시작/종료 이벤트
+            event = _hysteresis_step(self, is_speech)
+            if event:
+                self._emit(event, prob, chunk)
 
             self.stream_frames += 1
+            self.processed += 1
+            self._fps_frames += 1
+            now = time.perf_counter()
+            if now - self._fps_mark >= 1.0:
+                self.fps = self._fps_frames / (now - self._fps_mark)
+                self._fps_mark, self._fps_frames = now, 0
 
-def load_wav_mono_f32(path: str, target_sr: int = TARGET_SR) -> np.ndarray:
+CONTEXT_SAMPLES = 64  # v5 ONNX는 직전 프레임의 마지막 64 샘플을 앞에 붙여 입력
+
+class VADStream:
     """
-    WAV 로드 → mono → float32 → 필요시 16k로 리샘플
+    BatchedSileroVAD의 스트림 하나 (RealTimeSileroVAD와 같은 put/stop 인터페이스)
+    - 재귀 상태(state/context)와 히스테리시스는 스트림별로 유지
+    - 대기 프레임이 max_queue개면 가장 오래된 것부터 버림 (dropped, 이벤트 시각은 버린 프레임 포함)
     """
-    audio, sr = sf.read(path, always_2d=True, dtype="float32")
-    mono = audio[:, 0]
-    if sr != target_sr:
+    def __init__(
+        self,
+        engine: "BatchedSileroVAD",
+        callback: Optional[Callable[[str, float, float, np.ndarray], None]],
+        threshold: float,
+        min_speech_frames: int,
+        min_silence_frames: int,
+        max_queue: int = 0,           # 0이면 무제한
+    ):
+        self.engine = engine
+        self.callback = callback
+        self.threshold = threshold
+        self.min_speech_frames = min_speech_frames
+        self.min_silence_frames = min_silence_frames
+
+        self.max_queue = max_queue
+        self.pending: "deque[Tuple[int, np.ndarray]]" = deque()
+        self.dropped = 0
+        self._put_frames = 0  # 투입 순번 (버린 프레임도 포함 → 시각 유지)
+        self.state = np.zeros((2, 128), dtype=np.float32)
+        self.context = np.zeros(CONTEXT_SAMPLES, dtype=np.float32)
+
+        self.speech_frames = 0
+        self.silence_frames = 0
+        self.in_speech = False
+        self.stream_frames = 0
+        self.closed = False
+        self._drained = threading.Event()
+
+    @property
+    def queue_depth(self) -> int:
+        return len(self.pending)
+
+    def put(self, chunk: np.ndarray):
+        if chunk.dtype != np.float32:
+            chunk = chunk.astype(np.float32)
+        # 엔진이 밀리면 가장 오래된 프레임부터 버림 (drop-oldest, 엔진 스레드와 동시에 꺼내도 안전)
+        while self.max_queue > 0 and len(self.pending) >= self.max_queue:
+            try:
+                self.pending.popleft()
+                self.dropped += 1
+            except IndexError:
+                break
+        self.pending.append((self._put_frames, chunk))
+        self._put_frames += 1
+        self.engine._wake.set()
+
+    def stop(self, timeout: float = 2.0):
+        """남은 프레임을 처리한 뒤 엔진에서 분리"""
+        self.closed = True
+        self.engine._wake.set()
+        self._drained.wait(timeout)
+
+    def _emit(self, event: str, prob: float, chunk: np.ndarray):
+        if self.callback:
+            t_s = self.stream_frames * DT
+            self.callback(event, t_s, prob, chunk)
+
+
+class BatchedSileroVAD:
+    """
+    여러 스트림을 하나의 ONNX 세션으로 처리하는 공유 엔진 (항상 ONNX 백엔드)
+    - 지금은 benchmark.py vad-streams 비교용, /vad-stream 서버 경로는 VADModelPool + RealTimeSileroVAD 사용
+    - 틱마다 모든 스트림의 대기 프레임을 모아 한 번의 배치 추론 (스트림당 1프레임/라운드)
+    - 스트림별 state/context를 (2, B, 128) / (B, 64)로 쌓아서 입력
+    - 이벤트(frame/speech_start/speech_end)는 RealTimeSileroVAD와 동일
+    """
+    def __init__(self, sample_rate: int = TARGET_SR, tick: float = DT / 4, max_batch: int = 256):
+        if sample_rate != TARGET_SR:
+            raise ValueError(f"BatchedSileroVAD supports {TARGET_SR} Hz only")
+        self.sample_rate = sample_rate
+        self.tick = tick
+        self.max_batch = max_batch
+        self.session = _silero_session()
+        self._sr = np.array(sample_rate, dtype=np.int64)
+
+        self.streams: List[VADStream] = []
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self.running = False
+        self._th: Optional[threading.Thread] = None
+        self.batches = 0
+        self.frames = 0
+
+    def open_stream(
+        self,
+        callback: Optional[Callable[[str, float, float, np.ndarray], None]] = None,
+        threshold: float = 0.5,
+        min_speech_frames: int = 3,
+        min_silence_frames: int = 6,
+        max_queue: int = 0,
+    ) -> VADStream:
+        stream = VADStream(self, callback, threshold, min_speech_frames, min_silence_frames, max_queue)
+        with self._lock:
+            self.streams.append(stream)
+        return stream
+
+    def start(self):
+        self.running = True
+        self._th = threading.Thread(target=self._run, daemon=True)
+        self._th.start()
+
+    def stop(self):
+        self.running = False
+        self._wake.set()
+        if self._th is not None:
+            self._th.join(timeout=2.0)
+            self._th = None
+
+    def infer(self, frames: np.ndarray, states: np.ndarray, contexts: np.ndarray):
+        """
+        한 번의 배치 추론
+        frames (B, 512), states (2, B, 128), contexts (B, 64) → probs (B,), new states, new contexts
+        """
+        x = np.concatenate([contexts, frames], axis=1)
+        out, state = self.session.run(None, {"input": x, "state": states, "sr": self._sr})
+        return out[:, 0], state, x[:, -CONTEXT_SAMPLES:]
+
+    def _step(self) -> bool:
+        """대기 프레임이 있는 스트림마다 1프레임씩 배치 처리, 처리했으면 True"""
+        with self._lock:
+            ready = [s for s in self.streams if s.pending][: self.max_batch]
+        if not ready:
+            return False
+
+        items = []
+        for s in ready:
+            try:
+                items.append((s, *s.pending.popleft()))
+            except IndexError:
+                # 그 사이 put()이 drop-oldest로 비움
+                pass
+        if not items:
+            return False
+        ready = [s for s, _, _ in items]
+        chunks = [chunk for _, _, chunk in items]
+        probs, states, contexts = self.infer(
+            np.stack(chunks),
+            np.stack([s.state for s in ready], axis=1),
+            np.stack([s.context for s in ready]),
+        )
+        self.batches += 1
+        self.frames += len(ready)
+
+        for i, (s, seq, chunk) in enumerate(items):
+            # 앞에서 버려진 프레임이 있으면 그만큼 시각을 건너뜀
+            s.stream_frames = seq
+            s.state = states[:, i, :]
+            s.context = contexts[i]
+            prob = float(probs[i])
+            s._emit("frame", prob, chunk)
+            event = _hysteresis_step(s, prob > s.threshold)
+            if event:
+                s._emit(event, prob, chunk)
+            s.stream_frames += 1
+        return True
+
+    def _reap(self):
+        with self._lock:
+            done = [s for s in self.streams if s.closed and not s.pending]
+            for s in done:
+                self.streams.remove(s)
+        for s in done:
+            s._drained.set()
+
+    def _run(self):
+        while self.running:
+            self._wake.wait(timeout=0.1)
+            self._wake.clear()
+            # 틱 동안 다른 스트림의 프레임이 모이도록 잠깐 대기
+            if self.tick > 0:
+                time.sleep(self.tick)
+            while self._step():
+                pass
+            self._reap()
+        # 종료 시 남은 프레임 처리
+        while self._step():
+            pass
+        with self._lock:
+            rest, self.streams = self.streams, []
+        for s in rest:
+            s._drained.set()
+
+class StreamingResampler:
+    """
+    블록 단위 polyphase 리샘플러 (resample_poly와 같은 필터, 블록 사이 overlap 유지)
+    - 출력 up개(입력 down개)가 한 주기: 주기마다 같은 (up × L) 계수 행렬을 입력 창에 곱함
+    - process(x): 지금까지 입력으로 확정되는 주기의 출력 반환 (지연 최대 1주기 + 필터 반쪽)
+    - flush(): 입력 끝을 0으로 채워 남은 출력 반환 (총 길이 ceil(n * up / down))
+    """
+    def __init__(self, sr: int, target_sr: int = TARGET_SR):
         g = np.gcd(sr, target_sr)
-        up = target_sr // g
-        down = sr // g
-        mono = resample_poly(mono, up, down).astype(np.float32, copy=False)
-    return mono
+        self.up = target_sr // g
+        self.down = sr // g
+        self._n_in = 0
+        self._n_out = 0
+        if self.up == self.down == 1:
+            return
+        # scipy.signal.resample_poly 기본 필터와 동일 (kaiser 5.0, half_len = 10 * max(up, down))
+        half_len = 10 * max(self.up, self.down)
+        h = firwin(2 * half_len + 1, 1.0 / max(self.up, self.down), window=("kaiser", 5.0)) * self.up
+        taps = -(-len(h) // self.up)
+        phase_filters = np.pad(h, (0, taps * self.up - len(h))).reshape(taps, self.up)
+
+        # 출력 m = c * up + r 은 입력 j = c * down + j_r - i (i < taps)에 phase_filters[i, p_r]를 곱한 합
+        r = np.arange(self.up)
+        pos = r * self.down + half_len
+        j_r, p_r = pos // self.up, pos % self.up
+        self._base = int(j_r[0]) - taps + 1
+        width = int(j_r[-1]) - self._base + 1
+        kernel = np.zeros((self.up, width), dtype=np.float64)
+        for i in range(taps):
+            kernel[r, j_r - i - self._base] = phase_filters[i, p_r]
+        self._kernel_t = kernel.T.astype(np.float32)
+        self._width = width
+        # _buf[0]의 절대 입력 인덱스 (처음엔 음수 인덱스 = 0)
+        self._buf = np.zeros(max(-self._base, 0), dtype=np.float32)
+        self._buf_start = min(self._base, 0)
+        self._cycle = 0
+
+    def _emit(self, cycles_end: int) -> np.ndarray:
+        n = cycles_end - self._cycle
+        if n <= 0:
+            return np.zeros(0, dtype=np.float32)
+        first = self._cycle * self.down + self._base - self._buf_start
+        windows = np.lib.stride_tricks.sliding_window_view(self._buf, self._width)[first :: self.down][:n]
+        # 연속 메모리로 복사해야 BLAS 경로를 탐
+        out = (np.ascontiguousarray(windows) @ self._kernel_t).reshape(-1)
+        self._cycle = cycles_end
+        # 다음 주기가 참조하는 입력 이전은 버림
+        keep = self._cycle * self.down + self._base - self._buf_start
+        self._buf = self._buf[keep:]
+        self._buf_start += keep
+        return out
+
+    def _ready_cycles(self) -> int:
+        # 주기 c는 입력 c * down + base + width - 1 까지 필요
+        buf_end = self._buf_start + len(self._buf)
+        return max((buf_end - self._base - self._width) // self.down + 1, self._cycle)
+
+    def process(self, x: np.ndarray) -> np.ndarray:
+        x = np.asarray(x, dtype=np.float32)
+        self._n_in += len(x)
+        if self.up == self.down == 1:
+            return x
+        self._buf = np.concatenate([self._buf, x])
+        out = self._emit(self._ready_cycles())
+        self._n_out += len(out)
+        return out
+
+    def flush(self) -> np.ndarray:
+        if self.up == self.down == 1:
+            return np.zeros(0, dtype=np.float32)
+        total = -(-self._n_in * self.up // self.down)
+        cycles = -(-total // self.up)
+        need = (cycles - 1) * self.down + self._base + self._width - (self._buf_start + len(self._buf))
+        if need > 0:
+            self._buf = np.concatenate([self._buf, np.zeros(need, dtype=np.float32)])
+        out = self._emit(cycles)[: max(total - self._n_out, 0)]
+        self._n_out += len(out)
+        return out
+
+def read_wav_blocks(path: str, target_sr: int = TARGET_SR, blocksize: int = 16384) -> Iterator[np.ndarray]:
+    """
+    WAV를 blocksize 프레임씩 읽어 mono(채널 평균) float32 target_sr 블록으로 반환
+    - 메모리는 파일 길이와 무관하게 블록 크기만큼만 사용
+    """
+    sr = sf.info(path).samplerate
+    rs = StreamingResampler(sr, target_sr)
+    for block in sf.blocks(path, blocksize=blocksize, dtype="float32", always_2d=True):
+        out = rs.process(block.mean(axis=1))
+        if len(out):
+            yield out
+    out = rs.flush()
+    if len(out):
+        yield out
+
+def wav_frames(path: str, target_sr: int = TARGET_SR, block: int = BLOCK_SAMPLES) -> Iterator[np.ndarray]:
+    """
+    read_wav_blocks를 block 샘플 프레임으로 다시 자름 (마지막은 zero-pad)
+    """
+    carry = np.zeros(0, dtype=np.float32)
+    for out in read_wav_blocks(path, target_sr):
+        buf = np.concatenate([carry, out]) if len(carry) else out
+        k = len(buf) // block
+        for i in range(k):
+            yield buf[i * block : (i + 1) * block]
+        carry = buf[k * block :]
+    if len(carry):
+        last = np.zeros(block, dtype=np.float32)
+        last[: len(carry)] = carry
+        yield last
+
+def load_wav_mono_f32(path: str, target_sr: int = TARGET_SR) -> np.ndarray:
+    """
+    WAV 로드 → mono → float32 → 필요시 16k로 리샘플 (파일 전체, read_wav_blocks와 같은 결과)
+    """
+    blocks = list(read_wav_blocks(path, target_sr))
+    return np.concatenate(blocks) if blocks else np.zeros(0, dtype=np.float32)
 
 def stream_chunks(x: np.ndarray, block: int = BLOCK_SAMPLES):
     """
@@ -155,49 +616,188 @@ def stream_chunks(x: np.ndarray, block: int = BLOCK_SAMPLES):
         last[:r] = x[-r:]
         yield last
 
-def main():
-    p = argparse.ArgumentParser(description="Silero VAD v5 (ONNX) - framewise demo")
-    p.add_argument("wav_path", type=str, help="입력 WAV 경로")
-    p.add_argument("--threshold", type=float, default=0.5, help="음성 확률 임계값")
-    p.add_argument("--min_speech_frames", type=int, default=3, help="연속 스피치 프레임(시작)")
-    p.add_argument("--min_silence_frames", type=int, default=6, help="연속 침묵 프레임(종료)")
-    p.add_argument("--realtime", action="store_true", help="콘솔 출력이 실시간처럼 보이게 32ms 대기")
-    args = p.parse_args()
+def _silero_session():
+    # 배치 추론은 ONNX 세션을 직접 호출 (.session은 ONNX 래퍼에만 있음)
+    return load_silero_vad(onnx=True).session
+
+OFFLINE_WINDOW_FRAMES = 512  # 오프라인 배치가 한 번에 펼치는 프레임 수 (16 s @ 16k)
+
+def frame_probabilities_many(wavs: List[np.ndarray], session=None, window: int = OFFLINE_WINDOW_FRAMES) -> List[np.ndarray]:
+    """
+    여러 독립 오디오의 프레임별 음성 확률 (스레드/큐 없이 ONNX 세션 직접 호출)
+    - 프레임 t마다 아직 끝나지 않은 오디오들을 한 배치로 추론 (오디오 수만큼 호출 수가 줄어듦)
+    - 재귀 상태(state/context)는 오디오별로 처음부터 이어가므로 각 결과는 스트리밍 경로와 같은 확률
+    - 입력은 window 프레임씩만 배치 버퍼로 옮기고 state/context는 창 사이로 이어감
+      → 추가 메모리는 파일 길이와 무관하게 오디오 수 x window 프레임
+    """
+    if session is None:
+        session = _silero_session()
+    sr = np.array(TARGET_SR, dtype=np.int64)
+    window = max(int(window), 1)
+    lengths = np.array([-(-len(w) // BLOCK_SAMPLES) for w in wavs], dtype=np.int64)
+    # 긴 것부터 정렬 → 프레임 t에서 진행 중인 오디오는 항상 앞쪽 active개
+    order = np.argsort(-lengths, kind="stable")
+    sorted_neg = -lengths[order]
+    n_max = int(lengths.max()) if len(lengths) else 0
+
+    result = [np.empty(n, dtype=np.float32) for n in lengths.tolist()]
+    state = np.zeros((2, len(wavs), 128), dtype=np.float32)
+    x = np.zeros((len(wavs), CONTEXT_SAMPLES + BLOCK_SAMPLES), dtype=np.float32)
+    buf = np.zeros((len(wavs), window * BLOCK_SAMPLES), dtype=np.float32)
+    probs = np.empty((len(wavs), window), dtype=np.float32)
+    for t0 in range(0, n_max, window):
+        t1 = min(t0 + window, n_max)
+        active_at = np.searchsorted(sorted_neg, -np.arange(t0, t1), side="left")
+        # 이번 창의 샘플만 복사 (마지막 프레임은 stream_chunks처럼 zero-pad)
+        for slot in range(int(active_at[0])):
+            chunk = wavs[order[slot]][t0 * BLOCK_SAMPLES : t1 * BLOCK_SAMPLES]
+            buf[slot, : len(chunk)] = chunk
+            buf[slot, len(chunk) :] = 0
+        for j, k in enumerate(active_at.tolist()):
+            # 직전 입력의 마지막 64 샘플이 다음 입력의 context
+            x[:k, :CONTEXT_SAMPLES] = x[:k, -CONTEXT_SAMPLES:]
+            x[:k, CONTEXT_SAMPLES:] = buf[:k, j * BLOCK_SAMPLES : (j + 1) * BLOCK_SAMPLES]
+            out, state[:, :k] = session.run(None, {"input": x[:k], "state": np.ascontiguousarray(state[:, :k]), "sr": sr})
+            probs[:k, j] = out[:, 0]
+        for slot in range(int(active_at[0])):
+            i = order[slot]
+            end = min(t1, int(lengths[i]))
+            result[i][t0:end] = probs[slot, : end - t0]
+    return result
+
+def frame_probabilities(wav: np.ndarray, session=None) -> np.ndarray:
+    """
+    파일 전체의 프레임별 음성 확률 (frame_probabilities_many의 한 파일 버전)
+    """
+    return frame_probabilities_many([wav], session=session)[0]
+
+def _run_starts(mask: np.ndarray, min_len: int) -> np.ndarray:
+    """mask의 연속 구간 중 길이가 min_len 이상인 구간에서 min_len번째 프레임 위치"""
+    if len(mask) == 0:
+        return np.zeros(0, dtype=np.int64)
+    m = np.concatenate([[False], mask, [False]]).astype(np.int8)
+    d = np.diff(m)
+    run_starts = np.flatnonzero(d == 1)
+    run_ends = np.flatnonzero(d == -1)
+    ok = run_ends - run_starts >= min_len
+    return run_starts[ok] + min_len - 1
+
+def hysteresis_events(probs: np.ndarray, threshold: float, min_speech_frames: int, min_silence_frames: int):
+    """
+    _hysteresis_step과 같은 규칙을 확률 배열 전체에 적용 (min_*_frames >= 1)
+    반환: (speech_start 프레임 인덱스, speech_end 프레임 인덱스)
+    """
+    is_speech = np.asarray(probs) > threshold
+    start_cand = _run_starts(is_speech, max(min_speech_frames, 1))
+    end_cand = _run_starts(~is_speech, max(min_silence_frames, 1))
 
-    wav = load_wav_mono_f32(args.wav_path, TARGET_SR)
+    # 시작/종료 후보를 시간순으로 번갈아 선택 (후보 수 = 구간 수, 프레임 수보다 훨씬 적음)
+    starts, ends = [], []
+    in_speech = False
+    i = j = 0
+    while True:
+        if not in_speech:
+            if i >= len(start_cand):
+                break
+            starts.append(start_cand[i])
+            in_speech = True
+            j = np.searchsorted(end_cand, start_cand[i], side="right")
+        else:
+            if j >= len(end_cand):
+                break
+            ends.append(end_cand[j])
+            in_speech = False
+            i = np.searchsorted(start_cand, end_cand[j], side="right")
+    return np.array(starts, dtype=np.int64), np.array(ends, dtype=np.int64)
+
+def _pad_for_offline(wav: np.ndarray, min_silence_frames: int) -> Tuple[np.ndarray, int]:
+    # 프레임 경계까지 0으로 채우고, 스트리밍 CLI처럼 무음 min_silence_frames 프레임을 덧붙임
+    n_frames = -(-len(wav) // BLOCK_SAMPLES)
+    tail = np.zeros(min_silence_frames * BLOCK_SAMPLES, dtype=np.float32)
+    padded = np.concatenate([np.pad(wav, (0, n_frames * BLOCK_SAMPLES - len(wav))), tail]).astype(np.float32, copy=False)
+    return padded, n_frames
+
+def detect_offline_many(
+    wavs: List[np.ndarray],
+    threshold: float = 0.5,
+    min_speech_frames: int = 3,
+    min_silence_frames: int = 6,
+    session=None,
+) -> List[Tuple[List[Segment], np.ndarray]]:
+    """
+    여러 파일을 한 배치로 VAD: frame_probabilities_many + 벡터화 히스테리시스
+    - 파일마다 끝에 무음 min_silence_frames 프레임을 덧붙여 마지막 구간을 닫음 (detect_streaming과 같은 구간)
+    반환: 파일별 (Segment 목록, 실제 프레임별 확률)
+    """
+    padded = [_pad_for_offline(w, min_silence_frames) for w in wavs]
+    all_probs = frame_probabilities_many([p for p, _ in padded], session=session)
+    results = []
+    for probs, (_, n_frames) in zip(all_probs, padded):
+        starts, ends = hysteresis_events(probs, threshold, min_speech_frames, min_silence_frames)
+        segs = [Segment(start_s=s * DT, end_s=e * DT) for s, e in zip(starts, ends)]
+        results.append((segs, probs[:n_frames]))
+    return results
 
+def detect_offline(
+    wav: np.ndarray,
+    threshold: float = 0.5,
+    min_speech_frames: int = 3,
+    min_silence_frames: int = 6,
+    session=None,
+) -> Tuple[List[Segment], np.ndarray]:
+    """
+    파일 단위 VAD (detect_offline_many의 한 파일 버전)
+    반환: (Segment 목록, 실제 프레임별 확률)
+    """
+    return detect_offline_many([wav], threshold, min_speech_frames, min_silence_frames, session=session)[0]
+
+def detect_streaming(
+    frames: Iterable[np.ndarray],
+    threshold: float = 0.5,
+    min_speech_frames: int = 3,
+    min_silence_frames: int = 6,
+    realtime: bool = False,
+    verbose: bool = True,
+) -> List[Segment]:
+    """
+    RealTimeSileroVAD에 512 샘플 프레임을 투입하는 스트리밍 경로
+    - frames: stream_chunks(wav) 또는 wav_frames(path) (파일을 다 읽기 전에 이벤트 시작)
+    """
     segs: List[Segment] = []
     cur_start: Optional[float] = None
 
     def on_event(event: str, t_s: float, prob: float, chunk: np.ndarray):
         nonlocal cur_start, segs
         if event == "frame":
-            state = "SPEECH" if prob > args.threshold else "silence"
-            print(f"[{t_s:8.3f}s] {state:7s}  p={prob:.3f}")
+            if verbose:
+                state = "SPEECH" if prob > threshold else "silence"
+                print(f"[{t_s:8.3f}s] {state:7s}  p={prob:.3f}")
         elif event == "speech_start":
             cur_start = t_s
-            print(f"▶️  speech_start @ {t_s:.3f}s (p={prob:.3f})")
+            if verbose:
+                print(f"▶️  speech_start @ {t_s:.3f}s (p={prob:.3f})")
         elif event == "speech_end":
             if cur_start is None:
                 cur_start = max(0.0, t_s - DT)
             end = t_s
             segs.append(Segment(start_s=cur_start, end_s=end))
-            print(f"⏹️  speech_end   @ {end:.3f}s   -> [{cur_start:.3f}, {end:.3f}] (dur={end-cur_start:.3f}s)")
+            if verbose:
+                print(f"⏹️  speech_end   @ {end:.3f}s   -> [{cur_start:.3f}, {end:.3f}] (dur={end-cur_start:.3f}s)")
             cur_start = None
 
     vad = RealTimeSileroVAD(
         sample_rate=TARGET_SR,
-        threshold=args.threshold,
-        min_speech_frames=args.min_speech_frames,
-        min_silence_frames=args.min_silence_frames,
+        threshold=threshold,
+        min_speech_frames=min_speech_frames,
+        min_silence_frames=min_silence_frames,
         onnx=True,
     )
     vad.start(on_event)
 
     # 1) 실제 오디오 청크 투입 (+옵션: 실시간 느낌)
-    for ch in stream_chunks(wav, BLOCK_SAMPLES):
+    for ch in frames:
         vad.put(ch)
-        if args.realtime:
+        if realtime:
             time.sleep(DT)
 
     # 2) 마지막 구간 닫히도록 무음 청크 추가
@@ -206,6 +806,166 @@ def main():
 
     # 3) 안전 종료
     vad.stop()
+    return segs
+
+# ---- 디렉터리/글롭 일괄 처리 (프로세스 풀, 워커당 모델 1개) ----
+_worker_session = None
+
+def _init_batch_worker():
+    global _worker_session
+    _worker_session = _silero_session()
+    # 첫 호출 지연을 미리 치름
+    frame_probabilities(np.zeros(BLOCK_SAMPLES, dtype=np.float32), session=_worker_session)
+
+def _detect_files(paths: List[str], params: dict) -> List[dict]:
+    # 파일 묶음을 한 배치로 추론, CPU 시간은 오디오 길이 비율로 나눔
+    c0 = time.process_time()
+    wavs = [load_wav_mono_f32(path, TARGET_SR) for path in paths]
+    results = detect_offline_many(wavs, session=_worker_session, **params)
+    cpu_s = time.process_time() - c0
+    total = max(sum(len(w) for w in wavs), 1)
+    return [{
+        "path": path,
+        "duration_s": len(wav) / TARGET_SR,
+        "segments": [(s.start_s, s.end_s) for s in segs],
+        "probs": probs,
+        "cpu_s": cpu_s * len(wav) / total,
+    } for path, wav, (segs, probs) in zip(paths, wavs, results)]
+
+def expand_inputs(pattern: str) -> List[str]:
+    """
+    디렉터리면 하위 *.wav 전체, 아니면 글롭 패턴
+    """
+    if os.path.isdir(pattern):
+        pattern = os.path.join(pattern, "**", "*.wav")
+    return sorted(p for p in glob.glob(pattern, recursive=True) if os.path.isfile(p))
+
+def _wav_samples(path: str, target_sr: int = TARGET_SR) -> int:
+    # 헤더만 읽어서 target_sr로 바꿨을 때의 샘플 수
+    info = sf.info(path)
+    return -(-info.frames * target_sr // info.samplerate)
+
+def group_by_samples(paths: List[str], max_files: int, max_samples: int) -> List[List[str]]:
+    """
+    입력 순서대로 파일을 묶음: 묶음마다 최대 max_files개, 총 샘플 수(target_sr 기준) max_samples 이하
+    - max_samples보다 긴 파일은 혼자 한 묶음
+    """
+    groups, current, total = [], [], 0
+    for path in paths:
+        n = _wav_samples(path)
+        if current and (len(current) >= max_files or total + n > max_samples):
+            groups.append(current)
+            current, total = [], 0
+        current.append(path)
+        total += n
+    if current:
+        groups.append(current)
+    return groups
+
+def detect_batch(paths: List[str], jobs: int = 0, group: int = 16, group_seconds: float = 600.0, **params) -> Iterator[dict]:
+    """
+    파일들을 묶어 프로세스 풀에 나눠 detect_offline_many 실행, 입력 순서대로 결과 반환
+    - jobs <= 0: CPU 코어 수
+    - 묶음은 최대 group개, 총 오디오 group_seconds초 이하 (워커 메모리는 파일 수가 아니라 오디오 길이에 비례하므로)
+    - 워커가 놀지 않도록 묶음 크기는 파일 수 / jobs 이하
+    """
+    jobs = jobs if jobs > 0 else (os.cpu_count() or 1)
+    size = max(1, min(group, -(-len(paths) // jobs)))
+    groups = group_by_samples(paths, size, int(group_seconds * TARGET_SR))
+    with ProcessPoolExecutor(
+        max_workers=min(jobs, max(len(groups), 1)),
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_init_batch_worker,
+    ) as pool:
+        for results in pool.map(_detect_files, groups, [params] * len(groups)):
+            yield from results
+
+def write_batch_results(results: Iterable[dict], out_path: str) -> Tuple[int, float]:
+    """
+    결과 저장
+    - *.npz: paths, durations, segments_<i> (n, 2), probs_<i> (float16)
+    - 그 외: JSONL 한 줄에 파일 하나 (probs는 소수 셋째 자리)
+    반환: (파일 수, 총 오디오 초)
+    """
+    n, audio_s = 0, 0.0
+    if out_path.endswith(".npz"):
+        arrays, paths, durations = {}, [], []
+        for i, r in enumerate(results):
+            paths.append(r["path"])
+            durations.append(r["duration_s"])
+            arrays[f"segments_{i}"] = np.asarray(r["segments"], dtype=np.float32).reshape(-1, 2)
+            arrays[f"probs_{i}"] = r["probs"].astype(np.float16)
+            n, audio_s = n + 1, audio_s + r["duration_s"]
+        np.savez_compressed(out_path, paths=np.array(paths), durations=np.array(durations), **arrays)
+        return n, audio_s
+
+    with open(out_path, "w") as f:
+        for r in results:
+            row = dict(r, probs=np.round(r["probs"], 3).tolist())
+            del row["cpu_s"]
+            f.write(json.dumps(row) + "\n")
+            n, audio_s = n + 1, audio_s + r["duration_s"]
+    return n, audio_s
+
+def run_batch(pattern: str, out_path: str, jobs: int = 0, group: int = 16, group_seconds: float = 600.0, **params):
+    paths = expand_inputs(pattern)
+    if not paths:
+        raise SystemExit(f"no wav files match {pattern!r}")
+    jobs = jobs if jobs > 0 else (os.cpu_count() or 1)
+    cpu = [0.0]
+
+    def tally(results):
+        for r in results:
+            cpu[0] += r["cpu_s"]
+            print(f"{r['path']}: {len(r['segments'])} segments, {r['duration_s']:.1f}s")
+            yield r
+
+    t0 = time.perf_counter()
+    n, audio_s = write_batch_results(tally(detect_batch(paths, jobs, group, group_seconds, **params)), out_path)
+    wall = time.perf_counter() - t0
+    workers = min(jobs, n)
+    cores = min(workers, os.cpu_count() or 1)
+    print(f"\n{n} files, {audio_s:.1f}s audio in {wall:.2f}s wall with {workers} worker(s) -> {out_path}")
+    print(f"throughput: {audio_s / wall:.1f} audio-s/wall-s, {audio_s / wall / cores:.1f} per core "
+          f"({audio_s / max(cpu[0], 1e-9):.1f} audio-s per worker CPU-s)")
+
+def main():
+    p = argparse.ArgumentParser(description="Silero VAD v5 (ONNX) - framewise demo")
+    p.add_argument("wav_path", type=str, help="입력 WAV 경로 (--batch면 디렉터리 또는 글롭)")
+    p.add_argument("--threshold", type=float, default=0.5, help="음성 확률 임계값")
+    p.add_argument("--min_speech_frames", type=int, default=3, help="연속 스피치 프레임(시작)")
+    p.add_argument("--min_silence_frames", type=int, default=6, help="연속 침묵 프레임(종료)")
+    p.add_argument("--realtime", action="store_true", help="콘솔 출력이 실시간처럼 보이게 32ms 대기")
+    p.add_argument("--offline", action="store_true", help="파일 전체를 큐/스레드 없이 추론 (프레임 로그 생략)")
+    p.add_argument("--check", action="store_true", help="--offline 결과를 스트리밍 경로와 비교")
+    p.add_argument("--batch", action="store_true", help="여러 파일을 프로세스 풀로 일괄 처리 (오프라인 모드)")
+    p.add_argument("--jobs", type=int, default=0, help="--batch 워커 수 (0이면 CPU 코어 수)")
+    p.add_argument("--group", type=int, default=16, help="--batch 워커가 한 배치로 추론하는 최대 파일 수")
+    p.add_argument("--group_seconds", type=float, default=600.0,
+                   help="--batch 한 배치의 최대 총 오디오 길이(초), 이보다 긴 파일은 혼자 처리")
+    p.add_argument("--out", type=str, default="vad_results.jsonl", help="--batch 결과 파일 (.jsonl 또는 .npz)")
+    args = p.parse_args()
+
+    params = dict(threshold=args.threshold, min_speech_frames=args.min_speech_frames, min_silence_frames=args.min_silence_frames)
+
+    if args.batch:
+        run_batch(args.wav_path, args.out, args.jobs, args.group, args.group_seconds, **params)
+        return
+
+    if args.offline:
+        wav = load_wav_mono_f32(args.wav_path, TARGET_SR)
+        t0 = time.perf_counter()
+        segs, probs = detect_offline(wav, **params)
+        elapsed = time.perf_counter() - t0
+        print(f"{len(probs)} frames ({len(probs) * DT:.1f}s audio) in {elapsed:.2f}s")
+        if args.check:
+            expected = detect_streaming(stream_chunks(wav), verbose=False, **params)
+            if segs != expected:
+                raise SystemExit(f"offline segments differ from streaming: {len(segs)} vs {len(expected)}")
+            print("offline segments match the streaming path")
+    else:
+        # 블록 단위로 읽으며 바로 투입 (긴 파일도 메모리 일정)
+        segs = detect_streaming(wav_frames(args.wav_path, TARGET_SR), realtime=args.realtime, **params)
 
     print("\n=== Detected Segments ===")
     for i, s in enumerate(segs, 1):